@@ -5,109 +5,219 @@ Date: 17/12/2021
 
 This program computes the mean and 95% confidence interval of the System Usability Scale,
 as well as plots the mean and standard error/standard deviation of the responses to each question.
-The SUS for each participants is also written in a .csv output file 
+The SUS for each participants is also written in a .csv output file
 
-Usage: python sus.py 
-You need to amend the variable "infile" to asign the path to your filename.csv containg the data
+Usage: python sus.py [input.csv ...] [options]
 
-Note: you can choose to plot the standard deviation or the error bars in the plot, amend the code at your convenience
+With no arguments it reads "sus-input-data.csv" and writes "sus-results.csv" and
+"sus_results_breakdown.png", exactly as before.
+
+Several questionnaires can be processed in one go:
+  python sus.py video.csv audio.csv vibration.csv
+  python sus.py video=site1/video.csv video=site2/video.csv audio=site1/audio.csv
+  python sus.py all-answers.csv --group-by Mode
+
+An input given as "group=path" is added to the named group (files with the same group
+are concatenated), otherwise the group is the file name. With --group-by the rows of
+each file are split by the value of that column.
+Each group gets its own "<prefix>-<group>.csv" and "<group>_sus_results_breakdown.png";
+a single unnamed input keeps the historical file names.
+
+Note: you can choose to plot the standard deviation or the error bars in the plot (--error std|sem)
 
 '''
 
+import argparse
 import csv
-import sys
+import os
 import numpy as np
 import scipy.stats as st
-import matplotlib.pyplot as plt
 from textwrap import wrap
 
 
-infile = 'sus-input-data.csv'
-outfile = 'sus-results.csv'
-
-
-sus = [] #Array of SUS results for each participant 
-Q1 = []
-Q2 = []
-Q3 = []
-Q4 = []
-Q5 = []
-Q6 = []
-Q7 = []
-Q8 = []
-Q9 = []
-Q10 = []
-
-
-with open(infile, mode='r') as csv_file:
-    csv_reader = csv.DictReader(csv_file, delimiter = '\t')
-
-    for row in csv_reader:
-
-        Q1.append(int(row['Q1']))
-        Q2.append(int(row['Q2']))
-        Q3.append(int(row['Q3']))
-        Q4.append(int(row['Q4']))
-        Q5.append(int(row['Q5']))
-        Q6.append(int(row['Q6']))
-        Q7.append(int(row['Q7']))
-        Q8.append(int(row['Q8']))
-        Q9.append(int(row['Q9']))
-        Q10.append(int(row['Q10']))
-
-        odd = (int(row['Q1']) + int(row['Q3']) + int(row['Q5']) + int(row['Q7']) + int(row['Q9'])) - 5
-        even = 25 - (int(row['Q2']) + int(row['Q4']) + int(row['Q6']) + int(row['Q8']) + int(row['Q10']))
-        total = (odd + even) * 2.5
-        sus.append(total)
-        
-
-print("\n----------------------------------------------------------")
-print(f"\nSUS mean: {np.mean(sus)}")
-#print(f"Median: {np.median(sus)}")
-#print(f"Std: {np.std(sus)}")
-print(f"\n95% Confidence interval: {st.t.interval(0.95, len(sus)-1, loc=np.mean(sus), scale=st.sem(sus))}")
-print("\n----------------------------------------------------------")
-
-
-
-#Write SUS results for each participant in a csv file
-with open(outfile, mode='w') as csv_writer_file:
-    csv_writer = csv.writer(csv_writer_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-
-    csv_writer.writerow(['Total'])
-
-    for i in sus:
-        csv_writer.writerow([i])
-
-
-
-
-
-#Breakdown plot
-fig_sus_results_breakdown, ax = plt.subplots(figsize=(11, 5))
-
-results = [np.mean(Q1), np.mean(Q2), np.mean(Q3), np.mean(Q4), np.mean(Q5), np.mean(Q6), np.mean(Q7), np.mean(Q8), np.mean(Q9), np.mean(Q10)] 
-ind = np.arange(len(results))
-#err = [np.std(Q1), np.std(Q2), np.std(Q3), np.std(Q4), np.std(Q5), np.std(Q6), np.std(Q7), np.std(Q8), np.std(Q9), np.std(Q10)] #standard deviation
-err = [st.sem(Q1), st.sem(Q2), st.sem(Q3), st.sem(Q4), st.sem(Q5), st.sem(Q6), st.sem(Q7), st.sem(Q8), st.sem(Q9), st.sem(Q10)] #standard error
-
+DEFAULT_INFILE = 'sus-input-data.csv'
+DEFAULT_OUTFILE = 'sus-results.csv'
+DEFAULT_PLOT = 'sus_results_breakdown.png'
+
+QUESTIONS = ['Q1', 'Q2', 'Q3', 'Q4', 'Q5', 'Q6', 'Q7', 'Q8', 'Q9', 'Q10']
+
+SUS_XLABELS = ['like to use system frequently', 'system unnecessarily complex', 'system easy to use', 'need technical support', 'functions well integrated', 'too much inconsistency', 'learn to use very quickly', 'inconvenient to use', 'confident using the system', 'need to learn a lot before use']
+
+
+# ---------------------------------------------------
+# LOADING
+# ---------------------------------------------------
+def load_responses(path, group_by=None):
+    '''
+    Reads a tab separated questionnaire into a (participants x 10) int matrix.
+    Returns {group: (participant_ids, matrix)}; without group_by there is a single
+    group named None.
+    '''
+    ids = {}
+    rows = {}
 
-cmap = plt.get_cmap('viridis', 10)
-ax.bar(ind, results, width=0.7, yerr=err,  color=cmap.colors, ecolor='black', capsize=9)
+    with open(path, mode='r') as csv_file:
+        csv_reader = csv.DictReader(csv_file, delimiter='\t')
 
-sus_xlabels = ['like to use system frequently', 'system unnecessarily complex', 'system easy to use', 'need technical support', 'functions well integrated', 'too much inconsistency', 'learn to use very quickly', 'inconvenient to use', 'confident using the system', 'need to learn a lot before use']
-sus_xlabels = [ '\n'.join(wrap(l, 14)) for l in sus_xlabels ]
-#sus_xlabels = [ label.replace(' ', '\n') for label in sus_xlabels]
-ax.set_xticks([0, 1, 2, 3, 4, 5, 6, 7, 8, 9]) 
-ax.set_xticklabels(sus_xlabels, fontsize=12, rotation=45)
-ax.set_ylim([1, 5])
-ax.set_yticks([1, 2, 3, 4, 5]) 
-sus_ylabels = ['Strongly disagree', '', 'Neutral', '', 'Strongly agree']
-sus_ylabels = [ '\n'.join(wrap(l, 10)) for l in sus_ylabels ]
-ax.set_yticklabels(sus_ylabels)
-#ax.set_yticklabels(['0', 'Strongly disagree', '2', 'Neutral', '4', 'Strongly agree'])
-ax.set_title("SUS questions", fontsize=15, fontweight="bold")
-plt.tight_layout()
-fig_sus_results_breakdown.savefig("sus_results_breakdown.png", dpi=300, bbox_inches='tight')
-plt.show()
+        for row in csv_reader:
+            key = row[group_by] if group_by else None
+            ids.setdefault(key, []).append(row.get('partecipant', ''))
+            rows.setdefault(key, []).append([row[q] for q in QUESTIONS])
 
+    return {
+        key: (ids[key], np.array(rows[key], dtype=np.int64).reshape(-1, len(QUESTIONS)))
+        for key in rows
+    }
+
+
+def parse_input(spec):
+    # "group=path" or plain "path"
+    if '=' in spec and not os.path.exists(spec):
+        group, path = spec.split('=', 1)
+        return group, path
+    return None, spec
+
+
+def collect_groups(specs, group_by=None):
+    '''
+    Loads every input and merges them into {group: (participant_ids, matrix)}.
+    '''
+    groups = {}
+    single = len(specs) == 1
+
+    for spec in specs:
+        group, path = parse_input(spec)
+        if group is None and not single:
+            group = os.path.splitext(os.path.basename(path))[0]
+
+        for sub, (ids, matrix) in load_responses(path, group_by).items():
+            name = group
+            if sub is not None:
+                name = sub if name is None else f"{name}-{sub}"
+
+            if name in groups:
+                old_ids, old_matrix = groups[name]
+                groups[name] = (old_ids + ids, np.vstack([old_matrix, matrix]))
+            else:
+                groups[name] = (ids, matrix)
+
+    return groups
+
+
+# ---------------------------------------------------
+# SCORING
+# ---------------------------------------------------
+def sus_scores(matrix):
+    # odd questions are positive (answer - 1), even ones negative (5 - answer)
+    odd = matrix[:, 0::2].sum(axis=1) - 5
+    even = 25 - matrix[:, 1::2].sum(axis=1)
+    return (odd + even) * 2.5
+
+
+def question_stats(matrix):
+    '''
+    Per question mean, standard deviation and standard error (columns of the matrix).
+    '''
+    n = matrix.shape[0]
+    means = matrix.mean(axis=0)
+    stds = matrix.std(axis=0)
+    sems = matrix.std(axis=0, ddof=1) / np.sqrt(n) if n > 1 else np.full(matrix.shape[1], np.nan)
+    return means, stds, sems
+
+
+def confidence_interval(scores, confidence=0.95):
+    n = len(scores)
+    if n < 2:
+        return (np.nan, np.nan)
+    mean = np.mean(scores)
+    sem = np.std(scores, ddof=1) / np.sqrt(n)
+    return st.t.interval(confidence, n - 1, loc=mean, scale=sem)
+
+
+# ---------------------------------------------------
+# OUTPUT
+# ---------------------------------------------------
+def write_results(outfile, scores):
+    #Write SUS results for each participant in a csv file
+    with open(outfile, mode='w', newline='') as csv_writer_file:
+        csv_writer = csv.writer(csv_writer_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+
+        csv_writer.writerow(['Total'])
+        csv_writer.writerows([s] for s in scores.tolist())
+
+
+def plot_breakdown(matrix, plotfile, title="SUS questions", error='sem'):
+    import matplotlib.pyplot as plt
+
+    #Breakdown plot
+    fig_sus_results_breakdown, ax = plt.subplots(figsize=(11, 5))
+
+    means, stds, sems = question_stats(matrix)
+    err = stds if error == 'std' else sems
+    ind = np.arange(len(means))
+
+    cmap = plt.get_cmap('viridis', 10)
+    ax.bar(ind, means, width=0.7, yerr=err,  color=cmap.colors, ecolor='black', capsize=9)
+
+    sus_xlabels = [ '\n'.join(wrap(l, 14)) for l in SUS_XLABELS ]
+    ax.set_xticks(ind)
+    ax.set_xticklabels(sus_xlabels, fontsize=12, rotation=45)
+    ax.set_ylim([1, 5])
+    ax.set_yticks([1, 2, 3, 4, 5])
+    sus_ylabels = ['Strongly disagree', '', 'Neutral', '', 'Strongly agree']
+    sus_ylabels = [ '\n'.join(wrap(l, 10)) for l in sus_ylabels ]
+    ax.set_yticklabels(sus_ylabels)
+    ax.set_title(title, fontsize=15, fontweight="bold")
+    plt.tight_layout()
+    fig_sus_results_breakdown.savefig(plotfile, dpi=300, bbox_inches='tight')
+    return fig_sus_results_breakdown
+
+
+def output_names(group, prefix):
+    if group is None:
+        return prefix + '.csv', DEFAULT_PLOT
+    return f"{prefix}-{group}.csv", f"{group}_{DEFAULT_PLOT}"
+
+
+def report(group, scores):
+    low, high = confidence_interval(scores)
+    print("\n----------------------------------------------------------")
+    if group is not None:
+        print(f"\nGroup: {group} ({len(scores)} participants)")
+    print(f"\nSUS mean: {np.mean(scores)}")
+    print(f"\n95% Confidence interval: ({low}, {high})")
+    print("\n----------------------------------------------------------")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="System Usability Scale calculator")
+    parser.add_argument("inputs", nargs="*", default=[DEFAULT_INFILE], help="Questionnaires (tab separated), optionally as group=path")
+    parser.add_argument("--group-by", default=None, help="Split the rows of each file by this column (e.g. Mode, Site)")
+    parser.add_argument("--prefix", default=os.path.splitext(DEFAULT_OUTFILE)[0], help="Prefix of the output csv files")
+    parser.add_argument("--outdir", default=".", help="Directory for csv files and plots")
+    parser.add_argument("--error", choices=("sem", "std"), default="sem", help="Error bars of the breakdown plot")
+    parser.add_argument("--no-plot", action="store_true", help="Skip the breakdown plots")
+    parser.add_argument("--no-show", action="store_true", help="Save the plots without opening a window")
+    args = parser.parse_args()
+
+    os.makedirs(args.outdir, exist_ok=True)
+    groups = collect_groups(args.inputs, args.group_by)
+
+    for group, (ids, matrix) in groups.items():
+        scores = sus_scores(matrix)
+        report(group, scores)
+
+        csv_name, plot_name = output_names(group, args.prefix)
+        write_results(os.path.join(args.outdir, csv_name), scores)
+
+        if not args.no_plot:
+            title = "SUS questions" if group is None else f"SUS questions ({group})"
+            plot_breakdown(matrix, os.path.join(args.outdir, plot_name), title, args.error)
+
+    if not args.no_plot and not args.no_show:
+        import matplotlib.pyplot as plt
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,8 @@ class AccelController:
                  osc_port=4444,
                  calib_samples=60,
                  smooth=0.20,
-                 deadzone_deg=0.6):
+                 deadzone_deg=0.6,
+                 serve=True):
 
         # ---- OSC state ----
         self._osc_x = None
@@ -24,21 +25,25 @@ class AccelController:
         self._last_xyz = None
 
         # ---- Setup OSC server ----
+        # serve=False: no socket / thread, the owner passes the packets to self.dispatcher
         dispatcher = Dispatcher()
         dispatcher.map("/a0", self._on_x)
         dispatcher.map("/a1", self._on_y)
         dispatcher.map("/a2", self._on_z)
+        self.dispatcher = dispatcher
 
-        self.server = ThreadingOSCUDPServer(
-            (osc_ip, osc_port),
-            dispatcher
-        )
+        self.server = None
+        if serve:
+            self.server = ThreadingOSCUDPServer(
+                (osc_ip, osc_port),
+                dispatcher
+            )
 
-        self._osc_thread = threading.Thread(
-            target=self.server.serve_forever,
-            daemon=True
-        )
-        self._osc_thread.start()
+            self._osc_thread = threading.Thread(
+                target=self.server.serve_forever,
+                daemon=True
+            )
+            self._osc_thread.start()
 
         # ---- Calibration ----
         self.calib_samples = calib_samples
@@ -89,6 +94,8 @@ class AccelController:
     # API identical to the serial version
     # =========================================================
     def close(self):
+        if self.server is None:
+            return
         try:
             self.server.shutdown()
         except Exception:
@@ -0,0 +1,215 @@
+# ---------------------------------------------------
+# BATCHED GAME SIMULATION
+# ---------------------------------------------------
+# The rules of simulation.GameSimulation for N independent games, each on its
+# own level, stepped together with numpy. Walls and holes of all the levels
+# are packed in padded arrays; the walls are applied one after the other (as
+# Maze.handle_collisions does) but for all the balls at once, so the result of
+# a step is the same as N GameSimulation.step() calls.
+import numpy as np
+
+from levels import LEVELS, WALL_THICKNESS, build_walls
+from config import (MAZE_WIDTH, MAZE_DEPTH, BALL_RADIUS, GRAVITY, FRICTION, START_POS,
+                    START_LIVES, COLLISION_SPEED_THRESHOLD, HOLE_VIBRATION_MIN,
+                    HOLE_VIBRATION_MAX, GOAL_RECT, WALL_RESTITUTION, WALL_TANGENTIAL)
+
+PLAY, WIN, GAME_OVER = 0, 1, 2
+STATE_NAMES = ("PLAY", "WIN", "GAME_OVER")
+
+
+def pack_levels(levels=LEVELS):
+    """
+    Geometry of all the levels in padded arrays indexed by level number:
+      walls [L+1, W, 4] (x, z, w, d), wall_mask [L+1, W]
+      holes [L+1, H, 3] (x, z, r),    hole_mask [L+1, H]
+    Padding walls are far away and never touched; padding holes have radius 0.
+    """
+    n = max(levels) + 1
+    walls = {k: build_walls(v, MAZE_WIDTH, MAZE_DEPTH, WALL_THICKNESS) for k, v in levels.items()}
+    max_walls = max(len(w) for w in walls.values())
+    max_holes = max(max(len(v["holes"]) for v in levels.values()), 1)
+
+    wall_arr = np.zeros((n, max_walls, 4))
+    wall_arr[:, :, 0] = 1e9
+    wall_mask = np.zeros((n, max_walls), dtype=bool)
+    hole_arr = np.zeros((n, max_holes, 3))
+    hole_arr[:, :, 0] = 1e9
+    hole_mask = np.zeros((n, max_holes), dtype=bool)
+    for k, v in levels.items():
+        wall_arr[k, :len(walls[k])] = walls[k]
+        wall_mask[k, :len(walls[k])] = True
+        if v["holes"]:
+            hole_arr[k, :len(v["holes"])] = v["holes"]
+            hole_mask[k, :len(v["holes"])] = True
+    return wall_arr, wall_mask, hole_arr, hole_mask
+
+
+class BatchSimulation:
+    """
+    n games in arrays (x, z, vx, vz, level, lives, state, wall_collisions).
+    step() advances the games selected by `active` (all by default) and leaves
+    the events of the step in arrays, like GameSimulation does in attributes.
+    """
+    def __init__(self, n, friction=FRICTION, levels=LEVELS):
+        self.n = n
+        self.friction = friction
+        self.max_level = max(levels.keys())
+        self.walls, self.wall_mask, self.holes, self.hole_mask = pack_levels(levels)
+
+        self.x = np.zeros(n)
+        self.z = np.zeros(n)
+        self.vx = np.zeros(n)
+        self.vz = np.zeros(n)
+        self.level = np.ones(n, dtype=np.int64)
+        self.lives = np.zeros(n, dtype=np.int64)
+        self.state = np.zeros(n, dtype=np.int8)
+        self.wall_collisions = np.zeros(n, dtype=np.int64)
+        self.touching = np.zeros(n, dtype=bool)    # ball against a wall at the previous step
+
+        self.hit_wall = np.zeros(n, dtype=bool)
+        self.fell = np.zeros(n, dtype=bool)
+        self.level_completed = np.zeros(n, dtype=bool)
+        self.ball_reset = np.zeros(n, dtype=bool)
+        self.inside_area = np.zeros(n, dtype=bool)
+        self.hole_vibration = np.zeros(n, dtype=np.int64)
+        self.speed = np.zeros(n)
+        self.event_x = np.zeros(n)
+        self.event_z = np.zeros(n)
+
+        self.restart()
+
+    def restart(self, idx=slice(None)):
+        self.level[idx] = 1
+        self.lives[idx] = START_LIVES
+        self.wall_collisions[idx] = 0
+        self.touching[idx] = False
+        self.state[idx] = PLAY
+        self.soft_reset(idx)
+        self.hit_wall[idx] = False
+        self.fell[idx] = False
+        self.level_completed[idx] = False
+        self.ball_reset[idx] = False
+        self.inside_area[idx] = False
+        self.hole_vibration[idx] = 0
+        self.speed[idx] = 0.0
+        self.event_x[idx] = START_POS[0]
+        self.event_z[idx] = START_POS[1]
+
+    def soft_reset(self, idx=slice(None)):
+        self.x[idx] = START_POS[0]
+        self.z[idx] = START_POS[1]
+        self.vx[idx] = 0.0
+        self.vz[idx] = 0.0
+
+    def _collide(self, x, z, vx, vz, level):
+        # Maze.handle_collisions for all the balls, one wall slot at a time
+        hit = np.zeros(len(x), dtype=bool)
+        walls = self.walls[level]
+        mask = self.wall_mask[level]
+        r2 = BALL_RADIUS * BALL_RADIUS
+        for j in range(walls.shape[1]):
+            wx, wz, ww, wd = walls[:, j, 0], walls[:, j, 1], walls[:, j, 2], walls[:, j, 3]
+            dx = x - np.clip(x, wx, wx + ww)
+            dz = z - np.clip(z, wz, wz + wd)
+            dist2 = dx * dx + dz * dz
+            c = (dist2 < r2) & mask[:, j]
+            if not c.any():
+                continue
+            hit |= c
+            dist = np.where(dist2 != 0, np.sqrt(dist2), 1e-6)
+            overlap = BALL_RADIUS - dist
+            nx = dx / dist
+            nz = dz / dist
+            x = np.where(c, x + nx * overlap, x)
+            z = np.where(c, z + nz * overlap, z)
+            vdotn = vx * nx + vz * nz
+            vnx = vdotn * nx
+            vnz = vdotn * nz
+            vx = np.where(c, -vnx * WALL_RESTITUTION + (vx - vnx) * WALL_TANGENTIAL, vx)
+            vz = np.where(c, -vnz * WALL_RESTITUTION + (vz - vnz) * WALL_TANGENTIAL, vz)
+        return x, z, vx, vz, hit
+
+    def step(self, dt, tilt_x_deg, tilt_z_deg, active=None):
+        """
+        dt: scalar; tilt_x_deg, tilt_z_deg: arrays of n (or scalars);
+        active: bool mask of the games to step (default: the ones in PLAY).
+        """
+        if active is None:
+            active = self.state == PLAY
+        else:
+            active = active & (self.state == PLAY)
+
+        self.hit_wall[:] = False
+        self.fell[:] = False
+        self.level_completed[:] = False
+        self.ball_reset[:] = False
+        if not active.any():
+            return
+
+        idx = np.flatnonzero(active)
+        level = self.level[idx]
+        tx = np.radians(np.broadcast_to(tilt_x_deg, (self.n,))[idx])
+        tz = np.radians(np.broadcast_to(tilt_z_deg, (self.n,))[idx])
+
+        # Ball.update
+        vx = (self.vx[idx] + GRAVITY * np.sin(tz) * dt) * self.friction
+        vz = (self.vz[idx] + GRAVITY * np.sin(tx) * dt) * self.friction
+        x = self.x[idx] + vx * dt
+        z = self.z[idx] + vz * dt
+
+        # collisions
+        speed_in = np.hypot(vx, vz)
+        x, z, vx, vz, hit = self._collide(x, z, vx, vz, level)
+        self.hit_wall[idx] = hit
+        # one collision per contact, as GameSimulation.step
+        self.wall_collisions[idx] += hit & ~self.touching[idx] & (speed_in > COLLISION_SPEED_THRESHOLD)
+        self.touching[idx] = hit
+
+        self.speed[idx] = np.sqrt(vx * vx + vz * vz)
+        self.event_x[idx] = x
+        self.event_z[idx] = z
+
+        # hole areas: the first hole (in level order) whose area contains the ball
+        holes = self.holes[level]
+        hmask = self.hole_mask[level]
+        hx, hz, hr = holes[:, :, 0], holes[:, :, 1], holes[:, :, 2]
+        dist = np.hypot(x[:, None] - hx, z[:, None] - hz)
+        area_r = hr * 3.0
+        in_area = (dist < area_r) & hmask
+        inside = in_area.any(axis=1)
+        first = np.argmax(in_area, axis=1)
+        rows = np.arange(len(idx))
+        d, r, ar = dist[rows, first], hr[rows, first], area_r[rows, first]
+        t = np.clip((d - r) / np.where(inside, ar - r, 1.0), 0.0, 1.0)
+        intensity = (HOLE_VIBRATION_MIN + (1.0 - t) * (HOLE_VIBRATION_MAX - HOLE_VIBRATION_MIN)).astype(np.int64)
+        self.inside_area[idx] = inside
+        self.hole_vibration[idx] = np.where(inside, intensity, 0)
+
+        # falling into holes
+        fell = ((dist < hr - BALL_RADIUS * 0.25) & hmask).any(axis=1)
+        lives = self.lives[idx] - fell
+        over = fell & (lives <= 0)
+        reset = fell & ~over
+
+        # victory (not checked after a game over)
+        gx, gz, gw, gd = GOAL_RECT
+        goal = ~over & ~reset & (gx <= x) & (x <= gx + gw) & (gz <= z) & (z <= gz + gd)
+        won = goal & (level >= self.max_level)
+        next_level = goal & ~won
+        reset |= next_level
+
+        state = self.state[idx]
+        state[over] = GAME_OVER
+        state[won] = WIN
+        x = np.where(reset, START_POS[0], x)
+        z = np.where(reset, START_POS[1], z)
+        vx = np.where(reset, 0.0, vx)
+        vz = np.where(reset, 0.0, vz)
+
+        self.x[idx], self.z[idx], self.vx[idx], self.vz[idx] = x, z, vx, vz
+        self.lives[idx] = lives
+        self.level[idx] = level + next_level
+        self.state[idx] = state
+        self.fell[idx] = fell
+        self.level_completed[idx] = goal
+        self.ball_reset[idx] = reset
@@ -0,0 +1,126 @@
+'''
+Allocation budget of the steady-state PLAY frame.
+
+Runs the frame of maze_tilt.py in the PLAY state (GameSimulation.step, render_scene,
+render_overlay) on a hidden window, first without measuring (warm-up: caches,
+display lists, first renderings of the HUD) and then with the AllocationProfiler,
+and checks per stage:
+  - GC-tracked objects left alive per frame (what makes the collector run)
+  - tracemalloc peak per frame (transient buffers)
+  - number of garbage collections during the measured frames
+The exit code is 1 when a stage is over the budget, so it can be used as a check.
+
+Usage (from the repository root):
+  python benchmarks/bench_alloc.py
+  python benchmarks/bench_alloc.py --frames 3000 --level 3 --max-kib 2
+
+Without a display the SDL "offscreen" driver is used. --no-gl only runs the simulation.
+'''
+
+import argparse
+import math
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from offscreen import open_offscreen_window
+from profiler import AllocationProfiler, NullProfiler
+from simulation import GameSimulation
+
+MAX_OBJECTS = 0.05      # GC-tracked objects left alive per frame and stage
+MAX_KIB = 4.0           # tracemalloc peak per frame and stage
+MAX_COLLECTIONS = 0
+
+
+def tilt_path(i):
+    # slow circles over the board, the ball keeps rolling and hitting walls
+    a = 2.0 * math.pi * i / 600.0
+    return 12.0 * math.sin(a), 12.0 * math.cos(1.7 * a)
+
+
+def run(frames, level, prof, font, max_level, start=0):
+    import maze_tilt
+    from simulation import START_LIVES
+
+    sim = run.sim
+    for i in range(start, start + frames):
+        prof.begin_frame()
+        tilt_x, tilt_z = tilt_path(i)
+        sim.step(1.0 / maze_tilt.FPS, tilt_x, tilt_z, prof)
+        if sim.level != level:
+            # steady state: stay on the measured level
+            sim.level = level
+            sim.maze = run.maze
+        sim.lives = START_LIVES
+        prof.lap("physics")
+
+        if font is not None:
+            maze_tilt.render_scene(sim.maze, sim.ball, tilt_x, tilt_z, prof)
+            maze_tilt.render_overlay(font, "PLAY", "bench", "1", "name", sim.level, max_level,
+                                     sim.lives, i / maze_tilt.FPS, sim.wall_collisions, prof=prof)
+        prof.end_frame()
+    return start + frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allocation budget of the MazeTilt PLAY frame")
+    parser.add_argument("--frames", type=int, default=1200, help="Measured frames")
+    parser.add_argument("--warmup", type=int, default=600, help="Frames before the measure")
+    parser.add_argument("--level", type=int, default=2)
+    parser.add_argument("--max-objects", type=float, default=MAX_OBJECTS, help="Budget of GC-tracked objects per frame and stage")
+    parser.add_argument("--max-kib", type=float, default=MAX_KIB, help="Budget of the tracemalloc peak per frame and stage (KiB)")
+    parser.add_argument("--max-collections", type=int, default=MAX_COLLECTIONS, help="Budget of garbage collections in the measured frames")
+    parser.add_argument("--no-gl", action="store_true", help="Simulation only")
+    args = parser.parse_args()
+
+    font = None
+    if not args.no_gl:
+        import maze_tilt
+        import pygame
+        try:
+            open_offscreen_window((maze_tilt.WIN_WIDTH, maze_tilt.WIN_HEIGHT))
+        except pygame.error as e:
+            print(f"No OpenGL context available: {e}")
+            sys.exit(2)
+        maze_tilt.init_opengl()
+        font = pygame.font.SysFont("Arial", 20, bold=True)
+
+    from levels import LEVELS
+    from maze import Maze
+
+    sim = GameSimulation()
+    sim.level = args.level
+    sim.maze = run.maze = Maze(level=args.level)
+    run.sim = sim
+    max_level = len(LEVELS)
+
+    i = run(args.warmup, args.level, NullProfiler(), font, max_level)
+    prof = AllocationProfiler(window=args.frames, log_pause_ms=0.0)
+    run(args.frames, args.level, prof, font, max_level, start=i)
+    stats = prof.allocation_stats()
+    collections = sum(count for count, _, _ in prof.gc_pauses.values())
+    prof.close()
+
+    print(f"level {args.level}, {args.frames} frames after {args.warmup} of warm-up, "
+          f"wall collisions {sim.wall_collisions}")
+    print(f"{'stage':<14}{'gc obj/fr':>10}{'KiB/fr':>9}{'blocks/fr':>10}")
+    over = []
+    for name, (objects, kib, blocks, _) in stats.items():
+        flag = ""
+        if objects > args.max_objects or kib > args.max_kib:
+            flag = "  OVER BUDGET"
+            over.append(name)
+        print(f"{name:<14}{objects:10.2f}{kib:9.2f}{blocks:10.2f}{flag}")
+    print(f"garbage collections: {collections} (budget {args.max_collections})")
+    for frame, gen, ms, collected in prof.long_pauses:
+        print(f"  frame {frame}: gen{gen} {ms:.2f} ms, {collected} collected")
+
+    if over or collections > args.max_collections:
+        print(f"over budget: {', '.join(over) or 'garbage collections'}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
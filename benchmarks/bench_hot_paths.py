@@ -0,0 +1,267 @@
+'''
+Microbenchmarks of the game's hot paths.
+
+Usage (from the repository root):
+  python benchmarks/bench_hot_paths.py                         # prints the table, writes bench_results.json
+  python benchmarks/bench_hot_paths.py --out base.json         # store a baseline
+  python benchmarks/bench_hot_paths.py --compare base.json     # exit code 1 if something got slower
+  python benchmarks/bench_hot_paths.py --filter collisions --gl
+
+Every benchmark is run in rounds of `number` calls until --min-time has passed;
+the reported value is the median time per call over the rounds (the minimum is also
+stored). A benchmark is a regression when its median is more than --threshold
+(relative) slower than in the baseline.
+
+--gl also times the OpenGL draw functions on a hidden window; without a display
+the SDL "offscreen" driver (EGL) is used, and the GL benchmarks are skipped when no
+context can be created.
+'''
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import maze_tilt
+from ball import Ball
+from maze import Maze
+from levels import LEVELS, MAZE_WIDTH, MAZE_DEPTH
+from simulation import START_POS, GRAVITY, FRICTION, hole_vibration_level, fell_in_hole
+from accelerometer import AccelController
+
+DEFAULT_OUT = "bench_results.json"
+
+
+# ---------------------------------------------------
+# TIMER
+# ---------------------------------------------------
+def measure(fn, number, min_time, max_rounds=200):
+    rounds = []
+    start = time.perf_counter()
+    while len(rounds) < 3 or (time.perf_counter() - start < min_time and len(rounds) < max_rounds):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - t0) / number * 1e9)
+    return {"ns_per_op": statistics.median(rounds), "min_ns": min(rounds), "rounds": len(rounds), "number": number}
+
+
+# ---------------------------------------------------
+# BENCHMARKS (name -> (setup returning a callable, calls per round))
+# ---------------------------------------------------
+def positions(n=512, seed=1):
+    rng = random.Random(seed)
+    return [(rng.uniform(-MAZE_WIDTH / 2, MAZE_WIDTH / 2), rng.uniform(-MAZE_DEPTH / 2, MAZE_DEPTH / 2),
+             rng.uniform(-8, 8), rng.uniform(-8, 8)) for _ in range(n)]
+
+
+def cycling(samples, apply):
+    # calls apply(sample) on the next sample at every call
+    state = {"i": 0}
+    n = len(samples)
+
+    def run():
+        i = state["i"]
+        apply(samples[i])
+        state["i"] = (i + 1) % n
+    return run
+
+
+def bench_ball_update():
+    ball = Ball(*START_POS, gravity=GRAVITY, friction=FRICTION)
+
+    def run():
+        ball.update(1 / 60, 7.0, -5.0)
+        if abs(ball.x) > 100:
+            ball.reset()
+    return run
+
+
+def bench_collisions(maze):
+    ball = Ball(0.0, 0.0)
+
+    def place(p):
+        ball.x, ball.z, ball.vx, ball.vz = p
+        maze.handle_collisions(ball)
+    return cycling(positions(), place)
+
+
+def dense_maze(n_walls, seed=2):
+    rng = random.Random(seed)
+    maze = Maze(level=1)
+    maze.walls = maze.walls[:4] + [
+        (rng.uniform(-9, 8), rng.uniform(-14, 13), rng.choice((0.7, rng.uniform(1, 4))), rng.choice((0.7, rng.uniform(1, 4))))
+        for _ in range(n_walls)
+    ]
+    maze._build_grid()    # collision grid of these walls (from GRID_MIN_WALLS walls)
+    return maze
+
+
+def bench_build_maze():
+    maze = Maze(level=5)
+    return maze._build_maze
+
+
+def bench_accel_update():
+    accel = AccelController(osc_ip="127.0.0.1", osc_port=0)
+    accel.close()
+    rng = random.Random(3)
+    samples = [(0.3 * math.sin(i / 40) + rng.gauss(0, 0.01), 0.2 * math.cos(i / 55) + rng.gauss(0, 0.01), 1.0)
+               for i in range(1024)]
+
+    def feed(xyz):
+        accel._last_xyz = xyz
+        accel.update()
+    for xyz in samples[:accel.calib_samples]:
+        feed(xyz)
+    return cycling(samples, feed)
+
+
+def bench_holes(maze, fn):
+    ball = Ball(0.0, 0.0)
+
+    def place(p):
+        ball.x, ball.z = p[0], p[1]
+        fn(maze, ball)
+    # half of the samples around the holes, where the scan does the most work
+    rng = random.Random(4)
+    near = [(hx + rng.uniform(-3, 3), hz + rng.uniform(-3, 3), 0, 0) for (hx, hz, r) in maze.holes for _ in range(64)]
+    return cycling(near + positions(len(near)), place)
+
+
+def bench_save_results(directory):
+    def run():
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            maze_tilt.save_results("bench", "1", 2, 5, "WIN", 93.2, 17, 2)
+        finally:
+            os.chdir(cwd)
+    return run
+
+
+def cpu_benchmarks(tmpdir):
+    benches = {
+        "ball.update": (bench_ball_update, 2000),
+        "maze.build_maze": (bench_build_maze, 500),
+        "accel.update": (bench_accel_update, 2000),
+        "save_results": (lambda: bench_save_results(tmpdir), 50),
+    }
+    for level in sorted(LEVELS):
+        benches[f"collisions.level{level}"] = (lambda level=level: bench_collisions(Maze(level=level)), 1000)
+        benches[f"holes.vibration.level{level}"] = (
+            lambda level=level: bench_holes(Maze(level=level), hole_vibration_level), 1000)
+        benches[f"holes.fall.level{level}"] = (
+            lambda level=level: bench_holes(Maze(level=level), fell_in_hole), 1000)
+    for n in (100, 1000):
+        benches[f"collisions.dense{n}"] = (lambda n=n: bench_collisions(dense_maze(n)), max(10, 10000 // n))
+    return benches
+
+
+def gl_benchmarks():
+    from offscreen import open_offscreen_window
+    import pygame
+    from OpenGL.GL import glFinish
+
+    try:
+        open_offscreen_window((maze_tilt.WIN_WIDTH, maze_tilt.WIN_HEIGHT))
+        maze_tilt.init_opengl()
+    except Exception as e:
+        print(f"GL benchmarks skipped: {e}")
+        return {}
+
+    font = pygame.font.SysFont("Arial", 20, bold=True)
+
+    def finished(fn):
+        # glFinish so the time includes the driver work, not only the Python calls
+        def run():
+            fn()
+            glFinish()
+        return run
+
+    benches = {
+        "gl.draw_sphere": (lambda: finished(lambda: maze_tilt.draw_sphere(maze_tilt.BALL_RADIUS)), 50),
+        "gl.draw_hud": (lambda: finished(lambda: maze_tilt.draw_hud_gl(font, 3, 5, 2, "PLAY", 42.0, 7)), 50),
+        "gl.draw_input_panel": (lambda: finished(lambda: maze_tilt.draw_input_panel(font, "player", "1", "name")), 20),
+    }
+    for level in sorted(LEVELS):
+        benches[f"gl.maze.draw.level{level}"] = (lambda level=level: finished(Maze(level=level).draw), 50)
+    return benches
+
+
+# ---------------------------------------------------
+# REPORT
+# ---------------------------------------------------
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'benchmark':<28}{'base ns':>12}{'now ns':>12}{'change':>9}")
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:<28}{'-':>12}{res['ns_per_op']:12.0f}{'new':>9}")
+            continue
+        change = res["ns_per_op"] / base["ns_per_op"] - 1.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<28}{base['ns_per_op']:12.0f}{res['ns_per_op']:12.0f}{change:+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazeTilt hot path microbenchmarks")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="JSON results file")
+    parser.add_argument("--compare", metavar="BASELINE", default=None, help="Baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown counted as regression")
+    parser.add_argument("--min-time", type=float, default=0.3, help="Seconds per benchmark")
+    parser.add_argument("--filter", default=None, help="Only benchmarks containing this string")
+    parser.add_argument("--gl", action="store_true", help="Also time the OpenGL draw functions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        benches = cpu_benchmarks(tmpdir)
+        if args.gl:
+            benches.update(gl_benchmarks())
+
+        results = {}
+        print(f"{'benchmark':<28}{'ns/op':>12}{'min':>12}{'rounds':>8}")
+        for name, (setup, number) in benches.items():
+            if args.filter and args.filter not in name:
+                continue
+            res = measure(setup(), number, args.min_time)
+            results[name] = res
+            print(f"{name:<28}{res['ns_per_op']:12.0f}{res['min_ns']:12.0f}{res['rounds']:8d}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
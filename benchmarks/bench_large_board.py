@@ -0,0 +1,146 @@
+'''
+Rendering and physics on large boards (levels with "width" / "depth").
+
+Generates boards of 2500, 10000 and 40000 walls (a seeded lattice of short walls,
+with holes), renders them with the follow camera of maze_tilt.py --follow-camera
+on a hidden window and reports, per board:
+  - frame time with frustum culling of the chunks, and without (--no-unculled to skip)
+  - chunks drawn out of the chunks of the board
+  - physics step time with the collision grid, and testing every wall
+The exit code is 1 when the culled frame time of the largest board is more than
+--max-ratio times the one of the smallest: with culling the cost must follow what
+is on screen, not the size of the board.
+
+Usage (from the repository root):
+  python benchmarks/bench_large_board.py
+  python benchmarks/bench_large_board.py --walls 10000 --walls 90000 --frames 300
+
+Without a display the SDL "offscreen" driver (EGL, Mesa llvmpipe) is used.
+'''
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from offscreen import open_offscreen_window, gl_info
+
+import pygame
+from OpenGL.GL import glFinish
+import maze_tilt
+from maze import Maze
+from simulation import GameSimulation
+
+SPACING = 2.0           # lattice step: one wall per SPACING x SPACING cell
+HOLE_EVERY = 50         # one hole every HOLE_EVERY walls
+MAX_RATIO = 2.0
+
+
+def large_level(n_walls, seed=0):
+    # square board with ~n_walls short walls on a lattice, start and goal corners left free
+    rng = random.Random(seed)
+    side = int(math.ceil(math.sqrt(n_walls)))
+    size = side * SPACING + 4.0
+    x0 = z0 = -size / 2.0 + 2.0
+    walls, holes = [], []
+    for i in range(side):
+        for j in range(side):
+            if len(walls) >= n_walls:
+                break
+            x, z = x0 + i * SPACING, z0 + j * SPACING
+            if rng.random() < 0.5:
+                walls.append((x, z, SPACING * 0.7, 0.3))
+            else:
+                walls.append((x, z, 0.3, SPACING * 0.7))
+            if len(walls) % HOLE_EVERY == 0:
+                holes.append((x + SPACING * 0.5, z + SPACING * 0.5, 0.5))
+    return {"width": size, "depth": size, "walls": walls, "holes": holes}
+
+
+def ball_path(i, frames, size):
+    # the ball crosses the board, the camera follows it
+    a = 2.0 * math.pi * i / max(frames, 1)
+    r = size * 0.4
+    return r * math.sin(a), r * math.sin(2.0 * a), 8.0 * math.cos(2.0 * a), 8.0 * math.cos(a)
+
+
+def frame_times(maze, frames, cull):
+    from ball import Ball
+
+    maze.cull = cull
+    ball = Ball(0.0, 0.0)
+    times, drawn = [], 0
+    for i in range(-10, frames):       # 10 frames of warm-up (display lists of the chunks)
+        ball.x, ball.z, tilt_x, tilt_z = ball_path(max(i, 0), frames, maze.width)
+        start = time.perf_counter()
+        maze_tilt.render_scene(maze, ball, tilt_x, tilt_z, follow=True)
+        glFinish()
+        if i >= 0:
+            times.append((time.perf_counter() - start) * 1000.0)
+            drawn += maze.drawn_chunks
+        pygame.display.flip()
+    times.sort()
+    return sum(times) / len(times), times[int(len(times) * 0.95)], drawn / frames
+
+
+def step_time(level, steps, grid):
+    sim = GameSimulation(levels={1: level})
+    if not grid:
+        sim.maze._grid = None
+    start = time.perf_counter()
+    for i in range(steps):
+        a = 2.0 * math.pi * i / 600.0
+        sim.step(1.0 / 60.0, 12.0 * math.sin(a), 12.0 * math.cos(1.7 * a))
+        sim.lives = 3
+    return (time.perf_counter() - start) / steps * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frustum culling and collision grid on large MazeTilt boards")
+    parser.add_argument("--walls", type=int, action="append", help="Walls of a board (repeatable, default 2500 10000 40000)")
+    parser.add_argument("--frames", type=int, default=120, help="Frames per board")
+    parser.add_argument("--steps", type=int, default=3000, help="Physics steps per board")
+    parser.add_argument("--no-unculled", action="store_true", help="Do not measure the frames without culling")
+    parser.add_argument("--max-ratio", type=float, default=MAX_RATIO, help="Budget: culled frame time, largest / smallest board")
+    parser.add_argument("--offscreen", action="store_true", help="Use the EGL offscreen driver even with a display")
+    args = parser.parse_args()
+
+    try:
+        open_offscreen_window((maze_tilt.WIN_WIDTH, maze_tilt.WIN_HEIGHT), args.offscreen)
+    except pygame.error as e:
+        print(f"No OpenGL context available: {e}")
+        sys.exit(2)
+    maze_tilt.init_opengl()
+    renderer, version = gl_info()
+    print(f"{renderer} / OpenGL {version}")
+
+    culled = []
+    for n in sorted(args.walls or [2500, 10000, 40000]):
+        level = large_level(n)
+        maze = Maze(levels={1: level})
+        print(f"\n{len(maze.walls)} walls, {len(maze.holes)} holes, {maze.width:.0f} x {maze.depth:.0f} board, "
+              f"{len(maze.chunks)} chunks")
+        mean, p95, drawn = frame_times(maze, args.frames, True)
+        culled.append(mean)
+        print(f"  culled      {mean:8.3f} ms  p95 {p95:8.3f}  chunks drawn {drawn:.1f}")
+        if not args.no_unculled:
+            mean, p95, drawn = frame_times(maze, args.frames, False)
+            print(f"  not culled  {mean:8.3f} ms  p95 {p95:8.3f}  chunks drawn {drawn:.0f}")
+        print(f"  physics     {step_time(level, args.steps, True):8.2f} us/step with the grid, "
+              f"{step_time(level, max(args.steps // 10, 1), False):8.2f} us/step testing every wall")
+
+    pygame.quit()
+    ratio = culled[-1] / culled[0]
+    print(f"\nculled frame time, largest / smallest board: {ratio:.2f} (budget {args.max_ratio})")
+    if ratio > args.max_ratio:
+        print("over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+'''
+Timing of the feedback events at a local OSC receiver.
+
+Contacts happen at random physics times on a physics clock stepped at 1000 Hz
+(as with maze_tilt.py --physics-process); a frame loop at 60 fps with a
+variable amount of work finds them at its next frame and sends them to a
+receiver on 127.0.0.1, either at once (as maze_tilt.py without --osc-latency)
+or with osc_events.EventScheduler as timetagged bundles. The receiver plays a
+message when it arrives and a bundle at its timetag (when it arrives, if late).
+
+Reported per mode: delay from the contact to the playing (mean), its jitter
+(standard deviation and p99 - p1) and, for the bundles, how many arrived after
+their timetag. The exit code is 1 when the jitter (p99 - p1) of the bundles is
+over --max-jitter-ms or more than 1% of them are late.
+
+Usage (from the repository root):
+  python benchmarks/bench_osc_jitter.py
+  python benchmarks/bench_osc_jitter.py --events 1000 --latency-ms 20 --work-ms 12
+'''
+
+import argparse
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonosc.osc_bundle import OscBundle
+
+from osc_events import EventScheduler, OSC_LATENCY, osc_const
+
+PHYSICS_RATE = 1000
+FPS = 60
+MAX_JITTER_MS = 1.0
+MAX_LATE = 0.01
+
+
+class Receiver(threading.Thread):
+    # (arrival perf_counter(), timetag as perf_counter() or None) of every datagram
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.addr = self.sock.getsockname()
+        self.unix = time.time() - time.perf_counter()
+        self.received = []
+        self.running = True
+
+    def run(self):
+        while self.running:
+            try:
+                dgram = self.sock.recv(4096)
+            except socket.timeout:
+                continue
+            arrival = time.perf_counter()
+            timetag = None
+            if OscBundle.dgram_is_bundle(dgram):
+                timetag = OscBundle(dgram).timestamp - self.unix
+            self.received.append((arrival, timetag))
+
+    def stop(self):
+        self.running = False
+        self.join()
+        self.sock.close()
+
+
+def run(mode, events, latency, work_ms, seed):
+    """
+    Delays (s) from the contacts to the playing at the receiver, and the
+    number of bundles that arrived after their timetag.
+    """
+    rng = random.Random(seed)
+    receiver = Receiver()
+    receiver.start()
+    out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    scheduler = EventScheduler(latency) if mode == "bundle" else None
+
+    t0 = time.perf_counter()
+    # contacts on the physics steps, about 25 per second
+    contacts, t = [], 0.0
+    for _ in range(events):
+        t += math.ceil(rng.expovariate(25.0) * PHYSICS_RATE + 1) / PHYSICS_RATE
+        contacts.append(t)
+
+    sent = 0
+    next_frame = t0
+    while sent < events:
+        # one frame: the physics state published so far, then the work of the frame
+        physics_time = math.floor((time.perf_counter() - t0) * PHYSICS_RATE) / PHYSICS_RATE
+        if scheduler is not None:
+            scheduler.sync(physics_time)
+        while sent < events and contacts[sent] <= physics_time:
+            if scheduler is not None:
+                scheduler.send(receiver.addr, "/bouncing", 1, contacts[sent])
+            else:
+                out.sendto(osc_const("/bouncing", 1), receiver.addr)
+            sent += 1
+        busy_until = time.perf_counter() + rng.uniform(0.0, work_ms) / 1000.0
+        while time.perf_counter() < busy_until:
+            pass
+        next_frame += 1.0 / FPS
+        delay = next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_frame = time.perf_counter()
+
+    end = time.perf_counter() + latency + 0.2
+    while len(receiver.received) < events and time.perf_counter() < end:
+        time.sleep(0.01)
+    receiver.stop()
+    out.close()
+    if scheduler is not None:
+        scheduler.close()
+
+    delays, late = [], 0
+    for contact, (arrival, timetag) in zip(contacts, receiver.received):
+        played = arrival
+        if timetag is not None:
+            if arrival > timetag:
+                late += 1
+            else:
+                played = timetag
+        delays.append(played - (t0 + contact))
+    return delays, late
+
+
+def stats(delays):
+    n = len(delays)
+    mean = sum(delays) / n
+    std = math.sqrt(sum((d - mean) ** 2 for d in delays) / n)
+    s = sorted(delays)
+    return mean * 1000.0, std * 1000.0, (s[int(n * 0.99) - 1] - s[int(n * 0.01)]) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jitter of the MazeTilt OSC feedback events at a local receiver")
+    parser.add_argument("--events", type=int, default=300, help="Events per mode")
+    parser.add_argument("--latency-ms", type=float, default=OSC_LATENCY * 1000.0, help="Latency of the timetags")
+    parser.add_argument("--work-ms", type=float, default=8.0, help="Work of a frame: uniform from 0 to this")
+    parser.add_argument("--max-jitter-ms", type=float, default=MAX_JITTER_MS, help="Budget: p99 - p1 of the bundle delays")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{args.events} events, frame work 0-{args.work_ms:g} ms at {FPS} fps, physics at {PHYSICS_RATE} Hz")
+    print("mode       delay ms   std ms  p99-p1 ms   late")
+    for mode in ("immediate", "bundle"):
+        delays, late = run(mode, args.events, args.latency_ms / 1000.0, args.work_ms, args.seed)
+        if len(delays) < args.events:
+            print(f"{mode:9}  only {len(delays)} of {args.events} events received")
+            failed = True
+            continue
+        mean, std, spread = stats(delays)
+        print(f"{mode:9} {mean:9.3f} {std:8.3f} {spread:10.3f} {late:6d}")
+        if mode == "bundle" and (spread > args.max_jitter_ms or late > MAX_LATE * len(delays)):
+            failed = True
+    if failed:
+        print(f"over budget (bundle jitter {args.max_jitter_ms} ms, late {MAX_LATE:.0%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
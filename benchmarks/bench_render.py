@@ -0,0 +1,170 @@
+'''
+Offscreen rendering benchmark of the real render path of maze_tilt.py.
+
+Renders N frames per level with render_scene() + render_overlay() (the functions the
+game loop calls) on a hidden window, with the ball moving on a fixed path, and reports
+frames per second and per-call timings (clear, maze.draw, draw_sphere, hud).
+
+Usage (from the repository root):
+  python benchmarks/bench_render.py --frames 300
+  python benchmarks/bench_render.py --frames 60 --dump frames/ref             # save the frames as png
+  python benchmarks/bench_render.py --frames 60 --check frames/ref             # compare with saved frames
+  python benchmarks/bench_render.py --no-gl-checks                            # without PyOpenGL error checking
+  xvfb-run -s "-screen 0 1024x768x24" python benchmarks/bench_render.py       # virtual framebuffer
+
+Without a display the SDL "offscreen" driver (EGL, Mesa llvmpipe) is used.
+By default glFinish() is called at the end of every stage so the timings include the
+work of the driver; --no-sync measures only the Python side.
+'''
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+if "--no-gl-checks" in sys.argv:
+    import OpenGL
+    OpenGL.ERROR_CHECKING = False
+
+from offscreen import open_offscreen_window, gl_info, read_frame
+
+import pygame
+from OpenGL.GL import glFinish
+import maze_tilt
+from ball import Ball
+from maze import Maze
+from levels import LEVELS
+from simulation import START_POS
+from profiler import FrameProfiler
+
+
+class SyncProfiler(FrameProfiler):
+    def lap(self, name):
+        glFinish()
+        FrameProfiler.lap(self, name)
+
+
+def ball_path(i, frames):
+    # deterministic path over the whole board, with a tilt that follows it
+    a = 2.0 * math.pi * i / max(frames, 1)
+    x = 8.0 * math.sin(3.0 * a)
+    z = 13.0 * math.sin(2.0 * a)
+    return x, z, 10.0 * math.cos(2.0 * a), 10.0 * math.cos(3.0 * a)
+
+
+def frame_difference(a, b):
+    import numpy as np
+    pa = pygame.surfarray.array3d(a).astype(np.int16)
+    pb = pygame.surfarray.array3d(b).astype(np.int16)
+    if pa.shape != pb.shape:
+        return 255, 1.0
+    diff = np.abs(pa - pb).max(axis=2)
+    return int(diff.max()), float(np.count_nonzero(diff) / diff.size)
+
+
+def run_level(level, frames, font, sync, dump_dir, check_dir, tolerance):
+    maze = Maze(level=level)
+    ball = Ball(*START_POS)
+    size = (maze_tilt.WIN_WIDTH, maze_tilt.WIN_HEIGHT)
+    prof = SyncProfiler(window=frames) if sync else FrameProfiler(window=frames)
+    mismatches = []
+
+    start = time.perf_counter()
+    for i in range(frames):
+        ball.x, ball.z, tilt_x, tilt_z = ball_path(i, frames)
+
+        prof.begin_frame()
+        maze_tilt.render_scene(maze, ball, tilt_x, tilt_z, prof)
+        maze_tilt.render_overlay(font, "PLAY", "bench", "1", "name", level, len(LEVELS),
+                                 3, i / 60.0, i // 10, prof=prof)
+
+        if dump_dir or check_dir:
+            glFinish()
+            frame = read_frame(size)
+            name = f"level{level}_{i:05d}.png"
+            if dump_dir:
+                pygame.image.save(frame, os.path.join(dump_dir, name))
+            if check_dir:
+                ref = os.path.join(check_dir, name)
+                if os.path.exists(ref):
+                    max_diff, share = frame_difference(frame, pygame.image.load(ref))
+                    if max_diff > tolerance:
+                        mismatches.append((name, max_diff, share))
+            prof.lap("readback")
+
+        pygame.display.flip()
+        prof.lap("flip")
+        prof.end_frame()
+    glFinish()
+    elapsed = time.perf_counter() - start
+
+    stats = prof.stats()
+    return {
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed,
+        "stages_ms": {name: {"mean": m, "p95": p, "max": x} for name, (m, p, x) in stats.items()},
+        "mismatches": mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offscreen benchmark of the MazeTilt render path")
+    parser.add_argument("--frames", type=int, default=300, help="Frames per level")
+    parser.add_argument("--level", type=int, action="append", help="Only these levels")
+    parser.add_argument("--dump", metavar="DIR", default=None, help="Save every frame as png")
+    parser.add_argument("--check", metavar="DIR", default=None, help="Compare every frame with the png in DIR")
+    parser.add_argument("--tolerance", type=int, default=0, help="Max per-channel difference accepted by --check")
+    parser.add_argument("--no-sync", action="store_true", help="Do not glFinish() after every stage")
+    parser.add_argument("--no-gl-checks", action="store_true", help="Disable PyOpenGL error checking, as maze_tilt.py --no-gl-checks")
+    parser.add_argument("--offscreen", action="store_true", help="Use the EGL offscreen driver even with a display")
+    parser.add_argument("--out", default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    try:
+        open_offscreen_window((maze_tilt.WIN_WIDTH, maze_tilt.WIN_HEIGHT), args.offscreen)
+    except pygame.error as e:
+        print(f"No OpenGL context available: {e}")
+        sys.exit(2)
+    maze_tilt.init_opengl()
+    font = pygame.font.SysFont("Arial", 20, bold=True)
+    renderer, version = gl_info()
+    print(f"{renderer} / OpenGL {version}")
+
+    if args.dump:
+        os.makedirs(args.dump, exist_ok=True)
+
+    results = {}
+    failed = False
+    for level in (args.level or sorted(LEVELS)):
+        res = run_level(level, args.frames, font, not args.no_sync, args.dump, args.check, args.tolerance)
+        results[f"level{level}"] = res
+
+        stages = res["stages_ms"]
+        print(f"\nLevel {level}: {res['fps']:.1f} fps ({res['frames']} frames)")
+        for name in ("clear", "maze.draw", "draw_sphere", "hud", "readback", "flip", "frame"):
+            if name in stages:
+                st = stages[name]
+                print(f"  {name:<12}{st['mean']:8.3f} ms  p95 {st['p95']:8.3f}  max {st['max']:8.3f}")
+        if args.check:
+            print(f"  frames different from {args.check}: {len(res['mismatches'])}")
+            for name, max_diff, share in res["mismatches"][:5]:
+                print(f"    {name}: max diff {max_diff}, {share:.2%} of the pixels")
+            failed = failed or bool(res["mismatches"])
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"renderer": renderer, "gl_version": version, "levels": results}, f, indent=1)
+
+    pygame.quit()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
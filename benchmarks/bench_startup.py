@@ -0,0 +1,116 @@
+'''
+Startup time of maze_tilt.py: time to the first frame, per startup stage.
+
+Starts `python maze_tilt.py --startup-report` N times per variant in a
+temporary working directory (with a copy of the results CSVs, so the
+leaderboard is loaded as in the lab), reads the report printed after the
+first frame and stops the game. Reported values are medians.
+
+Variants:
+  default        font cache warm (after the first run)
+  cold-font      font cache removed before every run (the first start on a PC)
+  no-gl-checks   --no-gl-checks
+  audio+vib      --audio --vibration (OSC clients created)
+
+Usage (from the repository root):
+  python benchmarks/bench_startup.py --runs 7
+  python benchmarks/bench_startup.py --variant default --variant no-gl-checks
+
+Without a display the SDL "offscreen" driver is used.
+'''
+
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from offscreen import headless
+from startup import FONT_CACHE_FILE
+
+VARIANTS = {
+    "default": [],
+    "cold-font": [],
+    "no-gl-checks": ["--no-gl-checks"],
+    "audio+vib": ["--audio", "--vibration"],
+}
+MARK = re.compile(r"^\s+(.+?)\s+([\d.]+) ms\s+at\s+([\d.]+) ms")
+BACKGROUND = re.compile(r"^\s+OSC server.*ready at\s+([\d.]+) ms")
+
+
+def run_once(workdir, extra, timeout=60.0):
+    env = dict(os.environ)
+    if headless():
+        env["SDL_VIDEODRIVER"] = "offscreen"
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "maze_tilt.py"), "--startup-report"] + extra,
+                            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    marks = {}
+    wall = None
+    try:
+        # the report ends with the line of the OSC server started in background
+        for line in proc.stdout:
+            m = MARK.match(line)
+            if m:
+                marks[m.group(1)] = float(m.group(3))
+                if m.group(1) == "first frame":
+                    wall = (time.perf_counter() - start) * 1000.0
+            m = BACKGROUND.match(line)
+            if m:
+                marks["OSC server (background)"] = float(m.group(1))
+                break
+            if time.perf_counter() - start > timeout:
+                break
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    if wall is None:
+        raise RuntimeError("no startup report (does maze_tilt.py start here?)")
+    marks["process start -> first frame"] = wall
+    return marks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="maze_tilt.py startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per variant")
+    parser.add_argument("--variant", action="append", choices=list(VARIANTS), help="Only these variants")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results_src = os.path.join(ROOT, "results")
+        os.makedirs(os.path.join(workdir, "results"))
+        for name in ("results.csv", "level_times.csv"):
+            if os.path.isfile(os.path.join(results_src, name)):
+                shutil.copy(os.path.join(results_src, name), os.path.join(workdir, "results", name))
+
+        table = {}
+        for variant in (args.variant or list(VARIANTS)):
+            runs = []
+            for _ in range(args.runs):
+                if variant == "cold-font" and os.path.exists(os.path.join(workdir, FONT_CACHE_FILE)):
+                    os.remove(os.path.join(workdir, FONT_CACHE_FILE))
+                runs.append(run_once(workdir, VARIANTS[variant]))
+            table[variant] = {name: statistics.median(r[name] for r in runs if name in r)
+                              for name in runs[0]}
+
+    names = list(next(iter(table.values())))
+    print(f"\nmedian of {args.runs} runs, ms since the start of maze_tilt.py (last row: since process start)")
+    print(f"{'stage':<32}" + "".join(f"{v:>14}" for v in table))
+    for name in names:
+        print(f"{name:<32}" + "".join(f"{table[v].get(name, float('nan')):14.1f}" for v in table))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# ---------------------------------------------------
+# CONFIG
+# ---------------------------------------------------
+# Constants shared by the game (maze_tilt.py) and the tools that run without
+# a window (game_server.py, batch_physics.py, results/heatmap.py): no pygame
+# and no OpenGL here.
+import os
+
+IP_ADDRESS = "192.168.0.14"  # IP address of the OSC device (Teensy in our case, but work also for Pure Data on the same PC)
+
+MODALITA_MAP = {
+    0: "Solo video",
+    1: "Video + Audio",
+    2: "Video + Audio + Vibrazione"
+}
+
+MAX_ROLL_SPEED = 16.0
+ROLL_ON_THRESHOLD = 0.05
+FPS = 60
+RESULTS_FILE = os.path.join("results", "results.csv")
+LEVEL_TIMES_FILE = os.path.join("results", "level_times.csv")
+RESULTS_HEADER = ["Nome", "Tentativo", "Modalità_ID", "Modalità", "Livello_raggiunto", "Esito",
+                  "Tempo_totale_sec", "Collisioni_muri", "Vite_rimanenti"]
+LEVEL_TIMES_HEADER = ["Nome", "Tentativo", "Modalità_ID", "Livello", "Tempo_sec"]
+
+# ---------------------------------------------------
+# PHYSICS
+# ---------------------------------------------------
+MAZE_WIDTH = 20.0
+MAZE_DEPTH = 30.0
+BALL_RADIUS = 0.6
+GRAVITY = 50
+FRICTION = 0.99
+MAX_TILT_DEG = 18
+START_POS = (0.0, -(MAZE_DEPTH / 2.0) + 3.0)  # (x, z), on the default board (start_pos())
+START_LIVES = 3
+COLLISION_SPEED_THRESHOLD = 0.15
+HOLE_VIBRATION_MAX = 180   # PWM max
+HOLE_VIBRATION_MIN = 40    # min vibration
+GOAL_RECT = (MAZE_WIDTH / 2.0 - 3.0, MAZE_DEPTH / 2.0 - 3.5, 2.2, 2.2)# Goal: rect in XZ plane (x, z, w, d), default board
+REFERENCE_RATE = 60.0      # FRICTION is a per-step factor tuned at 60 steps per second
+WALL_RESTITUTION = 0.80
+WALL_TANGENTIAL = 0.96
+
+
+def friction_for_rate(rate_hz, friction=FRICTION):
+    # same damping per second when stepping at rate_hz instead of REFERENCE_RATE
+    return friction ** (REFERENCE_RATE / rate_hz)
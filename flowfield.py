@@ -0,0 +1,272 @@
+# ---------------------------------------------------
+# FLOW FIELD
+# ---------------------------------------------------
+# Distance to GOAL_RECT of every cell of a level (Dijkstra over the occupancy
+# grid, 8-connected) and, per cell, the direction the ball should take. The
+# centre of the ball cannot be in a wall or in the fall disk of a hole; cells
+# closer than WALL_CLEARANCE to a wall and the vibration area of the holes
+# cost more, so the paths keep away from both. Computed
+# once per level and kept in FLOW_CACHE_DIR, looked up in O(1) per frame.
+#
+#   python flowfield.py                  # autopilot on all the levels, headless
+#   python flowfield.py --generated 7    # on generated levels
+import hashlib
+import heapq
+import os
+
+import numpy as np
+
+from levels import LEVELS, WALL_THICKNESS, build_walls
+from occupancy import CELL, OccupancyGrid
+from simulation import MAZE_WIDTH, MAZE_DEPTH, BALL_RADIUS, MAX_TILT_DEG, GOAL_RECT, clamp
+
+FLOW_CACHE_DIR = ".flowfield_cache"
+FLOW_VERSION = 1
+WALL_CLEARANCE = BALL_RADIUS * 1.5
+WALL_PENALTY = 8.0          # extra cost per step closer than WALL_CLEARANCE to a wall
+HOLE_PENALTY = 20.0         # extra cost per step at the edge of a hole (0 out of its vibration area)
+LOOKAHEAD = 8               # cells followed downhill to smooth the direction
+
+AUTOPILOT_SPEED = 4.0       # target speed along the field (units/s)
+AUTOPILOT_GAIN = 4.0        # degrees of tilt per unit/s of speed error
+
+_NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+class FlowField:
+    """
+    dist[iz, ix] (inf where the ball cannot be or cannot reach the goal) and a
+    unit direction per cell; direction(x, z) is a lookup.
+    """
+    def __init__(self, dist, dir_x, dir_z, cell=CELL, x0=-MAZE_WIDTH / 2.0, z0=-MAZE_DEPTH / 2.0):
+        self.dist = dist
+        self.dir_x = dir_x
+        self.dir_z = dir_z
+        self.cell = cell
+        self.x0 = x0
+        self.z0 = z0
+        self.nz, self.nx = dist.shape
+        # flat python lists: one index per lookup, no numpy scalars
+        self._dx = dir_x.ravel().tolist()
+        self._dz = dir_z.ravel().tolist()
+
+    def index(self, x, z):
+        ix = min(max(int((x - self.x0) / self.cell), 0), self.nx - 1)
+        iz = min(max(int((z - self.z0) / self.cell), 0), self.nz - 1)
+        return iz * self.nx + ix
+
+    def direction(self, x, z):
+        i = self.index(x, z)
+        return self._dx[i], self._dz[i]
+
+    def distance(self, x, z):
+        i = self.index(x, z)
+        return float(self.dist.flat[i])
+
+
+def compute_flow_field(level_data, cell=CELL, goal=GOAL_RECT):
+    walls = build_walls(level_data, MAZE_WIDTH, MAZE_DEPTH, WALL_THICKNESS)
+    holes = level_data["holes"]
+    solid = OccupancyGrid(walls, holes, cell, radius=0.0).blocked
+    near_wall = OccupancyGrid(walls, [], cell, radius=WALL_CLEARANCE).blocked
+    grid = OccupancyGrid([], [], cell)
+
+    cost = np.ones(solid.shape)
+    cost[near_wall] += WALL_PENALTY
+    for (hx, hz, r) in holes:
+        # grows from the edge of the vibration area (3 r) to the edge of the hole
+        d = np.hypot(grid.xs[None, :] - hx, grid.zs[:, None] - hz)
+        cost += HOLE_PENALTY * np.clip((r * 3.0 - d) / (r * 2.0), 0.0, 1.0)
+
+    # Dijkstra from all the free cells of the goal
+    nz, nx = solid.shape
+    dist = np.full(solid.shape, np.inf)
+    dist_l = dist.tolist()
+    cost_l = cost.tolist()
+    solid_l = solid.tolist()
+    heap = []
+    for iz, ix in zip(*np.nonzero(grid.rect_mask(goal) & ~solid)):
+        dist_l[iz][ix] = 0.0
+        heap.append((0.0, int(iz), int(ix)))
+    heapq.heapify(heap)
+    while heap:
+        d, iz, ix = heapq.heappop(heap)
+        if d > dist_l[iz][ix]:
+            continue
+        for oz, ox in _NEIGHBOURS:
+            jz, jx = iz + oz, ix + ox
+            if 0 <= jz < nz and 0 <= jx < nx and not solid_l[jz][jx]:
+                if oz and ox:
+                    if solid_l[iz][jx] or solid_l[jz][ix]:
+                        continue    # no diagonal step through a corner
+                    step = 1.4142135623730951
+                else:
+                    step = 1.0
+                nd = d + step * 0.5 * (cost_l[iz][ix] + cost_l[jz][jx])
+                if nd < dist_l[jz][jx]:
+                    dist_l[jz][jx] = nd
+                    heapq.heappush(heap, (nd, jz, jx))
+    dist = np.array(dist_l)
+
+    # next cell downhill, then LOOKAHEAD steps along it for a smooth direction
+    flat = dist.ravel()
+    nxt = np.arange(flat.size)
+    best = flat.copy()
+    padded = np.pad(dist, 1, constant_values=np.inf)
+    iz, ix = np.divmod(np.arange(flat.size), nx)
+    for oz, ox in _NEIGHBOURS:
+        d = padded[1 + oz:1 + oz + nz, 1 + ox:1 + ox + nx].ravel()
+        better = d < best
+        best[better] = d[better]
+        nxt[better] = (iz[better] + oz) * nx + ix[better] + ox
+    # the farthest cell of the chain (up to LOOKAHEAD) in straight line without
+    # touching a wall or a hole on the way, so the direction does not cut corners
+    touch = OccupancyGrid(walls, holes, cell, radius=BALL_RADIUS).blocked.ravel()
+    chain = [nxt]
+    for _ in range(LOOKAHEAD - 1):
+        chain.append(nxt[chain[-1]])
+    target = nxt.copy()
+    for ahead in chain[1:]:
+        az, ax = np.divmod(ahead, nx)
+        clear = np.ones(flat.size, dtype=bool)
+        for s in np.linspace(0.0, 1.0, 9)[1:]:
+            sz = np.rint(iz + (az - iz) * s).astype(np.int64)
+            sx = np.rint(ix + (ax - ix) * s).astype(np.int64)
+            clear &= ~touch[sz * nx + sx]
+        target[clear] = ahead[clear]
+    tz, tx = np.divmod(target, nx)
+    vx = (tx - ix).astype(float)
+    vz = (tz - iz).astype(float)
+    norm = np.hypot(vx, vz)
+    norm[norm == 0] = 1.0
+    dir_x = (vx / norm).reshape(dist.shape)
+    dir_z = (vz / norm).reshape(dist.shape)
+    return FlowField(dist, dir_x, dir_z, cell)
+
+
+def level_key(level_data, cell=CELL):
+    text = repr((FLOW_VERSION, cell, WALL_CLEARANCE, WALL_PENALTY, HOLE_PENALTY, LOOKAHEAD, GOAL_RECT,
+                 level_data["walls"], level_data["holes"]))
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+_fields = {}
+
+def flow_field(level_data, cell=CELL, cache_dir=FLOW_CACHE_DIR):
+    """
+    FlowField of a level: from memory, from cache_dir or computed (and saved there).
+    """
+    key = level_key(level_data, cell)
+    field = _fields.get(key)
+    if field is not None:
+        return field
+    path = os.path.join(cache_dir, key + ".npz") if cache_dir else None
+    if path and os.path.isfile(path):
+        try:
+            with np.load(path) as data:
+                field = FlowField(data["dist"], data["dir_x"], data["dir_z"], cell)
+        except (OSError, ValueError, KeyError):
+            field = None
+    if field is None:
+        field = compute_flow_field(level_data, cell)
+        if path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                np.savez_compressed(path, dist=field.dist, dir_x=field.dir_x, dir_z=field.dir_z)
+            except OSError:
+                pass
+    _fields[key] = field
+    return field
+
+
+# ---------------------------------------------------
+# AUTOPILOT
+# ---------------------------------------------------
+class Autopilot:
+    """
+    Tilt source for automated tests: update(ball, level) -> (tilt_x_deg, tilt_z_deg)
+    steers the ball velocity toward AUTOPILOT_SPEED along the flow field.
+    """
+    def __init__(self, levels=LEVELS, speed=AUTOPILOT_SPEED, gain=AUTOPILOT_GAIN,
+                 max_tilt=MAX_TILT_DEG, cache_dir=FLOW_CACHE_DIR):
+        self.levels = levels
+        self.cache_dir = cache_dir
+        self.fields = {}
+        self.speed = speed
+        self.gain = gain
+        self.max_tilt = max_tilt
+
+    def field(self, level):
+        # computed (or loaded) the first time a level is played
+        field = self.fields.get(level)
+        if field is None:
+            field = self.fields[level] = flow_field(self.levels[level], cache_dir=self.cache_dir)
+        return field
+
+    def update(self, ball, level):
+        dx, dz = self.field(level).direction(ball.x, ball.z)
+        # tilt_z accelerates along x, tilt_x along z (Ball.update)
+        tilt_z = clamp(self.gain * (dx * self.speed - ball.vx), -self.max_tilt, self.max_tilt)
+        tilt_x = clamp(self.gain * (dz * self.speed - ball.vz), -self.max_tilt, self.max_tilt)
+        return tilt_x, tilt_z
+
+
+def run_autopilot(levels=LEVELS, rate=60.0, max_sec=120.0):
+    """
+    Plays all the levels headless with the autopilot; per level (seconds, wall collisions, falls)
+    and the final state.
+    """
+    from simulation import GameSimulation
+
+    pilot = Autopilot(levels)
+    sim = GameSimulation(levels=levels)
+    dt = 1.0 / rate
+    per_level = {}
+    level, level_t, hits, falls = sim.level, 0.0, sim.wall_collisions, 0
+    t = 0.0
+    while sim.state == "PLAY" and t < max_sec:
+        tilt_x, tilt_z = pilot.update(sim.ball, sim.level)
+        sim.step(dt, tilt_x, tilt_z)
+        t += dt
+        falls += sim.fell
+        if sim.level_completed:
+            per_level[level] = (t - level_t, sim.wall_collisions - hits, falls)
+            level, level_t, hits, falls = sim.level, t, sim.wall_collisions, 0
+    return per_level, sim.state
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Flow fields of the levels and the autopilot")
+    parser.add_argument("--generated", type=int, default=None, metavar="SEED", help="Generated levels (levelgen.py) instead of levels.py")
+    parser.add_argument("--rate", type=float, default=60.0, help="Physics steps per second")
+    args = parser.parse_args()
+
+    levels = LEVELS
+    if args.generated is not None:
+        from levelgen import generate_levels
+        levels = generate_levels(args.generated, len(LEVELS))
+
+    for k, v in levels.items():
+        t0 = time.perf_counter()
+        compute_flow_field(v)
+        t1 = time.perf_counter()
+        field = flow_field(v)
+        t2 = time.perf_counter()
+        n = 100000
+        for i in range(n):
+            field.direction(-9.0 + (i % 180) * 0.1, -14.0 + (i % 280) * 0.1)
+        t3 = time.perf_counter()
+        print(f"level {k}: computed in {(t1 - t0) * 1000.0:.0f} ms, loaded in {(t2 - t1) * 1000.0:.1f} ms, "
+              f"lookup {(t3 - t2) / n * 1e9:.0f} ns")
+
+    per_level, state = run_autopilot(levels, args.rate)
+    for k, (sec, hits, falls) in per_level.items():
+        print(f"level {k}: {sec:6.1f} s, {hits} wall collisions, {falls} falls")
+    print(f"autopilot: {state}")
+
+
+if __name__ == "__main__":
+    main()
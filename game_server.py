@@ -0,0 +1,426 @@
+'''
+Multi-session game server: N independent games (one per gamepad / station)
+in a single process, without windows.
+
+Every session has its own accelerometer input port and its own feedback host
+(the ports of the OSC clients of maze_tilt.py: vibration 2222, audio 9000-9003).
+One selectors loop reads the datagrams of all the input ports, all the games
+advance together at every tick with batch_physics.BatchSimulation, and one
+writer appends the rows of all the sessions to results.csv / level_times.csv.
+
+A session waits until its accelerometer is calibrated, then plays; the time
+is measured from that moment.
+
+Usage (from the repository root):
+  python game_server.py --session Anna:1:4444:192.168.0.14 --session Bruno:1:4445:192.168.0.15:2
+  python game_server.py --emulate 48 --duration 30            # local emulated devices
+
+Session spec: NAME:ATTEMPT:INPUT_PORT[:FEEDBACK_HOST[:MODALITA]]
+(MODALITA 0 = video only, 1 = audio, 2 = audio + vibration, default 0).
+'''
+
+import argparse
+import csv
+import math
+import multiprocessing as mp
+import os
+import random
+import selectors
+import socket
+import time
+
+import numpy as np
+
+from accelerometer import AccelController
+from batch_physics import BatchSimulation, PLAY, STATE_NAMES
+from profiler import FrameProfiler
+from osc_events import osc_dgram, osc_const
+from osc_transport import VIBRATION_PORT, BOUNCING_PORT, BOOM_PORT, ROLLING_PORT, WIN_PORT
+from config import (FPS, IP_ADDRESS, MODALITA_MAP, MAX_ROLL_SPEED, ROLL_ON_THRESHOLD, MAX_TILT_DEG,
+                    RESULTS_HEADER, LEVEL_TIMES_HEADER, friction_for_rate)
+
+STATS_SEC = 5.0
+MAX_DATAGRAM = 4096
+
+
+# ---------------------------------------------------
+# RESULTS
+# ---------------------------------------------------
+class ResultsWriter:
+    """
+    Rows of all the sessions, same files and columns as maze_tilt.py.
+    The files stay open; flush() once per tick.
+    """
+    def __init__(self, results_dir="results"):
+        os.makedirs(results_dir, exist_ok=True)
+        self._files = []
+        self.results = self._open(os.path.join(results_dir, "results.csv"), RESULTS_HEADER)
+        self.level_times = self._open(os.path.join(results_dir, "level_times.csv"), LEVEL_TIMES_HEADER)
+        self.pending = False
+
+    def _open(self, path, header):
+        exists = os.path.isfile(path)
+        f = open(path, mode="a", newline="", encoding="utf-8")
+        self._files.append(f)
+        writer = csv.writer(f)
+        if not exists:
+            writer.writerow(header)
+        return writer
+
+    def level_time(self, name, attempt, modalita, livello, time_sec):
+        self.level_times.writerow([name, attempt, modalita, livello, f"{time_sec:.2f}"])
+        self.pending = True
+
+    def result(self, name, attempt, modalita, livello, result, time_sec, wall_hits, lives):
+        self.results.writerow([name, attempt, modalita, MODALITA_MAP.get(modalita, "Sconosciuta"),
+                               livello, result, f"{time_sec:.2f}", wall_hits, lives])
+        self.pending = True
+
+    def flush(self):
+        if self.pending:
+            for f in self._files:
+                f.flush()
+            self.pending = False
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+
+# ---------------------------------------------------
+# SESSION
+# ---------------------------------------------------
+class Session:
+    """
+    Input socket, AccelController (fed by the server loop) and feedback
+    endpoints of one station. The game state is row `index` of the batch.
+    """
+    def __init__(self, index, name, attempt, port, host=IP_ADDRESS, modalita=0, bind_ip="0.0.0.0"):
+        self.index = index
+        self.name = name
+        self.attempt = attempt
+        self.port = port
+        self.modalita = modalita
+        self.audio = modalita >= 1
+        self.vibration = modalita == 2
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((bind_ip, port))
+        self.sock.setblocking(False)
+        self.accel = AccelController(osc_port=port, serve=False)
+
+        self.vibration_addr = (host, VIBRATION_PORT)
+        self.bouncing_addr = (host, BOUNCING_PORT)
+        self.boom_addr = (host, BOOM_PORT)
+        self.rolling_addr = (host, ROLLING_PORT)
+        self.win_addr = (host, WIN_PORT)
+
+        self.state = "WAIT"    # WAIT (calibration), PLAY, WIN, GAME_OVER
+        self.rolling_on = False
+        self.start_time = 0.0
+        self.level_start_time = 0.0
+        self.finished_at = None
+
+    def receive(self):
+        # all the datagrams waiting on the socket
+        count = 0
+        while True:
+            try:
+                data = self.sock.recv(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return count
+            except OSError:
+                return count
+            try:
+                self.accel.dispatcher.call_handlers_for_packet(data, None)
+            except Exception:
+                pass    # malformed packet
+            count += 1
+
+    def restart(self):
+        self.accel.tilt_x_deg = 0.0
+        self.accel.tilt_z_deg = 0.0
+        self.state = "WAIT" if not self.accel.calibrated else "PLAY"
+        self.rolling_on = False
+        self.finished_at = None
+
+    def close(self):
+        self.sock.close()
+        self.accel.close()
+
+
+def parse_session(spec, index):
+    parts = spec.split(":")
+    if len(parts) < 3:
+        raise argparse.ArgumentTypeError(f"session '{spec}': expected NAME:ATTEMPT:INPUT_PORT[:FEEDBACK_HOST[:MODALITA]]")
+    name, attempt, port = parts[0], parts[1], int(parts[2])
+    host = parts[3] if len(parts) > 3 and parts[3] else IP_ADDRESS
+    modalita = int(parts[4]) if len(parts) > 4 else 0
+    return Session(index, name, attempt, port, host, modalita)
+
+
+# ---------------------------------------------------
+# SERVER
+# ---------------------------------------------------
+class GameServer:
+    def __init__(self, sessions, writer, rate=FPS, loop=False, restart_after=3.0):
+        self.sessions = sessions
+        self.writer = writer
+        self.rate = rate
+        self.loop = loop
+        self.restart_after = restart_after
+        # same damping per second as maze_tilt.py at any --rate
+        self.sim = BatchSimulation(len(sessions), friction=friction_for_rate(rate))
+        self.tilt_x = np.zeros(len(sessions))
+        self.tilt_z = np.zeros(len(sessions))
+        self.active = np.zeros(len(sessions), dtype=bool)
+        self.out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.out.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        for session in sessions:
+            self.selector.register(session.sock, selectors.EVENT_READ, session)
+
+        self.prof = FrameProfiler(window=int(rate * STATS_SEC))
+        self.datagrams = 0
+        self.sent = 0
+        self.io_time = 0.0    # seconds spent reading the input sockets
+        self.ticks = 0
+
+    def send(self, dgram, addr):
+        try:
+            self.out.sendto(dgram, addr)
+            self.sent += 1
+        except OSError:
+            pass    # full buffer / unreachable host: feedback is best effort
+
+    # -------- one tick --------
+    def tick(self, now, dt):
+        prof = self.prof
+        sim = self.sim
+        prof.begin_frame()
+
+        for s in self.sessions:
+            if s.state == "WAIT":
+                s.accel.update()
+                if s.accel.calibrated:
+                    s.state = "PLAY"
+                    s.start_time = s.level_start_time = now
+                    sim.restart(s.index)
+            elif s.state == "PLAY":
+                tx, tz = s.accel.update()
+                self.tilt_x[s.index] = max(-MAX_TILT_DEG, min(MAX_TILT_DEG, tx))
+                self.tilt_z[s.index] = max(-MAX_TILT_DEG, min(MAX_TILT_DEG, tz))
+            elif self.loop and now - s.finished_at > self.restart_after:
+                s.attempt = str(int(s.attempt) + 1) if s.attempt.isdigit() else s.attempt
+                s.restart()
+                if s.state == "PLAY":
+                    s.start_time = s.level_start_time = now
+                    sim.restart(s.index)
+            self.active[s.index] = s.state == "PLAY"
+        prof.lap("input")
+
+        levels = sim.level.copy()
+        sim.step(dt, self.tilt_x, self.tilt_z, self.active)
+        prof.lap("physics")
+
+        for i in np.flatnonzero(self.active):
+            self.feedback(self.sessions[i], i, now, int(levels[i]))
+        prof.lap("feedback")
+
+        self.writer.flush()
+        prof.lap("results")
+        prof.end_frame()
+        self.ticks += 1
+
+    def feedback(self, s, i, now, level):
+        # the feedback of the PLAY branch of maze_tilt.main()
+        sim = self.sim
+        speed = sim.speed[i]
+        if speed > ROLL_ON_THRESHOLD:
+            if not s.rolling_on:
+                if s.audio:
+                    self.send(osc_const("/rolling/on", 1), s.rolling_addr)
+                s.rolling_on = True
+            if s.audio:
+                self.send(osc_dgram("/rolling/velocity", min((speed / MAX_ROLL_SPEED) * 5.0, 5.0)), s.rolling_addr)
+        elif s.rolling_on:
+            if s.audio:
+                self.send(osc_const("/rolling/on", 0), s.rolling_addr)
+            s.rolling_on = False
+
+        if sim.hit_wall[i]:
+            if s.audio:
+                self.send(osc_const("/bouncing", 1), s.bouncing_addr)
+            if s.vibration:
+                self.send(osc_const("/V", 1), s.vibration_addr)
+        if s.vibration:
+            self.send(osc_const("/H", int(sim.hole_vibration[i]) if sim.inside_area[i] else 0), s.vibration_addr)
+
+        if sim.fell[i] and s.audio:
+            self.send(osc_const("/boom", 1), s.boom_addr)
+        if sim.ball_reset[i]:
+            s.accel.tilt_x_deg = 0.0
+            s.accel.tilt_z_deg = 0.0
+
+        if sim.level_completed[i]:
+            if s.audio:
+                self.send(osc_const("/win", 1), s.win_addr)
+                self.send(osc_const("/rolling/on", 0), s.rolling_addr)
+            if s.vibration:
+                self.send(osc_const("/H", 0), s.vibration_addr)
+            s.rolling_on = False
+            self.writer.level_time(s.name, s.attempt, s.modalita, level, now - s.level_start_time)
+            s.level_start_time = now
+
+        if sim.state[i] != PLAY:
+            s.state = STATE_NAMES[sim.state[i]]
+            s.finished_at = now
+            if s.state != "WIN":
+                if s.vibration:
+                    self.send(osc_const("/H", 0), s.vibration_addr)
+                if s.audio:
+                    self.send(osc_const("/rolling/on", 0), s.rolling_addr)
+                s.rolling_on = False
+            self.writer.result(s.name, s.attempt, s.modalita, level, s.state, now - s.start_time,
+                               int(sim.wall_collisions[i]), int(sim.lives[i]))
+
+    # -------- main loop --------
+    def run(self, duration=None):
+        dt = 1.0 / self.rate
+        start = time.perf_counter()
+        next_tick = start
+        last_stats = start
+        last_datagrams = 0
+        last_io = 0.0
+        try:
+            while True:
+                now = time.perf_counter()
+                timeout = next_tick - now
+                if timeout > 0:
+                    for key, _ in self.selector.select(timeout):
+                        t0 = time.perf_counter()
+                        self.datagrams += key.data.receive()
+                        self.io_time += time.perf_counter() - t0
+                    continue
+
+                self.tick(now, dt)
+                next_tick += dt
+                if now - next_tick > 0.25:
+                    next_tick = now    # too far behind: do not try to catch up
+
+                if now - last_stats > STATS_SEC:
+                    print(self.stats(now - last_stats, self.datagrams - last_datagrams, self.io_time - last_io))
+                    last_stats = now
+                    last_datagrams = self.datagrams
+                    last_io = self.io_time
+
+                if duration is not None and now - start > duration:
+                    break
+                if not self.loop and all(s.state in ("WIN", "GAME_OVER") for s in self.sessions):
+                    break
+        except KeyboardInterrupt:
+            pass
+
+    def session_states(self):
+        states = {}
+        for s in self.sessions:
+            states[s.state] = states.get(s.state, 0) + 1
+        return states
+
+    def stats(self, seconds, datagrams, io_time):
+        # tick work and input reading, in ms per tick and share of one core
+        tick = self.prof.stats().get("frame", (0.0, 0.0, 0.0))
+        io_ms = io_time * 1000.0 / max(seconds * self.rate, 1)
+        load = (tick[0] + io_ms) * self.rate / 1000.0
+        return (f"{len(self.sessions)} sessions {self.session_states()} | tick {tick[0]:.3f} ms "
+                f"(p95 {tick[1]:.3f}, max {tick[2]:.3f}) + input {io_ms:.3f} ms at {self.rate} Hz, "
+                f"{load:.0%} of a core | {datagrams / seconds:.0f} datagrams/s in, {self.sent} sent")
+
+    def close(self):
+        self.writer.flush()
+        self.writer.close()
+        for s in self.sessions:
+            self.selector.unregister(s.sock)
+            s.close()
+        self.out.close()
+
+
+# ---------------------------------------------------
+# EMULATED DEVICES
+# ---------------------------------------------------
+def emulate_devices(ports, rate, seed, calib_sec=1.5):
+    """
+    Sends /a0 /a1 /a2 (like the Pure Data patch) to every port at `rate` Hz:
+    a level device for calib_sec, then a slowly wandering tilt.
+    """
+    rng = random.Random(seed)
+    phases = [(rng.uniform(0, 2 * math.pi), rng.uniform(0, 2 * math.pi),
+               rng.uniform(0.2, 1.0), rng.uniform(0.2, 1.0)) for _ in ports]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    z_dgram = osc_dgram("/a2", 1.0)
+    start = time.perf_counter()
+    next_t = start
+    while True:
+        t = time.perf_counter() - start
+        for port, (px, py, wx, wy) in zip(ports, phases):
+            if t < calib_sec:
+                x = y = 0.0
+            else:
+                x = 0.35 * math.sin(px + wx * t)
+                y = 0.35 * math.sin(py + wy * t)
+            addr = ("127.0.0.1", port)
+            sock.sendto(osc_dgram("/a0", x), addr)
+            sock.sendto(osc_dgram("/a1", y), addr)
+            sock.sendto(z_dgram, addr)
+        next_t += 1.0 / rate
+        delay = next_t - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazeTilt multi-session server")
+    parser.add_argument("--session", action="append", default=[], metavar="SPEC",
+                        help="NAME:ATTEMPT:INPUT_PORT[:FEEDBACK_HOST[:MODALITA]] (repeat for every station)")
+    parser.add_argument("--emulate", type=int, default=0, metavar="N", help="Add N sessions fed by local emulated devices")
+    parser.add_argument("--emulate-rate", type=int, default=60, help="Samples per second of every emulated device")
+    parser.add_argument("--base-port", type=int, default=4444, help="First input port of the emulated sessions")
+    parser.add_argument("--rate", type=int, default=FPS, help="Ticks per second")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--loop", action="store_true", help="Restart finished sessions (next attempt) after a few seconds")
+    parser.add_argument("--results-dir", default=None, help="Directory of results.csv / level_times.csv "
+                        "(default results, results/emulated with --emulate)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the emulated devices")
+    args = parser.parse_args()
+
+    sessions = [parse_session(spec, i) for i, spec in enumerate(args.session)]
+    emulated_ports = []
+    for k in range(args.emulate):
+        port = args.base_port + len(sessions)
+        sessions.append(Session(len(sessions), f"emu{k + 1:02d}", "1", port, "127.0.0.1", 2, bind_ip="127.0.0.1"))
+        emulated_ports.append(port)
+    if not sessions:
+        parser.error("no sessions: use --session and/or --emulate")
+
+    results_dir = args.results_dir or (os.path.join("results", "emulated") if args.emulate else "results")
+    server = GameServer(sessions, ResultsWriter(results_dir), args.rate, args.loop)
+
+    emulator = None
+    if emulated_ports:
+        emulator = mp.get_context("spawn").Process(
+            target=emulate_devices, args=(emulated_ports, args.emulate_rate, args.seed), daemon=True)
+        emulator.start()
+
+    print(f"{len(sessions)} sessions, ports {sessions[0].port}-{sessions[-1].port}, {args.rate} Hz, results in {results_dir}")
+    try:
+        server.run(args.duration)
+    finally:
+        if emulator is not None:
+            emulator.terminate()
+        print(f"{server.ticks} ticks, sessions {server.session_states()}")
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
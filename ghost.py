@@ -0,0 +1,269 @@
+# ---------------------------------------------------
+# GHOST RUNS
+# ---------------------------------------------------
+# The ball of a previous run of the level, drawn translucent next to the
+# live one (maze_tilt.py --ghost). Every level attempt is saved
+# (--record-ghosts) as a small file in results/ghosts:
+#
+#   header   magic, version, completed, level, samples, duration (ms), keyframes
+#   index    by columns, one entry every KEYFRAME_EVERY samples:
+#            time (ms), x, z (quantised), offset of the next sample in the stream
+#   stream   the other samples: time, x and z deltas from the previous one,
+#            zigzag varints (a time delta of 0 is a jump: the ball back at the start)
+#
+# Samples are taken at most GHOST_RATE times per second with positions in
+# steps of QUANT: a few bytes per sample, a few KiB for a level.
+# GhostTrack.position(t) interpolates between the samples around t; moving
+# forward it decodes the next sample when t passes it, a jump (restart,
+# seek) is a bisect over the keyframe times and at most KEYFRAME_EVERY
+# samples decoded.
+#
+#   python ghost.py                     # best run of every level
+#   python ghost.py results/ghosts/anna_1_2_3.ghost
+import glob
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+from trajectory import trajectory_path
+
+MAGIC = b"MZGH"
+GHOST_VERSION = 1
+GHOST_DIR = os.path.join("results", "ghosts")
+GHOST_RATE = 30.0
+QUANT = 1.0 / 256.0
+KEYFRAME_EVERY = 64
+
+HEADER = struct.Struct("<4sBBHIII")    # magic, version, completed, level, samples, duration ms, keyframes
+
+
+def ghost_path(name, attempt, modalita, level, directory=GHOST_DIR):
+    return trajectory_path(name, attempt, modalita, directory, ext=f"_{level}.ghost")
+
+
+def _put_varint(buf, v):
+    v = (v << 1) if v >= 0 else ((-v) << 1) - 1     # zigzag
+    while v >= 0x80:
+        buf.append((v & 0x7F) | 0x80)
+        v >>= 7
+    buf.append(v)
+
+
+def _get_varint(data, pos):
+    v = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        v |= (b & 0x7F) << shift
+        if b < 0x80:
+            break
+        shift += 7
+    return (v >> 1) ^ -(v & 1), pos
+
+
+# ---------------------------------------------------
+# RECORD
+# ---------------------------------------------------
+class GhostRecorder:
+    """
+    sample() every frame of the level with the time since the level started;
+    finish() writes the file.
+    """
+    def __init__(self, path, level, rate=GHOST_RATE):
+        self.path = path
+        self.level = level
+        self._min_dt = int(1000.0 / rate)
+        self._stream = bytearray()
+        self._kf_t, self._kf_x, self._kf_z, self._kf_pos = array("I"), array("i"), array("i"), array("I")
+        self._samples = 0
+        self._last = None
+
+    def sample(self, t, x, z, force=False):
+        # force: keep the sample even if it comes less than 1 / rate after the previous one
+        t_ms = int(round(t * 1000.0))
+        qx, qz = int(round(x / QUANT)), int(round(z / QUANT))
+        last = self._last
+        if last is not None:
+            if t_ms < last[0] or (t_ms - last[0] < self._min_dt and not force):
+                return
+        if self._samples % KEYFRAME_EVERY == 0:
+            self._kf_t.append(t_ms)
+            self._kf_x.append(qx)
+            self._kf_z.append(qz)
+            self._kf_pos.append(len(self._stream))
+        else:
+            _put_varint(self._stream, t_ms - last[0])
+            _put_varint(self._stream, qx - last[1])
+            _put_varint(self._stream, qz - last[2])
+        self._samples += 1
+        self._last = (t_ms, qx, qz)
+
+    def jump(self, t, from_x, from_z, to_x, to_z):
+        # the ball leaves (from_x, from_z) for (to_x, to_z) at t (fall, reset): not interpolated
+        self.sample(t, from_x, from_z, force=True)
+        self.sample(t, to_x, to_z, force=True)
+
+    def finish(self, t, x, z, completed):
+        # last sample at the end of the attempt, then the file (None when nothing was recorded)
+        self.sample(t, x, z, force=True)
+        if self._last is None:
+            return None
+        index = [self._kf_t, self._kf_x, self._kf_z, self._kf_pos]
+        if sys.byteorder == "big":
+            for column in index:
+                column.byteswap()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, GHOST_VERSION, bool(completed), self.level, self._samples,
+                                self._last[0], len(self._kf_t)))
+            for column in index:
+                f.write(column.tobytes())
+            f.write(self._stream)
+        os.replace(tmp, self.path)
+        return self.path
+
+
+# ---------------------------------------------------
+# PLAYBACK
+# ---------------------------------------------------
+def read_header(path):
+    # (completed, level, samples, duration ms), None if it is not a ghost file
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(head) < HEADER.size:
+        return None
+    magic, version, completed, level, samples, duration, _ = HEADER.unpack(head)
+    if magic != MAGIC or version != GHOST_VERSION:
+        return None
+    return bool(completed), level, samples, duration
+
+
+class GhostTrack:
+    """
+    Positions of a saved run: position(t) with t in seconds from the start of the level.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, completed, level, samples, duration, keyframes = HEADER.unpack_from(data)
+        if magic != MAGIC or version != GHOST_VERSION:
+            raise ValueError(f"{path}: not a ghost run")
+        self.path = path
+        self.completed = bool(completed)
+        self.level = level
+        self.samples = samples
+        self.duration = duration / 1000.0
+        self._kf_t, self._kf_x, self._kf_z, self._kf_pos = array("I"), array("i"), array("i"), array("I")
+        pos = HEADER.size
+        for column in (self._kf_t, self._kf_x, self._kf_z, self._kf_pos):
+            n = column.itemsize * keyframes
+            column.frombytes(data[pos:pos + n])
+            if sys.byteorder == "big":
+                column.byteswap()
+            pos += n
+        self._stream = data[pos:]
+        self._seek(0)
+
+    def _seek(self, k):
+        # current sample = keyframe k
+        self._i = k * KEYFRAME_EVERY
+        self._ta, self._xa, self._za = self._kf_t[k], self._kf_x[k], self._kf_z[k]
+        self._pos = self._kf_pos[k]
+        self._next_keyframe_t = self._kf_t[k + 1] if k + 1 < len(self._kf_t) else None
+        self._load_next()
+
+    def _load_next(self):
+        # sample after the current one into (tb, xb, zb); tb None at the end of the run
+        i = self._i + 1
+        if i >= self.samples:
+            self._tb = None
+        elif i % KEYFRAME_EVERY == 0:
+            k = i // KEYFRAME_EVERY
+            self._tb, self._xb, self._zb = self._kf_t[k], self._kf_x[k], self._kf_z[k]
+        else:
+            stream = self._stream
+            dt, pos = _get_varint(stream, self._pos)
+            dx, pos = _get_varint(stream, pos)
+            dz, pos = _get_varint(stream, pos)
+            self._pos = pos
+            self._tb, self._xb, self._zb = self._ta + dt, self._xa + dx, self._za + dz
+
+    def _advance(self):
+        self._i += 1
+        self._ta, self._xa, self._za = self._tb, self._xb, self._zb
+        if self._i % KEYFRAME_EVERY == 0:
+            k = self._i // KEYFRAME_EVERY
+            self._pos = self._kf_pos[k]
+            self._next_keyframe_t = self._kf_t[k + 1] if k + 1 < len(self._kf_t) else None
+        self._load_next()
+
+    def position(self, t):
+        t_ms = t * 1000.0
+        if t_ms < self._ta or (self._next_keyframe_t is not None and t_ms >= self._next_keyframe_t):
+            self._seek(max(bisect_right(self._kf_t, t_ms) - 1, 0))
+        while self._tb is not None and t_ms >= self._tb:
+            self._advance()
+        if self._tb is None or t_ms <= self._ta:
+            return self._xa * QUANT, self._za * QUANT
+        f = (t_ms - self._ta) / (self._tb - self._ta)
+        return ((self._xa + (self._xb - self._xa) * f) * QUANT,
+                (self._za + (self._zb - self._za) * f) * QUANT)
+
+
+def best_ghost(level, directory=GHOST_DIR, player=None):
+    """
+    Path of the fastest completed run of the level (of player, if given), None if there is none.
+    Only the headers are read.
+    """
+    best, best_duration = None, None
+    prefix = None
+    if player:
+        prefix = os.path.basename(trajectory_path(player, "", "", ext=""))[:-2] + "_"    # "<name>_"
+    for path in glob.glob(os.path.join(directory, f"*_{level}.ghost")):
+        if prefix is not None and not os.path.basename(path).startswith(prefix):
+            continue
+        header = read_header(path)
+        if header is None:
+            continue
+        completed, ghost_level, _, duration = header
+        if completed and ghost_level == level and (best_duration is None or duration < best_duration):
+            best, best_duration = path, duration
+    return best
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MazeTilt ghost runs")
+    parser.add_argument("path", nargs="?", default=None, help="A ghost file (default: the best run of every level)")
+    parser.add_argument("--dir", default=GHOST_DIR, help="Directory of the ghost runs")
+    args = parser.parse_args()
+
+    if args.path is None:
+        runs = {}
+        for path in glob.glob(os.path.join(args.dir, "*.ghost")):
+            header = read_header(path)
+            if header is not None:
+                runs.setdefault(header[1], []).append(path)
+        if not runs:
+            print(f"no ghost runs in {args.dir}")
+        for level in sorted(runs):
+            best = best_ghost(level, args.dir)
+            label = f"best {os.path.basename(best)} {read_header(best)[3] / 1000.0:.2f} s" if best else "none completed"
+            print(f"level {level}: {len(runs[level])} runs, {label}")
+        return
+
+    track = GhostTrack(args.path)
+    size = os.path.getsize(args.path)
+    print(f"{args.path}: level {track.level}, {'completed' if track.completed else 'not completed'} in "
+          f"{track.duration:.2f} s, {track.samples} samples, {size} bytes ({size / max(track.samples, 1):.1f} per sample)")
+
+
+if __name__ == "__main__":
+    main()
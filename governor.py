@@ -0,0 +1,106 @@
+# ---------------------------------------------------
+# FRAME-BUDGET GOVERNOR
+# ---------------------------------------------------
+# Picks the tessellation of the ball and hole meshes (LOD) and the frame-rate
+# cap from the measured work time of the frames.
+
+# (slices, stacks) of the ball and segments of the hole disks, coarse -> fine
+SPHERE_LODS = [(8, 6), (12, 10), (16, 16), (24, 20)]
+DISK_LODS = [10, 16, 24, 36]
+DEFAULT_LOD = 2            # the original 16x16 sphere / 24 segment disks
+
+REFRESH_RATES = (60, 90, 120, 144, 165, 240)
+
+
+class FrameGovernor:
+    """
+    update() receives the work time of every frame (update + draw calls, without
+    the wait of clock.tick and of the buffer swap). Every `window` frames the
+    average is compared with the budget of the current target rate:
+      - over high * budget: lower the LOD, then the target rate (not under `fps`)
+      - under low * budget: restore the default LOD, then raise the target rate
+        (up to `fps_max`) if the work is under raise_margin * the faster budget,
+        then the LOD
+    After a change nothing moves for `cooldown` windows.
+    """
+    def __init__(self, fps=60, fps_max=None, lod=DEFAULT_LOD, adaptive=True,
+                 high=0.85, low=0.45, raise_margin=0.6, window=30, cooldown=2):
+        self.base_fps = fps
+        fps_max = max(fps, fps_max or fps)
+        self.rates = sorted({fps, fps_max} | {r for r in REFRESH_RATES if fps < r < fps_max})
+        self.rate_index = 0
+        self.lod = lod
+        self.adaptive = adaptive
+        self.high = high
+        self.low = low
+        self.raise_margin = raise_margin
+        self.window = window
+        self.cooldown = cooldown
+
+        self._sum = 0.0
+        self._count = 0
+        self._wait = 0
+        self.avg_work_ms = 0.0
+        self.changes = 0
+
+    @property
+    def target_fps(self):
+        return self.rates[self.rate_index]
+
+    @property
+    def budget_ms(self):
+        return 1000.0 / self.target_fps
+
+    @property
+    def sphere(self):
+        return SPHERE_LODS[self.lod]
+
+    @property
+    def disk_segments(self):
+        return DISK_LODS[self.lod]
+
+    def update(self, work_ms):
+        self._sum += work_ms
+        self._count += 1
+        if self._count < self.window:
+            return
+        self.avg_work_ms = self._sum / self._count
+        self._sum = 0.0
+        self._count = 0
+
+        if not self.adaptive:
+            return
+        if self._wait > 0:
+            self._wait -= 1
+            return
+
+        avg = self.avg_work_ms
+        budget = self.budget_ms
+        changed = False
+
+        if avg > self.high * budget:
+            if self.lod > 0:
+                self.lod -= 1
+                changed = True
+            elif self.rate_index > 0:
+                self.rate_index -= 1
+                changed = True
+
+        elif avg < self.low * budget:
+            if self.lod < DEFAULT_LOD:
+                self.lod += 1
+                changed = True
+            elif (self.rate_index + 1 < len(self.rates)
+                  and avg < self.raise_margin * 1000.0 / self.rates[self.rate_index + 1]):
+                self.rate_index += 1
+                changed = True
+            elif self.lod + 1 < len(SPHERE_LODS):
+                self.lod += 1
+                changed = True
+
+        if changed:
+            self.changes += 1
+            self._wait = self.cooldown
+
+    def status(self):
+        return f"{self.target_fps} Hz, LOD {self.lod}, work {self.avg_work_ms:.2f} ms"
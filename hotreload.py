@@ -0,0 +1,106 @@
+# ---------------------------------------------------
+# HOT RELOAD OF THE LEVELS
+# ---------------------------------------------------
+# For level design: levels.py is watched while the game runs (one os.stat
+# every WATCH_INTERVAL). When it changes it is run again in a background
+# thread (startup.Background) and checked with build_walls(); between two
+# frames the levels whose definition changed replace the old ones in the
+# levels dict of the game, and Maze.reload() swaps only the changed walls
+# and holes of the level being played. A file with errors is reported and
+# ignored, so the game keeps running while the designer types.
+import os
+import runpy
+import time
+
+import levels as levels_module
+from levels import build_walls
+from startup import Background
+
+LEVELS_FILE = levels_module.__file__
+WATCH_INTERVAL = 0.25
+
+
+def load_levels_file(path=LEVELS_FILE):
+    levels = runpy.run_path(path)["LEVELS"]
+    if 1 not in levels:
+        raise ValueError("there is no level 1")
+    for k, level_data in levels.items():
+        try:
+            build_walls(level_data)
+            for (hx, hz, r) in level_data["holes"]:
+                float(hx), float(hz), float(r)
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            raise ValueError(f"level {k}: {e}") from None
+    return levels
+
+
+class LevelWatcher:
+    """
+    poll() once per frame: None when there is nothing new, otherwise
+    ({level: level_data} changed or added, [levels removed]), already
+    applied to `levels` (the dict the game plays).
+    """
+    def __init__(self, levels, path=LEVELS_FILE, interval=WATCH_INTERVAL):
+        self.levels = levels
+        self.path = path
+        self.interval = interval
+        self._mtime = self._stat()
+        self._next_check = 0.0
+        self._loading = None
+        self.reload_ms = 0.0        # load + check of the last reload (background thread)
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self, now):
+        if self._loading is not None:
+            if not self._loading.ready():
+                return None
+            loading, self._loading = self._loading, None
+            try:
+                new = loading.result()
+            except Exception as e:      # anything the designer can write in levels.py
+                print(f"[hot reload] {os.path.basename(self.path)} not applied: {type(e).__name__}: {e}", flush=True)
+                return None
+            self.reload_ms = (loading.done_at - self._started) * 1000.0
+            changed = {k: v for k, v in new.items() if self.levels.get(k) != v}
+            removed = [k for k in self.levels if k not in new]
+            for k in removed:
+                del self.levels[k]
+            self.levels.update(changed)
+            return changed, removed
+
+        if now < self._next_check:
+            return None
+        self._next_check = now + self.interval
+        mtime = self._stat()
+        if mtime is not None and mtime != self._mtime:
+            self._mtime = mtime
+            self._started = time.perf_counter()
+            self._loading = Background(load_levels_file, self.path)
+        return None
+
+
+def apply_reload(sim, reloaded, pilot=None):
+    """
+    Applies what LevelWatcher.poll() returned to a GameSimulation (and the
+    flow fields of an Autopilot); a line for the console.
+    """
+    start = time.perf_counter()
+    changed, removed = reloaded
+    sim.max_level = max(sim.levels.keys())
+    detail = ""
+    if sim.level in changed:
+        walls_out, walls_in, holes_out, holes_in = sim.maze.reload(changed[sim.level])
+        sim.set_board(sim.maze)
+        detail = f", level {sim.level}: -{walls_out}/+{walls_in} walls, -{holes_out}/+{holes_in} holes"
+    if pilot is not None:
+        for k in list(changed) + removed:
+            pilot.fields.pop(k, None)
+    names = ", ".join(str(k) for k in sorted(changed)) or "none"
+    gone = f", removed {', '.join(str(k) for k in removed)}" if removed else ""
+    return (f"[hot reload] levels changed: {names}{gone}{detail} "
+            f"(applied in {(time.perf_counter() - start) * 1000.0:.2f} ms)")
@@ -0,0 +1,64 @@
+# ---------------------------------------------------
+# LEADERBOARD
+# ---------------------------------------------------
+import bisect
+import csv
+import os
+
+TOTAL = 0   # "level" used for the complete runs (WIN) in the tables
+
+
+class Leaderboard:
+    """
+    Top-K best times per (level, modality) and personal bests per (name, modality, level).
+    The history is read once at startup, afterwards the tables are only updated
+    in memory by add_level_time / add_result (called by the save functions).
+    `version` changes at every update, so the screen knows when to redraw.
+    """
+    def __init__(self, k=5):
+        self.k = k
+        self.top = {}        # (level, modalita) -> sorted [(time, name, attempt)]
+        self.personal = {}   # (name, modalita, level) -> best time
+        self.version = 0
+
+    def load(self, results_file, level_times_file):
+        if os.path.isfile(level_times_file):
+            with open(level_times_file, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self._insert(int(row["Livello"]), int(row["Modalità_ID"]),
+                                 float(row["Tempo_sec"]), row["Nome"], row["Tentativo"])
+
+        if os.path.isfile(results_file):
+            with open(results_file, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if row["Esito"] == "WIN":
+                        self._insert(TOTAL, int(row["Modalità_ID"]),
+                                     float(row["Tempo_totale_sec"]), row["Nome"], row["Tentativo"])
+        self.version += 1
+        return self
+
+    def _insert(self, level, modalita, time_sec, name, attempt):
+        entries = self.top.setdefault((level, modalita), [])
+        if len(entries) < self.k or time_sec < entries[-1][0]:
+            bisect.insort(entries, (time_sec, name, str(attempt)))
+            del entries[self.k:]
+
+        key = (name, modalita, level)
+        if key not in self.personal or time_sec < self.personal[key]:
+            self.personal[key] = time_sec
+
+    # -----------------------------------------------
+    def add_level_time(self, name, attempt, modalita, level, time_sec):
+        self._insert(level, modalita, time_sec, name, attempt)
+        self.version += 1
+
+    def add_result(self, name, attempt, modalita, result, time_sec):
+        if result == "WIN":
+            self._insert(TOTAL, modalita, time_sec, name, attempt)
+            self.version += 1
+
+    def best(self, level, modalita):
+        return self.top.get((level, modalita), [])
+
+    def personal_best(self, name, modalita, level):
+        return self.personal.get((name, modalita, level))
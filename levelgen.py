@@ -0,0 +1,165 @@
+# ---------------------------------------------------
+# LEVEL GENERATOR
+# ---------------------------------------------------
+# Seeded random levels in the format of levels.LEVELS: shelves from the left
+# and right borders in zig-zag (as in the hand-made levels), short vertical
+# walls and holes. Every candidate is checked with occupancy.is_solvable()
+# (a path from START_POS to GOAL_RECT for the ball); the first solvable
+# candidate of a seed is the level of that seed. Accepted levels are kept by
+# seed in memory and, with a cache file, across runs.
+#
+#   python levelgen.py --seed 7 --print          # the level of seed 7
+#   python levelgen.py --count 500               # generation rate / acceptance
+import json
+import random
+
+from levels import MAZE_WIDTH, MAZE_DEPTH, WALL_THICKNESS
+from occupancy import is_solvable
+from simulation import START_POS, GOAL_RECT
+
+LEVEL_CACHE_FILE = ".level_cache.json"
+MAX_ATTEMPTS = 500
+
+INNER_W = MAZE_WIDTH - 2 * WALL_THICKNESS
+INNER_D = MAZE_DEPTH - 2 * WALL_THICKNESS
+SHELVES = (2, 5)            # number of shelves (min, max)
+SHELF_GAP = (2.5, 6.0)      # opening left by a shelf
+SHELF_BAND = (5.0, INNER_D - 5.0)   # z offsets of the shelves (from the near wall)
+STUB_LEN = (2.0, 6.0)       # vertical walls
+HOLES = (1, 6)
+HOLE_R = 1.0
+HOLE_CLEARANCE = 3.0        # from the start and the centre of the goal
+
+_accepted = {}              # seed -> level
+
+
+def _half(v):
+    # positions on a 0.5 grid, as in levels.py
+    return round(v * 2.0) / 2.0
+
+
+def candidate_level(rng):
+    walls = []
+    shelves = rng.randint(*SHELVES)
+    spacing = (SHELF_BAND[1] - SHELF_BAND[0]) / shelves
+    side = rng.choice(("min", "max"))
+    shelf_z = []
+    for i in range(shelves):
+        dz = _half(SHELF_BAND[0] + spacing * (i + rng.uniform(0.2, 0.8)))
+        w = _half(INNER_W - rng.uniform(*SHELF_GAP))
+        walls.append((side, "min", 0.0 if side == "min" else -w, dz, w, "T"))
+        shelf_z.append(dz)
+        side = "max" if side == "min" else "min"
+
+    # vertical walls between two shelves (or the near wall and the first one)
+    bounds = [0.0] + shelf_z
+    for z_lo, z_hi in zip(bounds, bounds[1:]):
+        if rng.random() < 0.6:
+            length = min(rng.uniform(*STUB_LEN), z_hi - z_lo - WALL_THICKNESS)
+            if length >= STUB_LEN[0]:
+                dx = _half(rng.uniform(2.0, INNER_W - 2.0))
+                dz = _half(rng.uniform(z_lo + WALL_THICKNESS, z_hi - length))
+                walls.append(("min", "min", dx, dz, "T", _half(length)))
+
+    holes = []
+    gx = GOAL_RECT[0] + GOAL_RECT[2] / 2.0
+    gz = GOAL_RECT[1] + GOAL_RECT[3] / 2.0
+    for _ in range(rng.randint(*HOLES)):
+        hx = _half(rng.uniform(-INNER_W / 2.0 + 1.5, INNER_W / 2.0 - 1.5))
+        hz = _half(rng.uniform(-INNER_D / 2.0 + 1.5, INNER_D / 2.0 - 1.5))
+        if ((hx - START_POS[0]) ** 2 + (hz - START_POS[1]) ** 2 < HOLE_CLEARANCE ** 2
+                or (hx - gx) ** 2 + (hz - gz) ** 2 < HOLE_CLEARANCE ** 2):
+            continue
+        holes.append((hx, hz, HOLE_R))
+
+    return {"walls": walls, "holes": holes}
+
+
+def search_level(seed):
+    """
+    (level, candidates checked): the first solvable candidate of the seed.
+    """
+    rng = random.Random(seed)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        level = candidate_level(rng)
+        if is_solvable(level):
+            return level, attempt
+    raise RuntimeError(f"no solvable level for seed {seed} in {MAX_ATTEMPTS} attempts")
+
+
+def generate_level(seed):
+    """
+    The level of a seed (always the same), cached.
+    """
+    level = _accepted.get(seed)
+    if level is None:
+        level = _accepted[seed] = search_level(seed)[0]
+    return level
+
+
+def load_level_cache(cache_file=LEVEL_CACHE_FILE):
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return
+    for seed, level in cache.items():
+        _accepted.setdefault(int(seed), {"walls": [tuple(w) for w in level["walls"]],
+                                         "holes": [tuple(h) for h in level["holes"]]})
+
+
+def save_level_cache(cache_file=LEVEL_CACHE_FILE):
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump({str(seed): level for seed, level in sorted(_accepted.items())}, f)
+    except OSError:
+        pass
+
+
+def generate_levels(seed, count, cache_file=LEVEL_CACHE_FILE):
+    """
+    {1..count: level} with level k = generate_level(seed + k - 1), in the
+    format of levels.LEVELS. cache_file=None keeps the levels only in memory.
+    """
+    if cache_file is not None:
+        load_level_cache(cache_file)
+    known = len(_accepted)
+    levels = {k: generate_level(seed + k - 1) for k in range(1, count + 1)}
+    if cache_file is not None and len(_accepted) != known:
+        save_level_cache(cache_file)
+    return levels
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="MazeTilt level generator")
+    parser.add_argument("--seed", type=int, default=0, help="First seed")
+    parser.add_argument("--count", type=int, default=1, help="Levels to generate")
+    parser.add_argument("--print", action="store_true", help="Print the levels as in levels.py")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    candidates = 0
+    for seed in range(args.seed, args.seed + args.count):
+        level, attempts = search_level(seed)
+        candidates += attempts
+        if args.print:
+            print(f"    {seed}: {{")
+            print('        "walls": [')
+            for wall in level["walls"]:
+                print(f"            {wall},")
+            print('        ],')
+            print('        "holes": [')
+            for hole in level["holes"]:
+                print(f"            {hole},")
+            print("        ]")
+            print("    },")
+    elapsed = time.perf_counter() - start
+    print(f"{args.count} levels, {candidates} candidates checked in {elapsed:.2f} s "
+          f"({candidates / elapsed:.0f} checks/s, {args.count / candidates:.0%} accepted)")
+
+
+if __name__ == "__main__":
+    main()
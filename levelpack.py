@@ -0,0 +1,281 @@
+# ---------------------------------------------------
+# LEVEL PACKS
+# ---------------------------------------------------
+# Levels in one binary file, already validated and resolved to absolute
+# geometry when the pack is built, read one at a time when they are used.
+#
+#   header   magic, version, count, board width / depth / wall thickness
+#   index    by columns: level ids (sorted), offsets, sizes, crc32s
+#   records  per level: n walls, n holes, walls (x, z, w, d), holes (x, z, r)
+#
+# Little endian, float64 coordinates, so the levels of levels.py convert
+# without any loss. Opening a pack reads only the header and the index;
+# LevelPack is a read-only mapping {id: level} in the format of
+# levels.LEVELS (with absolute (x, z, w, d) walls, see levels.resolve_walls)
+# and can be passed wherever LEVELS is.
+#
+#   python levelpack.py build levels.pack                   # the levels of levels.py
+#   python levelpack.py build big.pack --generated 0 --count 5000
+#   python levelpack.py check                               # levels.py -> pack -> levels.py is lossless
+#   python levelpack.py info big.pack
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from levels import LEVELS, MAZE_WIDTH, MAZE_DEPTH, WALL_THICKNESS, build_walls, resolve_walls
+
+MAGIC = b"MZLP"
+PACK_VERSION = 1
+
+HEADER = struct.Struct("<4sHxxIddd")     # magic, version, count, width, depth, wall thickness
+INDEX_ENTRY_SIZE = 4 + 8 + 4 + 4         # id (u32), offset (u64), size (u32), crc32 (u32)
+LEVEL_HEAD = struct.Struct("<HH")        # walls, holes
+WALL = struct.Struct("<dddd")
+HOLE = struct.Struct("<ddd")
+
+
+class LevelPackError(ValueError):
+    pass
+
+
+# ---------------------------------------------------
+# VALIDATION
+# ---------------------------------------------------
+def resolve_level(level_id, level_data, width=MAZE_WIDTH, depth=MAZE_DEPTH, t=WALL_THICKNESS):
+    """
+    Internal walls of a level as absolute (x, z, w, d) rects and its holes,
+    checked: known anchors, positive sizes, everything on the board.
+    """
+    xmin, xmax = -width / 2.0 + t, width / 2.0 - t
+    zmin, zmax = -depth / 2.0 + t, depth / 2.0 - t
+    walls = []
+    for wall in level_data.get("walls", ()):
+        if len(wall) == 6:
+            x_ref, z_ref, dx, dz, w, d = wall
+            if x_ref not in ("min", "max") or z_ref not in ("min", "max"):
+                raise LevelPackError(f"level {level_id}: bad anchors in wall {wall}")
+            for size in (w, d):
+                if isinstance(size, str) and size != "T" and not size.startswith("FULL-"):
+                    raise LevelPackError(f"level {level_id}: bad size {size!r} in wall {wall}")
+        elif len(wall) != 4:
+            raise LevelPackError(f"level {level_id}: wall {wall} is neither (x, z, w, d) nor (x_ref, z_ref, dx, dz, w, d)")
+        try:
+            x, z, w, d = resolve_walls([wall], xmin, xmax, zmin, zmax, t)[0]
+            x, z, w, d = float(x), float(z), float(w), float(d)
+        except (TypeError, ValueError, IndexError):
+            raise LevelPackError(f"level {level_id}: bad wall {wall}") from None
+        if w <= 0.0 or d <= 0.0:
+            raise LevelPackError(f"level {level_id}: wall {wall} has no area")
+        if x < -width / 2.0 or z < -depth / 2.0 or x + w > width / 2.0 or z + d > depth / 2.0:
+            raise LevelPackError(f"level {level_id}: wall {wall} is off the board")
+        walls.append((x, z, w, d))
+
+    holes = []
+    for hole in level_data.get("holes", ()):
+        try:
+            hx, hz, r = (float(v) for v in hole)
+        except (TypeError, ValueError):
+            raise LevelPackError(f"level {level_id}: bad hole {hole}") from None
+        if r <= 0.0 or not (xmin <= hx <= xmax and zmin <= hz <= zmax):
+            raise LevelPackError(f"level {level_id}: hole {hole} is off the board or has no radius")
+        holes.append((hx, hz, r))
+    return {"walls": walls, "holes": holes}
+
+
+# ---------------------------------------------------
+# WRITE
+# ---------------------------------------------------
+def encode_level(level):
+    parts = [LEVEL_HEAD.pack(len(level["walls"]), len(level["holes"]))]
+    parts += [WALL.pack(*w) for w in level["walls"]]
+    parts += [HOLE.pack(*h) for h in level["holes"]]
+    return b"".join(parts)
+
+
+def build_pack(path, levels=LEVELS, width=MAZE_WIDTH, depth=MAZE_DEPTH, t=WALL_THICKNESS, check_solvable=True):
+    """
+    Validates, resolves and writes the levels {id: level} to path.
+    check_solvable also requires a path from the start to the goal (occupancy.is_solvable).
+    """
+    if check_solvable:
+        from occupancy import is_solvable
+
+    records = []
+    for level_id in sorted(levels):
+        if not 0 <= level_id < 2 ** 32:
+            raise LevelPackError(f"level id {level_id} out of range")
+        level = resolve_level(level_id, levels[level_id], width, depth, t)
+        if check_solvable and not is_solvable(level):
+            raise LevelPackError(f"level {level_id}: no path from the start to the goal")
+        records.append((level_id, encode_level(level)))
+
+    ids, offsets, sizes, crcs = array("I"), array("Q"), array("I"), array("I")
+    offset = HEADER.size + INDEX_ENTRY_SIZE * len(records)
+    for level_id, data in records:
+        ids.append(level_id)
+        offsets.append(offset)
+        sizes.append(len(data))
+        crcs.append(zlib.crc32(data))
+        offset += len(data)
+    index = [ids, offsets, sizes, crcs]
+    if sys.byteorder == "big":
+        for column in index:
+            column.byteswap()
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, PACK_VERSION, len(records), width, depth, t))
+        for column in index:
+            f.write(column.tobytes())
+        for _, data in records:
+            f.write(data)
+    os.replace(tmp, path)
+    return len(records)
+
+
+# ---------------------------------------------------
+# READ
+# ---------------------------------------------------
+class LevelPack(Mapping):
+    """
+    Read-only {id: level} view of a pack file. Only the header and the index
+    are read when it is opened; a level is read, checked (crc32) and decoded
+    the first time it is asked for, then kept.
+    """
+    def __init__(self, path, width=MAZE_WIDTH, depth=MAZE_DEPTH, t=WALL_THICKNESS):
+        self.path = path
+        self._file = open(path, "rb")
+        head = self._file.read(HEADER.size)
+        if len(head) < HEADER.size:
+            raise LevelPackError(f"{path}: not a level pack")
+        magic, version, count, p_width, p_depth, p_t = HEADER.unpack(head)
+        if magic != MAGIC:
+            raise LevelPackError(f"{path}: not a level pack")
+        if version != PACK_VERSION:
+            raise LevelPackError(f"{path}: pack version {version}, expected {PACK_VERSION}")
+        if (p_width, p_depth, p_t) != (width, depth, t):
+            raise LevelPackError(f"{path}: built for a {p_width} x {p_depth} board (walls {p_t}), "
+                                 f"the game has {width} x {depth} (walls {t})")
+        data = self._file.read(INDEX_ENTRY_SIZE * count)
+        if len(data) < INDEX_ENTRY_SIZE * count:
+            raise LevelPackError(f"{path}: truncated index")
+        # columns copied as they are (no per-level work): cost independent of the levels' content
+        self._ids, self._offsets, self._sizes, self._crcs = array("I"), array("Q"), array("I"), array("I")
+        pos = 0
+        for column in (self._ids, self._offsets, self._sizes, self._crcs):
+            n = column.itemsize * count
+            column.frombytes(data[pos:pos + n])
+            if sys.byteorder == "big":
+                column.byteswap()
+            pos += n
+        self._levels = {}
+
+    def _find(self, level_id):
+        i = bisect_left(self._ids, level_id)
+        if i == len(self._ids) or self._ids[i] != level_id:
+            return -1
+        return i
+
+    def __getitem__(self, level_id):
+        level = self._levels.get(level_id)
+        if level is not None:
+            return level
+        i = self._find(level_id) if isinstance(level_id, int) else -1
+        if i < 0:
+            raise KeyError(level_id)
+        size, crc = self._sizes[i], self._crcs[i]
+        self._file.seek(self._offsets[i])
+        data = self._file.read(size)
+        if len(data) != size or zlib.crc32(data) != crc:
+            raise LevelPackError(f"{self.path}: level {level_id} is corrupted")
+        n_walls, n_holes = LEVEL_HEAD.unpack_from(data)
+        pos = LEVEL_HEAD.size
+        walls = list(WALL.iter_unpack(data[pos:pos + n_walls * WALL.size]))
+        pos += n_walls * WALL.size
+        holes = list(HOLE.iter_unpack(data[pos:pos + n_holes * HOLE.size]))
+        level = self._levels[level_id] = {"walls": walls, "holes": holes}
+        return level
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, level_id):
+        return isinstance(level_id, int) and self._find(level_id) >= 0
+
+    def keys(self):
+        return self._ids
+
+    def __reduce__(self):
+        # reopened by path in the physics / worker processes
+        return (LevelPack, (self.path,))
+
+    def close(self):
+        self._file.close()
+
+
+def check_lossless(levels=LEVELS, path=".levelpack_check.pack"):
+    """
+    Levels whose walls (as build_walls) or holes differ after a round trip through a pack.
+    """
+    build_pack(path, levels)
+    pack = LevelPack(path)
+    try:
+        return [k for k in levels
+                if build_walls(pack[k]) != build_walls(levels[k])
+                or [tuple(h) for h in pack[k]["holes"]] != [tuple(map(float, h)) for h in levels[k]["holes"]]]
+    finally:
+        pack.close()
+        os.remove(path)
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="MazeTilt level packs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="Write a pack")
+    p_build.add_argument("path")
+    p_build.add_argument("--generated", type=int, default=None, metavar="SEED", help="Generated levels (levelgen.py) instead of levels.py")
+    p_build.add_argument("--count", type=int, default=len(LEVELS), help="Number of generated levels")
+    p_build.add_argument("--no-solvable-check", action="store_true", help="Do not check the path from the start to the goal")
+    sub.add_parser("check", help="Round trip of the levels of levels.py through a pack")
+    p_info = sub.add_parser("info", help="Open a pack and read a level")
+    p_info.add_argument("path")
+    p_info.add_argument("--level", type=int, default=None, help="Level to read (default: the last one)")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        levels = LEVELS
+        if args.generated is not None:
+            from levelgen import generate_levels
+            levels = generate_levels(args.generated, args.count, cache_file=None)
+        start = time.perf_counter()
+        count = build_pack(args.path, levels, check_solvable=not args.no_solvable_check)
+        print(f"{count} levels written to {args.path} in {time.perf_counter() - start:.2f} s")
+    elif args.cmd == "check":
+        bad = check_lossless()
+        print("lossless" if not bad else f"levels changed by the round trip: {bad}")
+        raise SystemExit(1 if bad else 0)
+    else:
+        start = time.perf_counter()
+        pack = LevelPack(args.path)
+        opened = time.perf_counter()
+        level_id = args.level if args.level is not None else max(pack)
+        level = pack[level_id]
+        loaded = time.perf_counter()
+        print(f"{args.path}: {len(pack)} levels, {os.path.getsize(args.path) / 1024.0:.1f} KiB")
+        print(f"opened in {(opened - start) * 1000.0:.2f} ms, level {level_id} "
+              f"({len(level['walls'])} walls, {len(level['holes'])} holes) read in {(loaded - opened) * 1000.0:.3f} ms")
+        pack.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 
 MAZE_WIDTH = 20.0
 MAZE_DEPTH = 30.0
+WALL_THICKNESS = 0.7
 
 # Walls (x_ref, z_ref, dx, dz, w, d)
 # x_ref, z_ref = "min" minimum edge (left or near) or "max" maximum edge (right or far)
@@ -11,6 +12,8 @@ MAZE_DEPTH = 30.0
 # Holes (x, z, r)
 # x, z = coordinates of the center of the hole
 # r = radius of the hole
+
+# Board (optional): "width" and "depth" keys of a level, MAZE_WIDTH x MAZE_DEPTH by default
 LEVELS = {
     1: {
         "walls": [
@@ -88,3 +91,69 @@ LEVELS = {
         ]
     }
 }
+
+
+# ---------------------------------------------------
+# GEOMETRY
+# ---------------------------------------------------
+def resolve_walls(wall_defs, xmin, xmax, zmin, zmax, t):
+    """
+    Converts (x_ref, z_ref, dx, dz, w, d) definitions into absolute (x, z, w, d) rects.
+    Absolute (x, z, w, d) walls (as in the level packs, see levelpack.py) are kept as they are.
+    """
+    walls = []
+    for wall in wall_defs:
+        if len(wall) == 4:
+            walls.append(tuple(wall))
+            continue
+        x_ref, z_ref, dx, dz, w, d = wall
+        x0 = xmin if x_ref == "min" else xmax
+        z0 = zmin if z_ref == "min" else zmax
+
+        if isinstance(w, str) and w.startswith("FULL"):
+            offset = float(w.split("-")[1])
+            w = (xmax - xmin) - offset
+        if w == "T":
+            w = t
+
+        if d == "T":
+            d = t
+
+        walls.append((x0 + dx, z0 + dz, w, d))
+    return walls
+
+
+def board_size(level_data):
+    """
+    (width, depth) of the board of a level.
+    """
+    return level_data.get("width", MAZE_WIDTH), level_data.get("depth", MAZE_DEPTH)
+
+
+def build_walls(level_data, width=None, depth=None, t=WALL_THICKNESS):
+    """
+    Border + internal walls of a level as absolute (x, z, w, d) rects,
+    without touching OpenGL (usable by the analysis scripts).
+    width / depth default to the board of the level (board_size()).
+    """
+    w, d = board_size(level_data)
+    if width is not None:
+        w = width
+    if depth is not None:
+        d = depth
+
+    walls = [
+        (-w / 2.0, -d / 2.0, w, t),             # near
+        (-w / 2.0, d / 2.0 - t, w, t),          # far
+        (-w / 2.0, -d / 2.0, t, d),             # left
+        (w / 2.0 - t, -d / 2.0, t, d),          # right
+    ]
+
+    #   Useful internal area (to avoid going out of bounds)
+    xmin = -w / 2.0 + t
+    xmax =  w / 2.0 - t
+    zmin = -d / 2.0 + t
+    zmax =  d / 2.0 - t
+
+    walls += resolve_walls(level_data["walls"], xmin, xmax, zmin, zmax, t)
+    return walls
@@ -2,107 +2,310 @@
 # MAZE
 # ---------------------------------------------------
 
+import ctypes
 import math
+import numpy as np
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
-from levels import LEVELS
+from OpenGL.raw.GL.VERSION.GL_1_0 import glGetFloatv as raw_glGetFloatv
+from levels import LEVELS, WALL_THICKNESS, build_walls, board_size
 from ball import Ball
+from config import WALL_RESTITUTION, WALL_TANGENTIAL
 
 MAZE_WIDTH = 20.0
 MAZE_DEPTH = 30.0
 GOAL_RECT = (MAZE_WIDTH / 2.0 - 3.0, MAZE_DEPTH / 2.0 - 3.0, 2.2, 2.2)# Goal: rect in XZ plane (x, z, w, d)
-WALL_RESTITUTION = 0.80
-WALL_TANGENTIAL = 0.96
 BALL_RADIUS = 0.6
+WALL_HEIGHT = 1
+
+# Large boards: the walls and holes are grouped in square chunks of
+# CHUNK_SIZE (by their centre), each chunk of walls compiled in one display
+# list and drawn only when its bounding box is inside the view frustum.
+# With GRID_MIN_WALLS walls or more the collisions test only the walls of
+# the GRID_CELL cell of the ball.
+CHUNK_SIZE = 10.0
+GRID_CELL = 4.0
+GRID_MIN_WALLS = 64
+
+_disk_lists = {}
+_wall_lists = {}
+
+# matrices read without allocating (raw glGetFloatv into fixed buffers)
+_modelview_buf = (ctypes.c_float * 16)()
+_projection_buf = (ctypes.c_float * 16)()
+_modelview = np.frombuffer(_modelview_buf, np.float32).reshape(4, 4)      # transposed (column major)
+_projection = np.frombuffer(_projection_buf, np.float32).reshape(4, 4)
+_clip_t = np.empty((4, 4))
+_planes_t = np.empty((4, 6))
+_abs_normals = np.empty((3, 6))
+# (r3 + r0, r3 - r0, r3 + r1, r3 - r1, r3 + r2, r3 - r2) of the clip matrix
+_PLANE_SIGNS_T = np.array([[1.0, -1.0, 0.0, 0.0, 0.0, 0.0],
+                           [0.0, 0.0, 1.0, -1.0, 0.0, 0.0],
+                           [0.0, 0.0, 0.0, 0.0, 1.0, -1.0],
+                           [1.0, 1.0, 1.0, 1.0, 1.0, 1.0]])
 
 def draw_disk(cx, cy, cz, r, segments=24):
+    # compiled once per hole and tessellation in a display list
+    key = (cx, cy, cz, r, segments)
+    display_list = _disk_lists.get(key)
+    if display_list is not None:
+        glCallList(display_list)
+        return
+
+    display_list = glGenLists(1)
+    glNewList(display_list, GL_COMPILE_AND_EXECUTE)
     glBegin(GL_TRIANGLE_FAN)
     glVertex3f(cx, cy, cz)
     for i in range(segments + 1):
         a = (i / segments) * 2.0 * math.pi
         glVertex3f(cx + math.cos(a) * r, cy, cz + math.sin(a) * r)
     glEnd()
+    glEndList()
+    _disk_lists[key] = display_list
+
+def release_disks(cx, cz, r):
+    # display lists of a hole that is no longer on the board (every height / tessellation)
+    for key in [k for k in _disk_lists if k[0] == cx and k[2] == cz and k[3] == r]:
+        glDeleteLists(_disk_lists.pop(key), 1)
+
+def _diff(old, new):
+    # items of old still in new (in their order), items of old not in new, items of new not in old
+    remaining = {}
+    for item in new:
+        remaining[item] = remaining.get(item, 0) + 1
+    kept, removed = [], []
+    for item in old:
+        if remaining.get(item):
+            remaining[item] -= 1
+            kept.append(item)
+        else:
+            removed.append(item)
+    added = []
+    for item in new:
+        if remaining.get(item):
+            remaining[item] -= 1
+            added.append(item)
+    return kept, removed, added
+
+def _quad(a, b, c, d):
+    # two triangles split as glBegin(GL_QUADS) is in immediate mode (a display list
+    # of quads is split along the other diagonal: different edge pixels)
+    glVertex3f(*a)
+    glVertex3f(*b)
+    glVertex3f(*c)
+    glVertex3f(*a)
+    glVertex3f(*c)
+    glVertex3f(*d)
+
+def draw_walls(walls):
+    # one display list per chunk of walls, compiled the first time it is drawn
+    display_list = _wall_lists.get(walls)
+    if display_list is not None:
+        glCallList(display_list)
+        return
+
+    h = WALL_HEIGHT
+    display_list = glGenLists(1)
+    glNewList(display_list, GL_COMPILE_AND_EXECUTE)
+    glBegin(GL_TRIANGLES)
+    for (x, z, w, d) in walls:
+        x1, x2 = x, x + w
+        z1, z2 = z, z + d
+        _quad((x1, h, z1), (x2, h, z1), (x2, h, z2), (x1, h, z2))   # top
+        _quad((x1, 0, z1), (x2, 0, z1), (x2, h, z1), (x1, h, z1))   # front
+        _quad((x1, 0, z2), (x2, 0, z2), (x2, h, z2), (x1, h, z2))   # back
+        _quad((x1, 0, z1), (x1, 0, z2), (x1, h, z2), (x1, h, z1))   # left
+        _quad((x2, 0, z1), (x2, 0, z2), (x2, h, z2), (x2, h, z1))   # right
+    glEnd()
+    glEndList()
+    _wall_lists[walls] = display_list
+
+def release_walls(walls):
+    display_list = _wall_lists.pop(walls, None)
+    if display_list is not None:
+        glDeleteLists(display_list, 1)
 
 def clamp(v, vmin, vmax):
     return max(vmin, min(vmax, v))
 
 class Maze:
-    def __init__(self, level=1):
+    def __init__(self, level=1, levels=LEVELS, restitution=WALL_RESTITUTION, tangential=WALL_TANGENTIAL,
+                 ball_radius=BALL_RADIUS):
         self.level = level
+        self.levels = levels
+        self.restitution = restitution
+        self.tangential = tangential
+        self.ball_radius = ball_radius
         self.walls = []
         self.holes = []
         self.holes_area = []
+        self.cull = True           # frustum culling of the chunks in draw()
+        self.drawn_chunks = 0
         self._build_maze()
 
-    def add_internal_walls(self, wall_defs, xmin, xmax, zmin, zmax, t):
-        for (x_ref, z_ref, dx, dz, w, d) in wall_defs:
-            x0 = xmin if x_ref == "min" else xmax
-            z0 = zmin if z_ref == "min" else zmax
-
-            if isinstance(w, str) and w.startswith("FULL"):
-                offset = float(w.split("-")[1])
-                w = (xmax - xmin) - offset
-            if w == "T":
-                w = t
-
-            if d == "T":
-                d = t
-
-            x = x0 + dx
-            z = z0 + dz
-
-            self.walls.append((x, z, w, d))
-
     def _build_maze(self):
-        w = MAZE_WIDTH
-        d = MAZE_DEPTH
-        t = 0.7
-
-        self.walls = []
-
-        # -------------------------
-        # BORDER
-        # -------------------------
-        self.walls.append((-w / 2.0, -d / 2.0, w, t))             # near
-        self.walls.append((-w / 2.0, d / 2.0 - t, w, t))          # far
-        self.walls.append((-w / 2.0, -d / 2.0, t, d))             # left
-        self.walls.append((w / 2.0 - t, -d / 2.0, t, d))          # right
+        level_data = self.levels.get(self.level, self.levels[1])
 
-        #   Useful internal area (to avoid going out of bounds)
-        xmin = -w / 2.0 + t
-        xmax =  w / 2.0 - t
-        zmin = -d / 2.0 + t
-        zmax =  d / 2.0 - t
+        # ---- board ----
+        self.width, self.depth = board_size(level_data)
+        self.goal_rect = (self.width / 2.0 - 3.0, self.depth / 2.0 - 3.0, 2.2, 2.2)
 
-        level_data = LEVELS.get(self.level, LEVELS[1])
-
-        # ---- walls ----
-        self.add_internal_walls(
-            level_data["walls"],
-            xmin, xmax, zmin, zmax, t
-        )
+        # ---- border + internal walls ----
+        self.walls = build_walls(level_data, self.width, self.depth, WALL_THICKNESS)
 
         # ---- holes ----
         self.holes = level_data["holes"]
 
-        # ---- hole areas (automatically derived) ----
+        # ---- hole areas (automatically derived), with the hole radius ----
+        self.holes_area = [
+            (x, z, r * 3.0, r) for (x, z, r) in self.holes
+        ]
+
+        self._build_chunks()
+        self._build_grid()
+
+    def _build_chunks(self):
+        # walls / holes grouped by the chunk of their centre, with the bounding box of what is in it
+        x0, z0 = -self.width / 2.0, -self.depth / 2.0
+        chunks = {}
+        for wall in self.walls:
+            x, z, w, d = wall
+            key = (int((x + w / 2.0 - x0) // CHUNK_SIZE), int((z + d / 2.0 - z0) // CHUNK_SIZE))
+            chunk = chunks.setdefault(key, ([], [], []))
+            chunk[0].append(wall)
+            chunk[2].append((x, 0.0, z, x + w, WALL_HEIGHT, z + d))
+        for hole in self.holes:
+            hx, hz, r = hole
+            key = (int((hx - x0) // CHUNK_SIZE), int((hz - z0) // CHUNK_SIZE))
+            chunk = chunks.setdefault(key, ([], [], []))
+            chunk[1].append(hole)
+            chunk[2].append((hx - r, 0.25, hz - r, hx + r, 0.25, hz + r))
+
+        self.chunks = []
+        boxes = np.empty((len(chunks), 6))
+        for i, key in enumerate(sorted(chunks)):
+            walls, holes, bounds = chunks[key]
+            self.chunks.append((tuple(walls), holes))
+            b = np.array(bounds)
+            boxes[i, :3] = b[:, :3].min(axis=0)
+            boxes[i, 3:] = b[:, 3:].max(axis=0)
+        self._centres = (boxes[:, :3] + boxes[:, 3:]) / 2.0
+        self._extents = (boxes[:, 3:] - boxes[:, :3]) / 2.0
+        self._distance = np.empty((len(self.chunks), 6))
+        self._reach = np.empty((len(self.chunks), 6))
+        self._nearest = np.empty(len(self.chunks))
+        self._visible = np.empty(len(self.chunks), dtype=bool)
+        self._all_chunks = np.ones(len(self.chunks), dtype=bool)
+
+    def _grid_range(self, x1, x2, z1, z2):
+        ix1 = clamp(int((x1 - self._grid_x0) // GRID_CELL), 0, self._grid_nx - 1)
+        ix2 = clamp(int((x2 - self._grid_x0) // GRID_CELL), 0, self._grid_nx - 1)
+        iz1 = clamp(int((z1 - self._grid_z0) // GRID_CELL), 0, self._grid_nz - 1)
+        iz2 = clamp(int((z2 - self._grid_z0) // GRID_CELL), 0, self._grid_nz - 1)
+        return [iz * self._grid_nx + ix for iz in range(iz1, iz2 + 1) for ix in range(ix1, ix2 + 1)]
+
+    def _build_grid(self):
+        # cell -> (walls, holes, hole areas) near it, in level order, so the
+        # collisions and the holes resolve as when everything is tested
+        self._everything = (self.walls, self.holes, self.holes_area)
+        self._grid = None
+        if len(self.walls) < GRID_MIN_WALLS:
+            return
+        self._grid_x0, self._grid_z0 = -self.width / 2.0, -self.depth / 2.0
+        self._grid_nx = max(1, int(math.ceil(self.width / GRID_CELL)))
+        self._grid_nz = max(1, int(math.ceil(self.depth / GRID_CELL)))
+        grid = [([], [], []) for _ in range(self._grid_nx * self._grid_nz)]
+        pad = 2.0 * self.ball_radius
+        for wall in self.walls:
+            x, z, w, d = wall
+            for cell in self._grid_range(x - pad, x + w + pad, z - pad, z + d + pad):
+                grid[cell][0].append(wall)
+        for hole, area in zip(self.holes, self.holes_area):
+            hx, hz, area_r, _ = area
+            for cell in self._grid_range(hx - area_r, hx + area_r, hz - area_r, hz + area_r):
+                grid[cell][1].append(hole)
+                grid[cell][2].append(area)
+        self._grid = grid
+
+    def near(self, x, z):
+        """
+        (walls, holes, hole areas) that the ball at (x, z) can touch: those of
+        its grid cell on large boards, all of them otherwise.
+        """
+        grid = self._grid
+        if grid is None:
+            return self._everything
+        ix = clamp(int((x - self._grid_x0) // GRID_CELL), 0, self._grid_nx - 1)
+        iz = clamp(int((z - self._grid_z0) // GRID_CELL), 0, self._grid_nz - 1)
+        return grid[iz * self._grid_nx + ix]
+
+    def reload(self, level_data):
+        """
+        New definition of the current level (hot reload). Walls and holes are
+        in the order of the new definition, as a cold load has them (collisions
+        are resolved in wall order); the display lists of the chunks that did
+        not change are kept, those of the removed walls and holes released.
+        The ball is not touched. Returns (walls removed, walls added, holes
+        removed, holes added).
+        """
+        self.width, self.depth = board_size(level_data)
+        self.goal_rect = (self.width / 2.0 - 3.0, self.depth / 2.0 - 3.0, 2.2, 2.2)
+        walls = build_walls(level_data, self.width, self.depth, WALL_THICKNESS)
+        _, removed_walls, added_walls = _diff(self.walls, walls)
+        self.walls = walls
+
+        holes = [tuple(h) for h in level_data["holes"]]
+        _, removed_holes, added_holes = _diff(self.holes, holes)
+        for (hx, hz, r) in removed_holes:
+            release_disks(hx, hz, r)
+        self.holes = holes
         self.holes_area = [
-            (x, z, r * 3.0) for (x, z, r) in self.holes
+            (x, z, r * 3.0, r) for (x, z, r) in self.holes
         ]
 
-    def draw(self):
+        old_chunks = {walls for walls, _ in self.chunks}
+        self._build_chunks()
+        self._build_grid()
+        for walls in old_chunks - {walls for walls, _ in self.chunks}:
+            release_walls(walls)
+        return len(removed_walls), len(added_walls), len(removed_holes), len(added_holes)
+
+    def visible_chunks(self):
+        """
+        Mask of the chunks whose bounding box is inside the view frustum of
+        the current modelview and projection matrices (the same array every
+        call: nothing is allocated per frame).
+        """
+        raw_glGetFloatv(GL_MODELVIEW_MATRIX, _modelview_buf)
+        raw_glGetFloatv(GL_PROJECTION_MATRIX, _projection_buf)
+        # (P MV)^T from the column-major matrices, then the 6 planes in board coordinates
+        np.matmul(_modelview, _projection, out=_clip_t)
+        np.matmul(_clip_t, _PLANE_SIGNS_T, out=_planes_t)
+        normals = _planes_t[:3]
+        np.abs(normals, out=_abs_normals)
+        np.matmul(self._centres, normals, out=self._distance)
+        np.matmul(self._extents, _abs_normals, out=self._reach)
+        self._distance += self._reach
+        self._distance += _planes_t[3]
+        np.min(self._distance, axis=1, out=self._nearest)
+        np.greater_equal(self._nearest, 0.0, out=self._visible)
+        return self._visible
+
+    def draw(self, hole_segments=24):
+        w, d = self.width, self.depth
+
         # floor
         glColor3f(0.86, 0.86, 0.86)
         glBegin(GL_QUADS)
-        glVertex3f(-MAZE_WIDTH / 2, 0, -MAZE_DEPTH / 2)
-        glVertex3f(MAZE_WIDTH / 2, 0, -MAZE_DEPTH / 2)
-        glVertex3f(MAZE_WIDTH / 2, 0, MAZE_DEPTH / 2)
-        glVertex3f(-MAZE_WIDTH / 2, 0, MAZE_DEPTH / 2)
+        glVertex3f(-w / 2, 0, -d / 2)
+        glVertex3f(w / 2, 0, -d / 2)
+        glVertex3f(w / 2, 0, d / 2)
+        glVertex3f(-w / 2, 0, d / 2)
         glEnd()
 
         # goal (green patch on the floor)
-        gx, gz, gw, gd = GOAL_RECT
+        gx, gz, gw, gd = self.goal_rect
         glColor3f(0.2, 0.8, 0.2)
         glBegin(GL_QUADS)
         glVertex3f(gx, 0.25, gz)
@@ -111,56 +314,30 @@ class Maze:
         glVertex3f(gx, 0.25, gz + gd)
         glEnd()
 
+        chunks = self.chunks
+        visible = self.visible_chunks() if self.cull else self._all_chunks
+        self.drawn_chunks = int(np.count_nonzero(visible))
+
         # holes (dark disks)
         glColor3f(0.12, 0.12, 0.12)
-        for (hx, hz, r) in self.holes:
-            draw_disk(hx, 0.25, hz, r, segments=24)
+        for (_, holes), seen in zip(chunks, visible):
+            if seen:
+                for (hx, hz, r) in holes:
+                    draw_disk(hx, 0.25, hz, r, segments=hole_segments)
 
         # walls
         glColor3f(0.20, 0.20, 0.20)
-        wall_height = 1
-        for (x, z, w, d) in self.walls:
-            x1, x2 = x, x + w
-            z1, z2 = z, z + d
-
-            glBegin(GL_QUADS)
-
-            # top
-            glVertex3f(x1, wall_height, z1)
-            glVertex3f(x2, wall_height, z1)
-            glVertex3f(x2, wall_height, z2)
-            glVertex3f(x1, wall_height, z2)
-
-            # front
-            glVertex3f(x1, 0, z1)
-            glVertex3f(x2, 0, z1)
-            glVertex3f(x2, wall_height, z1)
-            glVertex3f(x1, wall_height, z1)
-
-            # back
-            glVertex3f(x1, 0, z2)
-            glVertex3f(x2, 0, z2)
-            glVertex3f(x2, wall_height, z2)
-            glVertex3f(x1, wall_height, z2)
-
-            # left
-            glVertex3f(x1, 0, z1)
-            glVertex3f(x1, 0, z2)
-            glVertex3f(x1, wall_height, z2)
-            glVertex3f(x1, wall_height, z1)
-
-            # right
-            glVertex3f(x2, 0, z1)
-            glVertex3f(x2, 0, z2)
-            glVertex3f(x2, wall_height, z2)
-            glVertex3f(x2, wall_height, z1)
-
-            glEnd()
+        for (walls, _), seen in zip(chunks, visible):
+            if seen and walls:
+                draw_walls(walls)
 
     def handle_collisions(self, ball: Ball):
         collided = False
+        radius = self.ball_radius
+        restitution = self.restitution
+        tangential = self.tangential
 
-        for (x, z, w, d) in self.walls:
+        for (x, z, w, d) in self.near(ball.x, ball.z)[0]:
             closest_x = clamp(ball.x, x, x + w)
             closest_z = clamp(ball.z, z, z + d)
 
@@ -168,11 +345,11 @@ class Maze:
             dz = ball.z - closest_z
             dist2 = dx * dx + dz * dz
 
-            if dist2 < BALL_RADIUS * BALL_RADIUS:
+            if dist2 < radius * radius:
                 collided = True   # COLLISION
 
                 dist = math.sqrt(dist2) if dist2 != 0 else 1e-6
-                overlap = BALL_RADIUS - dist
+                overlap = radius - dist
 
                 nx = dx / dist
                 nz = dz / dist
@@ -186,7 +363,7 @@ class Maze:
                 vtx = ball.vx - vnx
                 vtz = ball.vz - vnz
 
-                ball.vx = (-vnx * WALL_RESTITUTION) + (vtx * WALL_TANGENTIAL)
-                ball.vz = (-vnz * WALL_RESTITUTION) + (vtz * WALL_TANGENTIAL)
+                ball.vx = (-vnx * restitution) + (vtx * tangential)
+                ball.vz = (-vnz * restitution) + (vtz * tangential)
 
         return collided
\ No newline at end of file
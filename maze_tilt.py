@@ -1,40 +1,37 @@
+import sys
+import time
+STARTUP_T0 = time.perf_counter()
+if "--no-gl-checks" in sys.argv:
+    # must be set before the first import of OpenGL.GL (or PYOPENGL_ERROR_CHECKING=0)
+    import OpenGL
+    OpenGL.ERROR_CHECKING = False
 import math
 import pygame
 from pygame.locals import *
 from OpenGL.GL import *
-from pythonosc.udp_client import SimpleUDPClient
+# cached pixel buffers are bytes already: the raw entry point skips the array
+# conversion of the wrapper, which leaves work to the garbage collector at every call
+from OpenGL.raw.GL.VERSION.GL_1_0 import glDrawPixels as raw_draw_pixels
 import argparse
 import csv
 import os
 from levels import LEVELS
-from ball import Ball
-from maze import Maze
-from accelerometer import AccelController
+from simulation import GameSimulation, BALL_RADIUS, MAX_TILT_DEG, clamp
+from physics_process import PHYSICS_RATE
+from startup import StartupTimer, Background, load_font
+from spectator import SpectatorPublisher, parse_endpoint
+from trajectory import TrajectoryRecorder, trajectory_path, tilt_path
+from ghost import GhostRecorder, GhostTrack, ghost_path, best_ghost
+from osc_transport import OscTransport, VIBRATION, BOUNCING, BOOM, ROLLING, WIN, parse_channel_endpoint
+from leaderboard import Leaderboard, TOTAL
+from profiler import FrameProfiler, AllocationProfiler, NullProfiler, draw_frame_graph
+from governor import FrameGovernor, SPHERE_LODS, DISK_LODS, DEFAULT_LOD
+
+from config import (IP_ADDRESS, MODALITA_MAP, MAX_ROLL_SPEED, ROLL_ON_THRESHOLD, FPS, RESULTS_FILE,
+                    LEVEL_TIMES_FILE, RESULTS_HEADER, LEVEL_TIMES_HEADER)
 
-IP_ADDRESS = "192.168.0.14"  # IP address of the OSC device (Teensy in our case, but work also for Pure Data on the same PC)
-
-MODALITA_MAP = {
-    0: "Solo video",
-    1: "Video + Audio",
-    2: "Video + Audio + Vibrazione"
-}
-
-MAX_ROLL_SPEED = 16.0 
-ROLL_ON_THRESHOLD = 0.05
-COLLISION_SPEED_THRESHOLD = 0.15
 WIN_WIDTH, WIN_HEIGHT = 1000, 700
-FPS = 60
-MAZE_WIDTH = 20.0
-MAZE_DEPTH = 30.0
-BALL_RADIUS = 0.6
-GRAVITY = 50
-FRICTION = 0.99
-MAX_TILT_DEG = 18
-START_POS = (0.0, -(MAZE_DEPTH / 2.0) + 3.0)  # (x, z)
-START_LIVES = 3
-HOLE_VIBRATION_MAX = 180   # PWM max
-HOLE_VIBRATION_MIN = 40    # min vibration
-GOAL_RECT = (MAZE_WIDTH / 2.0 - 3.0, MAZE_DEPTH / 2.0 - 3.5, 2.2, 2.2)# Goal: rect in XZ plane (x, z, w, d)
+LEADERBOARD_K = 3
 
 
 UI_BG_ALPHA = 160
@@ -59,56 +56,73 @@ NAME_INPUT_Y = NAME_LABEL_Y + LABEL_TO_INPUT_GAP
 ATT_LABEL_Y = NAME_LABEL_Y + FIELD_GAP
 ATT_INPUT_Y = ATT_LABEL_Y + LABEL_TO_INPUT_GAP
 
-def draw_input_panel(font, player_name, attempt, active_field):
-    # dark background
-    overlay = pygame.Surface((WIN_WIDTH, WIN_HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, UI_BG_ALPHA))
-    data = pygame.image.tostring(overlay, "RGBA", True)
-    glDrawPixels(WIN_WIDTH, WIN_HEIGHT, GL_RGBA, GL_UNSIGNED_BYTE, data)
-
-    # central panel
-    panel = pygame.Surface((PANEL_W, PANEL_H))
-    panel.fill((240, 240, 240))
-    pygame.draw.rect(panel, (50, 50, 50), panel.get_rect(), 2)
+BOARD_W, BOARD_H = 560, 300
+BOARD_X = (WIN_WIDTH - BOARD_W) // 2
+BOARD_Y = (WIN_HEIGHT - BOARD_H) // 2 + 40
+BOARD_COLS = (30, 130, 230, 330, 430)
 
-    # texts
-    panel.blit(font.render("Enter data", True, (0, 0, 0)), (120, 20))
-    panel.blit(font.render("Name:", True, (0, 0, 0)), (40, NAME_LABEL_Y - PANEL_Y))
-    panel.blit(font.render("Attempt:", True, (0, 0, 0)), (40, ATT_LABEL_Y - PANEL_Y))
+GRAPH_W, GRAPH_H = 240, 80
+PROFILE_PRINT_SEC = 2.0
+NULL_PROFILER = NullProfiler()
 
-    # input box
-    name_color = (0, 120, 255) if active_field == "name" else (0, 0, 0)
-    att_color = (0, 120, 255) if active_field == "attempt" else (0, 0, 0)
+_input_cache = {"overlay": None, "key": None, "panel": None}
 
-    pygame.draw.rect(panel, name_color, (60, NAME_INPUT_Y - PANEL_Y, INPUT_W, INPUT_H), 2)
-    pygame.draw.rect(panel, att_color, (60, ATT_INPUT_Y - PANEL_Y, INPUT_W, INPUT_H), 2)
-
-    panel.blit(font.render(player_name, True, (0, 0, 0)), (65, NAME_INPUT_Y - PANEL_Y + 5))
-    panel.blit(font.render(attempt, True, (0, 0, 0)), (65, ATT_INPUT_Y - PANEL_Y + 5))
-
-    # button
-    pygame.draw.rect(panel, (0, 200, 0), (BUTTON_X - PANEL_X, BUTTON_Y - PANEL_Y, BUTTON_W, BUTTON_H))
-    panel.blit(font.render("START", True, (255, 255, 255)),
-               (BUTTON_X - PANEL_X + 35, BUTTON_Y - PANEL_Y + 7))
+def draw_input_panel(font, player_name, attempt, active_field):
+    # dark background (constant, converted once)
+    if _input_cache["overlay"] is None:
+        overlay = pygame.Surface((WIN_WIDTH, WIN_HEIGHT), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, UI_BG_ALPHA))
+        _input_cache["overlay"] = pygame.image.tostring(overlay, "RGBA", True)
+    raw_draw_pixels(WIN_WIDTH, WIN_HEIGHT, GL_RGBA, GL_UNSIGNED_BYTE, _input_cache["overlay"])
+
+    # central panel, rendered again only when the fields change
+    key = (player_name, attempt, active_field, font)
+    if _input_cache["key"] != key:
+        panel = pygame.Surface((PANEL_W, PANEL_H))
+        panel.fill((240, 240, 240))
+        pygame.draw.rect(panel, (50, 50, 50), panel.get_rect(), 2)
+
+        # texts
+        panel.blit(font.render("Enter data", True, (0, 0, 0)), (120, 20))
+        panel.blit(font.render("Name:", True, (0, 0, 0)), (40, NAME_LABEL_Y - PANEL_Y))
+        panel.blit(font.render("Attempt:", True, (0, 0, 0)), (40, ATT_LABEL_Y - PANEL_Y))
+
+        # input box
+        name_color = (0, 120, 255) if active_field == "name" else (0, 0, 0)
+        att_color = (0, 120, 255) if active_field == "attempt" else (0, 0, 0)
+
+        pygame.draw.rect(panel, name_color, (60, NAME_INPUT_Y - PANEL_Y, INPUT_W, INPUT_H), 2)
+        pygame.draw.rect(panel, att_color, (60, ATT_INPUT_Y - PANEL_Y, INPUT_W, INPUT_H), 2)
+
+        panel.blit(font.render(player_name, True, (0, 0, 0)), (65, NAME_INPUT_Y - PANEL_Y + 5))
+        panel.blit(font.render(attempt, True, (0, 0, 0)), (65, ATT_INPUT_Y - PANEL_Y + 5))
+
+        # button
+        pygame.draw.rect(panel, (0, 200, 0), (BUTTON_X - PANEL_X, BUTTON_Y - PANEL_Y, BUTTON_W, BUTTON_H))
+        panel.blit(font.render("START", True, (255, 255, 255)),
+                   (BUTTON_X - PANEL_X + 35, BUTTON_Y - PANEL_Y + 7))
+
+        _input_cache["key"] = key
+        _input_cache["panel"] = pygame.image.tostring(panel, "RGBA", True)
 
     # draw panel
-    panel_data = pygame.image.tostring(panel, "RGBA", True)
     glWindowPos2d(PANEL_X, WIN_HEIGHT - PANEL_Y - PANEL_H)
-    glDrawPixels(PANEL_W, PANEL_H, GL_RGBA, GL_UNSIGNED_BYTE, panel_data)
+    raw_draw_pixels(PANEL_W, PANEL_H, GL_RGBA, GL_UNSIGNED_BYTE, _input_cache["panel"])
 
 
 
-# ---------------------------------------------------
-# UTILS
-# ---------------------------------------------------
-def clamp(v, vmin, vmax):
-    return max(vmin, min(vmax, v))
-
-def point_in_rect(px, pz, rect):
-    x, z, w, d = rect
-    return (x <= px <= x + w) and (z <= pz <= z + d)
+_sphere_lists = {}
 
 def draw_sphere(radius, slices=16, stacks=16):
+    # the strips are compiled once per tessellation in a display list
+    key = (radius, slices, stacks)
+    display_list = _sphere_lists.get(key)
+    if display_list is not None:
+        glCallList(display_list)
+        return
+
+    display_list = glGenLists(1)
+    glNewList(display_list, GL_COMPILE_AND_EXECUTE)
     for i in range(stacks):
         lat0 = math.pi * (-0.5 + float(i) / stacks)
         z0  = math.sin(lat0)
@@ -132,6 +146,8 @@ def draw_sphere(radius, slices=16, stacks=16):
                        radius * z1,
                        radius * y * zr1)
         glEnd()
+    glEndList()
+    _sphere_lists[key] = display_list
 
 
 
@@ -169,27 +185,105 @@ def setup_fixed_camera_handheld():
     glRotatef(42.0, 1.0, 0.0, 0.0)
 
 
+FOLLOW_DISTANCE = 16.0
+FOLLOW_PITCH = 55.0
+
+def setup_follow_camera():
+    # closer and steeper; render_scene() centres the board on the ball
+    glLoadIdentity()
+    glTranslatef(0.0, -1.0, -FOLLOW_DISTANCE)
+    glRotatef(FOLLOW_PITCH, 1.0, 0.0, 0.0)
+
+
+
+_text_cache = {}
+TEXT_CACHE_SIZE = 256
+
+def render_text_cached(text, font, color):
+    # (pixels, width, height) of a rendered string, reused while the text does not change
+    key = (text, font, color)
+    entry = _text_cache.get(key)
+    if entry is None:
+        if len(_text_cache) >= TEXT_CACHE_SIZE:
+            _text_cache.clear()
+        text_surface = font.render(text, True, color)
+        width, height = text_surface.get_size()
+        entry = (pygame.image.tostring(text_surface, "RGBA", True), width, height)
+        _text_cache[key] = entry
+    return entry
+
 
 def draw_text_gl(x, y, text, font, color=(10, 10, 10)):
-    text_surface = font.render(text, True, color)
-    text_data = pygame.image.tostring(text_surface, "RGBA", True)
-    width, height = text_surface.get_size()
+    text_data, width, height = render_text_cached(text, font, color)
 
     glWindowPos2d(x, WIN_HEIGHT - y - height)
-    glDrawPixels(width, height, GL_RGBA, GL_UNSIGNED_BYTE, text_data)
+    raw_draw_pixels(width, height, GL_RGBA, GL_UNSIGNED_BYTE, text_data)
+
+
+_hud_lines = {}
+
+def draw_hud_line(slot, x, y, font, fmt, *values, color=(10, 10, 10)):
+    # a HUD line keeps only its last rendering: the text is formatted and rendered
+    # again when the values change, nothing is created on the other frames
+    entry = _hud_lines.get(slot)
+    if entry is None or entry[0] != values or entry[1] is not font:
+        text_surface = font.render(fmt.format(*values), True, color)
+        width, height = text_surface.get_size()
+        entry = (values, font, pygame.image.tostring(text_surface, "RGBA", True), width, height)
+        _hud_lines[slot] = entry
+
+    glWindowPos2d(x, WIN_HEIGHT - y - entry[4])
+    raw_draw_pixels(entry[3], entry[4], GL_RGBA, GL_UNSIGNED_BYTE, entry[2])
+
+
+_board_cache = {"key": None, "data": None}
+
+def draw_leaderboard(font, leaderboard, player_name, modalita, max_level):
+    # the panel is rendered again only when the leaderboard or the player change
+    key = (leaderboard.version, player_name, modalita, font)
+    if _board_cache["key"] != key:
+        panel = pygame.Surface((BOARD_W, BOARD_H))
+        panel.fill((240, 240, 240))
+        pygame.draw.rect(panel, (50, 50, 50), panel.get_rect(), 2)
+
+        title = f"Best times - {MODALITA_MAP.get(modalita, '')}"
+        panel.blit(font.render(title, True, (0, 0, 0)), (BOARD_COLS[0], 15))
+        for col, label in zip(BOARD_COLS, ("Level", "1st", "2nd", "3rd", "You")):
+            panel.blit(font.render(label, True, (80, 80, 80)), (col, 55))
+
+        rows = list(range(1, max_level + 1)) + [TOTAL]
+        for i, level in enumerate(rows):
+            y = 85 + i * 28
+            label = "All" if level == TOTAL else str(level)
+            panel.blit(font.render(label, True, (0, 0, 0)), (BOARD_COLS[0], y))
+
+            best = leaderboard.best(level, modalita)
+            for col, entry in zip(BOARD_COLS[1:4], best):
+                color = (0, 120, 0) if entry[1] == player_name else (0, 0, 0)
+                panel.blit(font.render(f"{entry[0]:.1f}", True, color), (col, y))
+
+            mine = leaderboard.personal_best(player_name, modalita, level)
+            if mine is not None:
+                panel.blit(font.render(f"{mine:.1f}", True, (0, 120, 255)), (BOARD_COLS[4], y))
+
+        _board_cache["key"] = key
+        _board_cache["data"] = pygame.image.tostring(panel, "RGBA", True)
+
+    glWindowPos2d(BOARD_X, WIN_HEIGHT - BOARD_Y - BOARD_H)
+    raw_draw_pixels(BOARD_W, BOARD_H, GL_RGBA, GL_UNSIGNED_BYTE, _board_cache["data"])
 
 
 def draw_hud_gl(font, level, max_level, lives, state, time_sec, wall_hits):
     y = 20
     line_h = 24
 
-    draw_text_gl(20, y, f"Level: {level} / {max_level}", font)
+    draw_hud_line("level", 20, y, font, "Level: {} / {}", level, max_level)
     y += line_h
-    draw_text_gl(20, y, f"Lives: {lives}", font)
+    draw_hud_line("lives", 20, y, font, "Lives: {}", lives)
     y += line_h
-    draw_text_gl(20, y, f"Time: {time_sec:.1f} s", font)
+    draw_hud_line("time", 20, y, font, "Time: {:.1f} s", round(time_sec, 1))
     y += line_h
-    draw_text_gl(20, y, f"Wall collisions: {wall_hits}", font)
+    draw_hud_line("walls", 20, y, font, "Wall collisions: {}", wall_hits)
     y += line_h
 
     if state == "GAME_OVER":
@@ -200,26 +294,139 @@ def draw_hud_gl(font, level, max_level, lives, state, time_sec, wall_hits):
         draw_text_gl(20, y, "YOU WIN! (R to restart)", font, (0, 120, 0))
 
 
-def save_results(name, attempt, modalita, livello, result, time_sec, wall_hits, lives):
+def draw_profiler_graph(prof, budget_ms=1000.0 / FPS):
+    surface = draw_frame_graph((GRAPH_W, GRAPH_H), prof.frame_times(), budget_ms)
+    data = pygame.image.tostring(surface, "RGBA", True)
+    glWindowPos2d(WIN_WIDTH - GRAPH_W - 10, 10)
+    glDrawPixels(GRAPH_W, GRAPH_H, GL_RGBA, GL_UNSIGNED_BYTE, data)
+
+
+def draw_guide_arrow(ball, dx, dz, length=2.5, head=0.6):
+    # flat arrow on the board from the ball toward the goal (flow field direction)
+    y = 0.3
+    x0, z0 = ball.x + dx * BALL_RADIUS * 1.5, ball.z + dz * BALL_RADIUS * 1.5
+    x1, z1 = x0 + dx * length, z0 + dz * length
+    glLineWidth(4.0)
+    glColor3f(1.0, 0.85, 0.0)
+    glBegin(GL_LINES)
+    glVertex3f(x0, y, z0)
+    glVertex3f(x1, y, z1)
+    glEnd()
+    glBegin(GL_TRIANGLES)
+    glVertex3f(x1 + dx * head, y, z1 + dz * head)
+    glVertex3f(x1 - dz * head * 0.6, y, z1 + dx * head * 0.6)
+    glVertex3f(x1 + dz * head * 0.6, y, z1 - dx * head * 0.6)
+    glEnd()
+    glLineWidth(1.0)
+
+
+def draw_ghost(x, z, sphere_lod):
+    # translucent ball of a previous run (ghost.py); does not hide what is behind it
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    glDepthMask(GL_FALSE)
+    glPushMatrix()
+    glTranslatef(x, BALL_RADIUS, z)
+    glColor4f(0.25, 0.45, 1.0, 0.40)
+    draw_sphere(BALL_RADIUS, *sphere_lod)
+    glPopMatrix()
+    glDepthMask(GL_TRUE)
+    glDisable(GL_BLEND)
+
+
+def render_scene(maze, ball, tilt_x_deg, tilt_z_deg, prof=NULL_PROFILER,
+                 sphere_lod=SPHERE_LODS[DEFAULT_LOD], disk_segments=DISK_LODS[DEFAULT_LOD], guide=None,
+                 follow=False, ghost=None):
+    # -------- RENDER 3D --------
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    glLoadIdentity()
+    if follow:
+        setup_follow_camera()
+    else:
+        setup_fixed_camera_handheld()
+    prof.lap("clear")
+
+    glPushMatrix()
+
+    glRotatef(tilt_x_deg, 1, 0, 0)
+    glRotatef(-tilt_z_deg, 0, 0, 1)
+
+    glTranslatef(0.0, 3.0, 0.0)
+    if follow:
+        # the board tilts around the ball
+        glTranslatef(-ball.x, 0.0, -ball.z)
+
+    maze.draw(disk_segments)
+    prof.lap("maze.draw")
+
+    glPushMatrix()
+    glTranslatef(ball.x, BALL_RADIUS, ball.z)
+    glColor3f(1.0, 0.2, 0.2)
+    draw_sphere(BALL_RADIUS, *sphere_lod)
+    glPopMatrix()
+
+    if ghost is not None:
+        draw_ghost(*ghost, sphere_lod)
+
+    if guide is not None:
+        draw_guide_arrow(ball, *guide)
+
+    glPopMatrix()
+    prof.lap("draw_sphere")
+
+
+def render_overlay(font, state, player_name, attempt_number, input_field,
+                   level, max_level, lives, time_sec, wall_hits,
+                   leaderboard=None, modalita=0, prof=NULL_PROFILER, graph=False, budget_ms=1000.0 / FPS):
+    # ---------- HUD OPENGL ----------
+    glDisable(GL_DEPTH_TEST)
+
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    if state == "INPUT":
+        draw_input_panel(font, player_name, attempt_number, input_field)
+
+    draw_hud_gl(font, level, max_level, lives, state, time_sec, wall_hits)
+
+    if state in ("WIN", "GAME_OVER") and leaderboard is not None:
+        draw_leaderboard(font, leaderboard, player_name, modalita, max_level)
+    prof.lap("hud")
+
+    if graph:
+        draw_profiler_graph(prof, budget_ms)
+        prof.lap("graph")
+
+    glDisable(GL_BLEND)
+    glEnable(GL_DEPTH_TEST)
+
+
+def save_level_time(name, attempt, modalita, livello, time_sec, leaderboard=None):
     os.makedirs("results", exist_ok=True)
-    filename = os.path.join("results", "results.csv")
+    file_exists = os.path.isfile(LEVEL_TIMES_FILE)
+
+    with open(LEVEL_TIMES_FILE, mode="a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+
+        if not file_exists:
+            writer.writerow(LEVEL_TIMES_HEADER)
+
+        writer.writerow([name, attempt, modalita, livello, f"{time_sec:.2f}"])
+
+    if leaderboard is not None:
+        leaderboard.add_level_time(name, attempt, modalita, livello, round(time_sec, 2))
+
+
+def save_results(name, attempt, modalita, livello, result, time_sec, wall_hits, lives, leaderboard=None):
+    os.makedirs("results", exist_ok=True)
+    filename = RESULTS_FILE
     file_exists = os.path.isfile(filename)
 
     with open(filename, mode="a", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
 
         if not file_exists:
-            writer.writerow([
-                "Nome",
-                "Tentativo",
-                "Modalità_ID",
-                "Modalità",
-                "Livello_raggiunto",
-                "Esito",
-                "Tempo_totale_sec",
-                "Collisioni_muri",
-                "Vite_rimanenti"
-            ])
+            writer.writerow(RESULTS_HEADER)
 
         writer.writerow([
             name,
@@ -233,6 +440,9 @@ def save_results(name, attempt, modalita, livello, result, time_sec, wall_hits,
             lives
         ])
 
+    if leaderboard is not None:
+        leaderboard.add_result(name, attempt, modalita, result, round(time_sec, 2))
+
 
 
 # ---------------------------------------------------
@@ -243,7 +453,51 @@ def main():
     parser = argparse.ArgumentParser(description="Labirinto 3D multimodale")
     parser.add_argument("--audio", action="store_true", help="Abilita audio OSC")
     parser.add_argument("--vibration", action="store_true", help="Abilita vibrazioni ERM")
+    parser.add_argument("--record-trajectory", action="store_true", help="Save per-frame ball positions in results/trajectories")
+    parser.add_argument("--record-tilt", action="store_true", help="Also save the per-frame tilt (replayed by param_sweep.py)")
+    parser.add_argument("--fps", type=int, default=FPS, help="Target frame rate")
+    parser.add_argument("--fps-max", type=int, default=None, help="Allow raising the frame rate up to this value (e.g. 120, 144) when there is headroom")
+    parser.add_argument("--lod", type=int, choices=range(len(SPHERE_LODS)), default=DEFAULT_LOD, help="Initial mesh detail of ball and holes")
+    parser.add_argument("--fixed-lod", action="store_true", help="Do not adapt LOD and frame rate to the frame time")
+    parser.add_argument("--profile", action="store_true", help="Print per-stage frame timings")
+    parser.add_argument("--profile-graph", action="store_true", help="Show the frame-time graph (implies --profile)")
+    parser.add_argument("--profile-trace", metavar="FILE", default=None, help="Write a Chrome trace-event JSON at exit (implies --profile)")
+    parser.add_argument("--profile-alloc", action="store_true", help="Also count allocations and GC pauses per stage with tracemalloc (slow, implies --profile)")
+    parser.add_argument("--physics-process", action="store_true", help="Run accelerometer input and physics in a separate process at a fixed rate")
+    parser.add_argument("--physics-hz", type=int, default=PHYSICS_RATE, help="Physics rate of --physics-process")
+    parser.add_argument("--osc-host", default=IP_ADDRESS, help=f"Host of the OSC feedback (Teensy / Pure Data), default {IP_ADDRESS}")
+    parser.add_argument("--osc-endpoint", action="append", default=[], metavar="CHANNEL=HOST[:PORT]",
+                        help="Send one feedback channel (vibration, bouncing, boom, rolling, win) elsewhere (repeatable)")
+    parser.add_argument("--osc-latency", type=float, default=None, metavar="MS",
+                        help="Send /bouncing, /boom, /V and /win as OSC bundles timetagged MS ms after the physics time of the event")
+    parser.add_argument("--no-gl-checks", action="store_true", help="Disable PyOpenGL error checking (faster GL calls, errors are not reported)")
+    parser.add_argument("--startup-report", action="store_true", help="Print the startup timings after the first frame")
+    parser.add_argument("--spectate", action="append", default=[], metavar="HOST:PORT", help="Stream the game state to a spectator (python spectator.py)")
+    parser.add_argument("--generated", type=int, default=None, metavar="SEED", help="Play generated levels (levelgen.py) instead of the ones of levels.py")
+    parser.add_argument("--level-pack", default=None, metavar="FILE", help="Play the levels of a level pack (levelpack.py), loaded when reached")
+    parser.add_argument("--watch-levels", action="store_true", help="Reload levels.py when it changes, without restarting the game")
+    parser.add_argument("--level", type=int, default=None, help="Start (and restart) at this level")
+    parser.add_argument("--follow-camera", action="store_true", help="Camera close to the ball, following it (large boards)")
+    parser.add_argument("--record-ghosts", action="store_true", help="Save the ball path of every level attempt in results/ghosts (ghost.py)")
+    parser.add_argument("--ghost", action="store_true", help="Show the best previous run of the level as a translucent ball")
+    parser.add_argument("--ghost-player", default=None, metavar="NAME", help="Only the runs of this player for --ghost")
+    parser.add_argument("--guidance", action="store_true", help="Show an arrow toward the goal (flow field of the level)")
+    parser.add_argument("--autopilot", action="store_true", help="The flow field tilts the board instead of the accelerometer (automated tests)")
     args = parser.parse_args()
+    if args.autopilot and args.physics_process:
+        parser.error("--autopilot replaces the accelerometer of --physics-process: use one of them")
+    if args.level_pack and args.generated is not None:
+        parser.error("--level-pack and --generated both choose the levels: use one of them")
+    if (args.watch_levels or args.level) and args.physics_process:
+        parser.error("--watch-levels and --level need the physics in this process (no --physics-process)")
+    if args.watch_levels and (args.level_pack or args.generated is not None):
+        parser.error("--watch-levels reloads levels.py: not with --level-pack or --generated")
+    try:
+        osc_endpoints = dict(parse_channel_endpoint(e) for e in args.osc_endpoint)
+    except ValueError as e:
+        parser.error(str(e))
+    startup = StartupTimer(STARTUP_T0)
+    startup.mark("imports")
     modalita=0
     if args.audio and args.vibration:
         modalita=2
@@ -253,29 +507,80 @@ def main():
     ENABLE_AUDIO = args.audio
     ENABLE_VIBRATION = args.vibration    
 
-    if ENABLE_VIBRATION:
-        vibration = SimpleUDPClient(IP_ADDRESS, 2222)
+    if args.profile_alloc:
+        prof = AllocationProfiler(trace=args.profile_trace is not None)
+    elif args.profile or args.profile_graph or args.profile_trace:
+        prof = FrameProfiler(trace=args.profile_trace is not None)
     else:
-        vibration = None    
+        prof = NullProfiler()
+    last_profile_print = 0.0
+    governor = FrameGovernor(args.fps, args.fps_max, args.lod, adaptive=not args.fixed_lod)
 
-    if ENABLE_AUDIO:
-        bouncing = SimpleUDPClient(IP_ADDRESS, 9000)
-        boom = SimpleUDPClient(IP_ADDRESS, 9001)
-        rolling = SimpleUDPClient(IP_ADDRESS, 9002)
-        win=SimpleUDPClient(IP_ADDRESS,9003)
+    if args.physics_process or args.autopilot:
+        accel_init = None
     else:
-        bouncing = boom = rolling = win = None
+        # OSC server bound while the window opens; needed only when the game starts
+        def create_accel():
+            from accelerometer import AccelController
+            return AccelController()
+        accel_init = Background(create_accel)
+
+    # vibration (Teensy) and sound (Pure Data) channels: one socket per host
+    osc = OscTransport(args.osc_host, osc_endpoints) if ENABLE_AUDIO or ENABLE_VIBRATION else None
+
+    events = None
+    if args.osc_latency is not None and osc is not None:
+        from osc_events import EventScheduler
+        events = EventScheduler(args.osc_latency / 1000.0)
+
+    def send_event(channel, address, physics_time):
+        # /bouncing, /boom, /V, /win: at once, or timetagged at the physics time (--osc-latency)
+        if events is not None:
+            osc.send(channel, events.bundle(address, 1, physics_time))
+        else:
+            osc.send_const(channel, address, 1)
 
     pygame.init()
-    font = pygame.font.SysFont("Arial", 20, bold=True)
-    current_level = 1
-    max_level = max(LEVELS.keys())
-    maze = Maze(level=current_level)
-    ball = Ball(*START_POS, gravity=GRAVITY, friction=FRICTION)
-    lives = START_LIVES
+    startup.mark("pygame.init")
+    font = load_font("Arial", 20, bold=True)
+    startup.mark("font")
+    levels = LEVELS
+    level_source = "levels"    # for the spectators (spectator.load_levels)
+    if args.generated is not None:
+        from levelgen import generate_levels
+        levels = generate_levels(args.generated, len(LEVELS))
+        level_source = f"generated:{args.generated}:{len(LEVELS)}"
+    elif args.level_pack:
+        from levelpack import LevelPack
+        levels = LevelPack(args.level_pack)
+        level_source = f"pack:{os.path.abspath(args.level_pack)}"
+    max_level = max(levels.keys())
+    if args.level is not None and args.level not in levels:
+        parser.error(f"--level {args.level}: there are levels {min(levels.keys())}..{max_level}")
+    leaderboard = Leaderboard(LEADERBOARD_K).load(RESULTS_FILE, LEVEL_TIMES_FILE)
+    accel = None
+    if args.physics_process:
+        # the AccelController lives in the physics process
+        from physics_process import RemotePhysics
+        sim = RemotePhysics(args.physics_hz, levels=levels)
+        sim.wait_ready()
+    else:
+        sim = GameSimulation(levels=levels)
+        if args.level is not None:
+            sim.restart(args.level)
+    watcher = None
+    if args.watch_levels:
+        from hotreload import LevelWatcher, apply_reload
+        watcher = LevelWatcher(levels)
+    pilot = None
+    if args.autopilot or args.guidance:
+        # flow fields computed once per level (then read from .flowfield_cache)
+        from flowfield import Autopilot
+        pilot = Autopilot(levels)
+    startup.mark("game state")
     start_time = None
     total_time = 0.0
-    wall_collisions = 0
+    level_start_time = 0.0
     player_name = ""
     attempt_number = ""
     input_field = "name"   # "name" | "attempt"
@@ -283,22 +588,36 @@ def main():
     screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT), DOUBLEBUF | OPENGL)
     pygame.display.set_caption("MazeTilt")
     clock = pygame.time.Clock()
-    accel = AccelController()
+    startup.mark("window")
 
     init_opengl()   
+    startup.mark("opengl")
+    first_frame = True
 
     tilt_x_deg = 0.0
     tilt_z_deg = 0.0
     running = True
     rolling_on = False
+    recorder = None
+    ghost_rec = None       # GhostRecorder of the level being played (--record-ghosts)
+    ghost = None           # GhostTrack shown next to the ball (--ghost)
+    ghost_level = None
+    ghost_pos = None
+    spectator = (SpectatorPublisher([parse_endpoint(e) for e in args.spectate], source=level_source)
+                 if args.spectate else None)
 
     def reset_tilt(accel):
+        if accel is None:
+            return 0.0, 0.0
         accel.tilt_x_deg = 0.0
         accel.tilt_z_deg = 0.0
         return 0.0, 0.0   
 
     while running:
-        dt = clock.tick(FPS) / 1000.0
+        prof.begin_frame()
+        dt = clock.tick(governor.target_fps) / 1000.0
+        work_start = time.perf_counter()
+        prof.lap("tick")
         
         for event in pygame.event.get():
             if event.type == QUIT:
@@ -361,15 +680,20 @@ def main():
 
         # Restart after win/gameover with R
         if keys[K_r] and state in ("WIN", "GAME_OVER"):
-            lives = START_LIVES
-            current_level = 1
-            maze = Maze(level=current_level)
-            ball.reset()
+            if args.level is not None:
+                sim.restart(args.level)
+            else:
+                sim.restart()
             reset_tilt(accel)
             state = "PLAY"
-            wall_collisions = 0
             total_time = 0.0
+            level_start_time = 0.0
             start_time = pygame.time.get_ticks()
+            if recorder is not None:
+                recorder.close()
+                recorder = None
+            ghost_rec = None
+            ghost_level = None
             player_name = ""
             attempt_number = ""
             input_field = "name"
@@ -377,177 +701,214 @@ def main():
 
         # Reset soft (SPACE) solo durante gioco
         if keys[K_SPACE] and state == "PLAY":
-            ball.reset()
+            sim.soft_reset()
             reset_tilt(accel)
 
-        if state == "PLAY" and start_time is not None:
-            total_time = (pygame.time.get_ticks() - start_time) / 1000.0
-            # --- INPUT FROM ACCELEROMETER ---
-            tilt_x_deg, tilt_z_deg = accel.update()
+        if watcher is not None:
+            reloaded = watcher.poll(work_start)
+            if reloaded is not None:
+                print(apply_reload(sim, reloaded, pilot), flush=True)
+                max_level = sim.max_level
 
-            tilt_x_deg = clamp(tilt_x_deg, -MAX_TILT_DEG, MAX_TILT_DEG)
-            tilt_z_deg = clamp(tilt_z_deg, -MAX_TILT_DEG, MAX_TILT_DEG)
+        prof.lap("events")
 
-            # physics + collisions
-            ball.update(dt, tilt_x_deg, tilt_z_deg)
-            speed = math.hypot(ball.vx, ball.vz)
-            hit_wall = maze.handle_collisions(ball)
-            if hit_wall and speed > COLLISION_SPEED_THRESHOLD:
-                wall_collisions += 1
+        hit_wall = fell = level_completed = False
+        if state == "PLAY" and start_time is not None:
+            total_time = (pygame.time.get_ticks() - start_time) / 1000.0
+            if (args.record_trajectory or args.record_tilt) and recorder is None:
+                recorder = TrajectoryRecorder(trajectory_path(player_name, attempt_number, modalita), modalita,
+                                              tilt_path=tilt_path(player_name, attempt_number, modalita) if args.record_tilt else None)
+            level = sim.level
+            if args.record_ghosts and ghost_rec is None:
+                ghost_rec = GhostRecorder(ghost_path(player_name, attempt_number, modalita, level), level)
+            if pilot is not None and args.autopilot:
+                tilt_x_deg, tilt_z_deg = pilot.update(sim.ball, sim.level)
+                prof.lap("accel")
+                sim.advance(dt, tilt_x_deg, tilt_z_deg, prof)
+            elif accel is not None:
+                # --- INPUT FROM ACCELEROMETER ---
+                tilt_x_deg, tilt_z_deg = accel.update()
+
+                tilt_x_deg = clamp(tilt_x_deg, -MAX_TILT_DEG, MAX_TILT_DEG)
+                tilt_z_deg = clamp(tilt_z_deg, -MAX_TILT_DEG, MAX_TILT_DEG)
+                prof.lap("accel")
+
+                # physics + collisions, holes, lives, goal, at a fixed 60 Hz whatever the frame rate
+                sim.advance(dt, tilt_x_deg, tilt_z_deg, prof)
+            else:
+                # stepped by the physics process: read its latest state
+                sim.step()
+                tilt_x_deg, tilt_z_deg = sim.tilt_x, sim.tilt_z
+            if events is not None:
+                events.sync(sim.sim_time)
+            # the steps lap "ball", "collisions" and "holes"; the rest (goal, next level,
+            # or the read of the physics process) is "physics"
+            prof.lap("physics")
+            hit_wall = sim.hit_wall
+            fell = sim.fell
 
             # ---------------------------------------------------
             # ROLLING SOUND (ON/OFF + VELOCITY)
             # ---------------------------------------------------
 
             # real ball speed
-            speed = math.sqrt(ball.vx * ball.vx + ball.vz * ball.vz)
+            speed = sim.speed
 
             if speed > ROLL_ON_THRESHOLD:
                 # turn on rolling if it was off
                 if not rolling_on:
                     if ENABLE_AUDIO:
-                        rolling.send_message("/rolling/on", 1)
+                        osc.send_const(ROLLING, "/rolling/on", 1)
                     rolling_on = True
 
                 # map physical speed -> sound velocity
                 rolling_velocity = min((speed / MAX_ROLL_SPEED) * 5.0, 5.0)
 
                 if ENABLE_AUDIO:
-                    rolling.send_message("/rolling/velocity", rolling_velocity)
+                    osc.send_value(ROLLING, "/rolling/velocity", rolling_velocity)
 
             else:
                 # turn off rolling if the ball is stopped
                 if rolling_on:
                     if ENABLE_AUDIO:                        
-                        rolling.send_message("/rolling/on", 0)
+                        osc.send_const(ROLLING, "/rolling/on", 0)
                     rolling_on = False
 
             if hit_wall and ENABLE_AUDIO:
-                bouncing.send_message("/bouncing", 1)
+                send_event(BOUNCING, "/bouncing", sim.hit_time)
             if hit_wall and ENABLE_VIBRATION:
-                vibration.send_message("/V", 1)
+                send_event(VIBRATION, "/V", sim.hit_time)
 
             # ---------------------------------------------------
             # HOLE AREA -> CONTINUOUS VIBRATION PROPORTIONAL
             # ---------------------------------------------------
 
-            hole_vibration = 0
-            inside_area = False
-
-            for (hx, hz, area_r) in maze.holes_area:
-                dist = math.hypot(ball.x - hx, ball.z - hz)
-
-                if dist < area_r:
-                    inside_area = True
-
-                    # find true hole radius
-                    hole_r = next(r for (x, z, r) in maze.holes if x == hx and z == hz)
-
-                    # normalize distance (0 = hole center, 1 = area edge)
-                    t = clamp((dist - hole_r) / (area_r - hole_r), 0.0, 1.0)
-
-                    # invert: closer -> more vibration
-                    intensity = HOLE_VIBRATION_MIN + (1.0 - t) * (HOLE_VIBRATION_MAX - HOLE_VIBRATION_MIN)
-
-                    hole_vibration = int(intensity)
-                    break
-
             # send command to teensy
-            if inside_area:
+            if sim.inside_area:
                 if ENABLE_VIBRATION:
-                    vibration.send_message("/H", hole_vibration)
+                    osc.send_const(VIBRATION, "/H", sim.hole_vibration)
             else:
                 if ENABLE_VIBRATION:
-                    vibration.send_message("/H", 0)
+                    osc.send_const(VIBRATION, "/H", 0)
 
             # falling into holes
-            fell = False
-            for (hx, hz, r) in maze.holes:
-                if math.hypot(ball.x - hx, ball.z - hz) < (r - BALL_RADIUS * 0.25):
-                    fell = True
-                    if ENABLE_AUDIO:
-                        boom.send_message("/boom", 1)
-                    break
+            if fell and ENABLE_AUDIO:
+                send_event(BOOM, "/boom", sim.fall_time)
+            prof.lap("osc")
+
+            if recorder is not None:
+                recorder.record(total_time, level, sim.event_x, sim.event_z, speed, hit_wall, fell, tilt_x_deg, tilt_z_deg)
+            if ghost_rec is not None:
+                level_time = total_time - level_start_time
+                if sim.level_completed or sim.state == "GAME_OVER":
+                    ghost_rec.finish(level_time, sim.event_x, sim.event_z, sim.level_completed)
+                    ghost_rec = None
+                elif sim.ball_reset:
+                    ghost_rec.jump(level_time, sim.event_x, sim.event_z, sim.ball.x, sim.ball.z)
+                else:
+                    ghost_rec.sample(level_time, sim.ball.x, sim.ball.z)
 
             if fell:
-                lives -= 1
                 if ENABLE_AUDIO:
-                    boom.send_message("/boom", 1)
-                if lives <= 0:
+                    send_event(BOOM, "/boom", sim.fall_time)
+                if sim.state == "GAME_OVER":
                     state = "GAME_OVER" 
-                    save_results(player_name, attempt_number, modalita, current_level, "GAME_OVER", total_time, wall_collisions, lives)    
+                    save_results(player_name, attempt_number, modalita, level, "GAME_OVER", total_time, sim.wall_collisions, sim.lives, leaderboard)    
+                    if recorder is not None:
+                        recorder.close()
+                        recorder = None
                     if ENABLE_VIBRATION:
-                        vibration.send_message("/H", 0)
+                        osc.send_const(VIBRATION, "/H", 0)
                     if ENABLE_AUDIO:
-                        rolling.send_message("/rolling/on", 0)
+                        osc.send_const(ROLLING, "/rolling/on", 0)
                     rolling_on = False
-                else:
-                    ball.reset()                   
-                    reset_tilt(accel)                    
+
+            if sim.ball_reset:
+                reset_tilt(accel)
 
             # victory
-            if point_in_rect(ball.x, ball.z, GOAL_RECT):
+            level_completed = sim.level_completed
+            if level_completed:
                 if ENABLE_AUDIO:
-                    win.send_message("/win", 1)
-                    rolling.send_message("/rolling/on", 0)
+                    send_event(WIN, "/win", sim.completed_time)
+                    osc.send_const(ROLLING, "/rolling/on", 0)
                 if ENABLE_VIBRATION:
-                    vibration.send_message("/H", 0)
+                    osc.send_const(VIBRATION, "/H", 0)
                 rolling_on = False
 
-                if current_level < max_level:
-                    current_level += 1
-                    maze = Maze(level=current_level)
-                    ball.reset()
-                    reset_tilt(accel)
-                    state = "PLAY"
-                else:
-                    state = "WIN"
-                    save_results(player_name, attempt_number, modalita, current_level, "WIN", total_time, wall_collisions, lives) 
-
-        # -------- RENDER 3D --------
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity()
-        setup_fixed_camera_handheld()
-
-        glPushMatrix()
-
-        glRotatef(tilt_x_deg, 1, 0, 0)
-        glRotatef(-tilt_z_deg, 0, 0, 1)
+                save_level_time(player_name, attempt_number, modalita, level, total_time - level_start_time, leaderboard)
+                level_start_time = total_time
 
-        glTranslatef(0.0, 3.0, 0.0)
-
-        maze.draw()
-
-        glPushMatrix()
-        glTranslatef(ball.x, BALL_RADIUS, ball.z)
-        glColor3f(1.0, 0.2, 0.2)
-        draw_sphere(BALL_RADIUS)
-        glPopMatrix()
-
-        glPopMatrix()
-
-        # ---------- HUD OPENGL ----------
-        glDisable(GL_DEPTH_TEST)
-
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
-        if state == "INPUT":
-            draw_input_panel(font, player_name, attempt_number, input_field)
-
-        draw_hud_gl(font, current_level, max_level, lives, state, total_time, wall_collisions)
-
-        glDisable(GL_BLEND)
-        glEnable(GL_DEPTH_TEST)
+                if sim.state == "WIN":
+                    state = "WIN"
+                    save_results(player_name, attempt_number, modalita, level, "WIN", total_time, sim.wall_collisions, sim.lives, leaderboard) 
+                    if recorder is not None:
+                        recorder.close()
+                        recorder = None
+            prof.lap("game")
+
+        if spectator is not None:
+            spectator.publish(state, sim.level, sim.lives, sim.ball.x, sim.ball.z, tilt_x_deg, tilt_z_deg,
+                              total_time, sim.wall_collisions, player_name, hit_wall, fell, level_completed)
+            prof.lap("spectator")
+
+        guide = pilot.field(sim.level).direction(sim.ball.x, sim.ball.z) if args.guidance and state == "PLAY" else None
+        if args.ghost:
+            if ghost_level != sim.level:
+                ghost_level = sim.level
+                ghost_file = best_ghost(sim.level, player=args.ghost_player)
+                ghost = GhostTrack(ghost_file) if ghost_file else None
+            ghost_pos = ghost.position(total_time - level_start_time) if ghost is not None and state == "PLAY" else None
+        render_scene(sim.maze, sim.ball, tilt_x_deg, tilt_z_deg, prof, governor.sphere, governor.disk_segments, guide,
+                     args.follow_camera, ghost_pos)
+        render_overlay(font, state, player_name, attempt_number, input_field,
+                       sim.level, max_level, sim.lives, total_time, sim.wall_collisions,
+                       leaderboard, modalita, prof, args.profile_graph, governor.budget_ms)
+
+        # work time without the waits of tick and of the buffer swap (vsync)
+        governor.update((time.perf_counter() - work_start) * 1000.0)
 
         pygame.display.flip()
+        prof.lap("flip")
+        prof.end_frame()
+
+        if first_frame:
+            first_frame = False
+            startup.mark("first frame")
+            if accel_init is not None:
+                accel = accel_init.result()
+            if args.startup_report:
+                print(startup.report())
+                if accel_init is not None:
+                    print(f"  OSC server (background)  ready at {(accel_init.done_at - STARTUP_T0) * 1000.0:9.1f} ms", flush=True)
+
+        if prof.enabled and time.perf_counter() - last_profile_print > PROFILE_PRINT_SEC:
+            last_profile_print = time.perf_counter()
+            print(prof.report())
+            print(governor.status() + "\n")
 
     if ENABLE_AUDIO:
-        rolling.send_message("/rolling/on", 0)
+        osc.send_const(ROLLING, "/rolling/on", 0)
     if ENABLE_VIBRATION:
-        vibration.send_message("/H", 0)
+        osc.send_const(VIBRATION, "/H", 0)
+    if events is not None:
+        events.close()
+    if osc is not None:
+        osc.close()
+
+    if recorder is not None:
+        recorder.close()
+
+    if spectator is not None:
+        spectator.close()
+
+    if args.profile_trace:
+        prof.export_chrome_trace(args.profile_trace)
 
-    accel.close()
+    if accel is not None:
+        accel.close()
+    elif args.physics_process:
+        sim.close()
     pygame.quit()
 
 
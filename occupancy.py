@@ -0,0 +1,137 @@
+# ---------------------------------------------------
+# OCCUPANCY GRID
+# ---------------------------------------------------
+# A level rasterised (numpy) into a grid of cells where the centre of the ball
+# can or cannot be: walls are inflated by BALL_RADIUS (distance from the rect,
+# so the corners are rounded), holes block the disk where the ball falls in.
+# reachable() floods the free cells from the start (4-connected) by
+# propagating along whole rows and columns of free cells, so the number of
+# numpy passes grows with the number of turns of the path, not its length.
+import numpy as np
+
+from levels import WALL_THICKNESS, build_walls
+from simulation import MAZE_WIDTH, MAZE_DEPTH, BALL_RADIUS, START_POS, GOAL_RECT
+
+CELL = 0.25                         # grid step (board units)
+HOLE_FALL_RADIUS = BALL_RADIUS * 0.25   # fell_in_hole(): centre closer than r - this
+
+
+class OccupancyGrid:
+    """
+    blocked[iz, ix] is True where the centre of the ball cannot be; cell (iz, ix)
+    has its centre at (x0 + (ix + 0.5) * cell, z0 + (iz + 0.5) * cell).
+    With margin = cell / 2 a free cell is free in all its extent, so the ball
+    can really go between two neighbouring free cells.
+    """
+    def __init__(self, walls, holes, cell=CELL, radius=BALL_RADIUS, margin=0.0,
+                 width=MAZE_WIDTH, depth=MAZE_DEPTH):
+        self.cell = cell
+        self.x0 = -width / 2.0
+        self.z0 = -depth / 2.0
+        self.nx = int(round(width / cell))
+        self.nz = int(round(depth / cell))
+        self.xs = self.x0 + (np.arange(self.nx) + 0.5) * cell
+        self.zs = self.z0 + (np.arange(self.nz) + 0.5) * cell
+        self.blocked = np.zeros((self.nz, self.nx), dtype=bool)
+
+        radius += margin
+        r2 = radius * radius
+        for (x, z, w, d) in walls:
+            self._block(x - radius, z - radius, x + w + radius, z + d + radius,
+                        lambda px, pz: (np.maximum(np.maximum(x - px, 0.0), px - (x + w)) ** 2
+                                        + np.maximum(np.maximum(z - pz, 0.0), pz - (z + d)) ** 2) <= r2)
+        for (hx, hz, r) in holes:
+            fall = max(r - HOLE_FALL_RADIUS, 0.0) + margin
+            self._block(hx - fall, hz - fall, hx + fall, hz + fall,
+                        lambda px, pz: (px - hx) ** 2 + (pz - hz) ** 2 < fall * fall)
+
+    def _block(self, xa, za, xb, zb, inside):
+        # only the cells of the bounding box are tested
+        ia, ib = self.index_range(xa, xb, self.x0, self.nx)
+        ja, jb = self.index_range(za, zb, self.z0, self.nz)
+        if ia >= ib or ja >= jb:
+            return
+        px = self.xs[ia:ib][None, :]
+        pz = self.zs[ja:jb][:, None]
+        self.blocked[ja:jb, ia:ib] |= inside(px, pz)
+
+    def index_range(self, a, b, origin, n):
+        lo = int(np.floor((a - origin) / self.cell - 0.5))
+        hi = int(np.ceil((b - origin) / self.cell + 0.5))
+        return max(lo, 0), min(hi, n)
+
+    def cell_of(self, x, z):
+        ix = min(max(int((x - self.x0) / self.cell), 0), self.nx - 1)
+        iz = min(max(int((z - self.z0) / self.cell), 0), self.nz - 1)
+        return iz, ix
+
+    def rect_mask(self, rect):
+        # cells whose centre is inside rect (x, z, w, d)
+        x, z, w, d = rect
+        return (((self.zs >= z) & (self.zs <= z + d))[:, None]
+                & ((self.xs >= x) & (self.xs <= x + w))[None, :])
+
+    def around(self, x, z):
+        # the (up to) 4 cells whose centres surround the point
+        seed = np.zeros(self.blocked.shape, dtype=bool)
+        ix = int(np.floor((x - self.x0) / self.cell - 0.5))
+        iz = int(np.floor((z - self.z0) / self.cell - 0.5))
+        seed[max(iz, 0):max(iz + 2, 0), max(ix, 0):max(ix + 2, 0)] = True
+        return seed
+
+    def reachable(self, start):
+        """
+        Free cells reachable from the (x, z) start position (a start close to
+        a wall can fall in a blocked cell: the free cells around it are used).
+        """
+        return flood(~self.blocked, self.around(*start))
+
+
+def _run_ids(free):
+    # id (1..) of the horizontal run of free cells every cell belongs to, 0 when blocked
+    starts = free.copy()
+    starts[:, 1:] &= ~free[:, :-1]
+    ids = np.cumsum(starts.ravel()).reshape(free.shape)
+    ids[~free] = 0
+    return ids, int(ids.max())
+
+
+def flood(free, seed):
+    """
+    4-connected flood fill of the free cells from the cells of the seed mask.
+    """
+    reached = seed & free
+    count = int(np.count_nonzero(reached))
+    if count == 0:
+        return reached
+    row_ids, n_rows = _run_ids(free)
+    col_ids, n_cols = _run_ids(np.ascontiguousarray(free.T))
+    col_ids = col_ids.T
+    while True:
+        hit = np.zeros(n_rows + 1, dtype=bool)
+        hit[row_ids[reached]] = True
+        hit[0] = False
+        reached = hit[row_ids]
+        hit = np.zeros(n_cols + 1, dtype=bool)
+        hit[col_ids[reached]] = True
+        hit[0] = False
+        reached = hit[col_ids]
+        new_count = int(np.count_nonzero(reached))
+        if new_count == count:
+            return reached
+        count = new_count
+
+
+def level_grid(level_data, cell=CELL):
+    walls = build_walls(level_data, MAZE_WIDTH, MAZE_DEPTH, WALL_THICKNESS)
+    return OccupancyGrid(walls, level_data["holes"], cell, margin=cell / 2.0)
+
+
+def is_solvable(level_data, cell=CELL, start=START_POS, goal=GOAL_RECT):
+    """
+    True when the ball can go from start to the goal without touching a wall
+    or falling in a hole (at the resolution of the grid).
+    """
+    grid = level_grid(level_data, cell)
+    reached = grid.reachable(start)
+    return bool(np.any(reached & grid.rect_mask(goal)))
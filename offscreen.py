@@ -0,0 +1,47 @@
+# ---------------------------------------------------
+# OFFSCREEN GL CONTEXT
+# ---------------------------------------------------
+# Hidden pygame/OpenGL window for benchmarks and frame dumps on machines without
+# a display or GPU. Without DISPLAY/WAYLAND_DISPLAY the SDL "offscreen" video
+# driver is used, which creates the context through EGL (Mesa llvmpipe in
+# software); on an X server or under a virtual framebuffer (xvfb-run) a normal
+# hidden window is created instead.
+import os
+
+
+def headless():
+    return not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY")
+
+
+def open_offscreen_window(size, force_offscreen=False):
+    """
+    Creates the window and its GL context. Must be called before pygame.init()
+    has opened any other display. Raises pygame.error when no context is available.
+    """
+    if force_offscreen or headless():
+        os.environ["SDL_VIDEODRIVER"] = "offscreen"
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    import pygame
+    from pygame.locals import DOUBLEBUF, OPENGL, HIDDEN
+
+    pygame.init()
+    return pygame.display.set_mode(size, DOUBLEBUF | OPENGL | HIDDEN)
+
+
+def gl_info():
+    from OpenGL.GL import glGetString, GL_VERSION, GL_RENDERER
+    return glGetString(GL_RENDERER).decode(), glGetString(GL_VERSION).decode()
+
+
+def read_frame(size):
+    """
+    Current back buffer as a pygame Surface (call before display.flip()).
+    """
+    import pygame
+    from OpenGL.GL import glReadPixels, glPixelStorei, GL_PACK_ALIGNMENT, GL_RGB, GL_UNSIGNED_BYTE
+
+    w, h = size
+    glPixelStorei(GL_PACK_ALIGNMENT, 1)
+    data = glReadPixels(0, 0, w, h, GL_RGB, GL_UNSIGNED_BYTE)
+    return pygame.image.fromstring(data, (w, h), "RGB", True)
@@ -0,0 +1,100 @@
+# ---------------------------------------------------
+# TIMETAGGED OSC EVENTS
+# ---------------------------------------------------
+# The game loop finds the feedback events (/bouncing, /boom, /V, /win) after
+# the physics step that produced them, up to a frame later (a physics
+# process step is seen at the next frame), and sends them at once: how long
+# after the contact the sound or the vibration starts changes from event to
+# event. EventScheduler sends every event as an OSC bundle timetagged with
+# the physics time of the event, mapped to the wall clock, plus a fixed
+# latency, so a receiver that plays bundles at their timetag keeps every
+# event at the same delay from its contact.
+#
+# The mapping is the smallest (wall time - physics time) seen by sync(), the
+# freshest view of the physics clock; it is taken again when the physics
+# clock falls behind it by more than half the latency (pause, restart,
+# physics process that could not keep its rate).
+import functools
+import socket
+import struct
+import time
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.parsing.osc_types import write_date
+
+OSC_LATENCY = 0.030
+BUNDLE_HEAD = b"#bundle\x00"
+ELEMENT_SIZE = struct.Struct(">i")
+
+
+def osc_dgram(address, value):
+    builder = OscMessageBuilder(address=address)
+    builder.add_arg(value)
+    return builder.build().dgram
+
+
+@functools.lru_cache(maxsize=512, typed=True)
+def osc_const(address, value):
+    # the int messages (/bouncing 1, /H 0..180, ...) are built once; typed: 1, 1.0 and True are different messages
+    return osc_dgram(address, value)
+
+
+@functools.lru_cache(maxsize=64, typed=True)
+def bundle_element(address, value):
+    # size + message, as it follows the timetag of a bundle
+    dgram = osc_const(address, value)
+    return ELEMENT_SIZE.pack(len(dgram)) + dgram
+
+
+def osc_bundle(unix_time, address, value):
+    return BUNDLE_HEAD + write_date(unix_time) + bundle_element(address, value)
+
+
+class EventScheduler:
+    """
+    send() an event with the physics time it happened at; sync() once per
+    frame with the current physics time (GameSimulation.sim_time).
+    With a transport of its own (osc_transport.OscTransport) only bundle() is
+    used and the scheduler never opens a socket.
+    """
+    def __init__(self, latency=OSC_LATENCY):
+        self.latency = latency
+        self._sock = None                                  # opened by the first send()
+        self._unix = time.time() - time.perf_counter()    # perf_counter() -> unix time (timetags)
+        self._offset = None                                # perf_counter() - physics time
+        self.resyncs = 0
+        self.dropped = 0
+
+    def sync(self, physics_time, now=None):
+        if now is None:
+            now = time.perf_counter()
+        offset = now - physics_time
+        if self._offset is None or offset < self._offset:
+            self._offset = offset
+        elif offset - self._offset > self.latency / 2.0:
+            self._offset = offset
+            self.resyncs += 1
+
+    def due(self, physics_time):
+        # perf_counter() time the event is played at
+        if self._offset is None:
+            self.sync(physics_time)
+        return physics_time + self._offset + self.latency
+
+    def bundle(self, address, value, physics_time):
+        # the bundle of an event, for a transport of its own (osc_transport.OscTransport.send)
+        return osc_bundle(self.due(physics_time) + self._unix, address, value)
+
+    def send(self, addr, address, value, physics_time):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+        try:
+            self._sock.sendto(self.bundle(address, value, physics_time), addr)
+        except OSError:
+            self.dropped += 1
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
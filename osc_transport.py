@@ -0,0 +1,77 @@
+# ---------------------------------------------------
+# OSC TRANSPORT
+# ---------------------------------------------------
+# The feedback channels of the game (the ERM vibration of the Teensy and the
+# four sound channels of the Pure Data patch) as named endpoints. Channels on
+# the same host share one non-blocking UDP socket; the constant messages
+# (/V 1, /boom 1, /rolling/on 0/1, /H 0..180, ...) are encoded once
+# (osc_events.osc_const) and the same bytes are handed to sendto() every time.
+#
+#   --osc-host 127.0.0.1                                   # everything to Pure Data on this PC
+#   --osc-endpoint vibration=192.168.0.14:2222             # one channel somewhere else
+import socket
+
+from osc_events import osc_const, osc_dgram
+
+VIBRATION, BOUNCING, BOOM, ROLLING, WIN = "vibration", "bouncing", "boom", "rolling", "win"
+VIBRATION_PORT = 2222
+BOUNCING_PORT, BOOM_PORT, ROLLING_PORT, WIN_PORT = 9000, 9001, 9002, 9003
+CHANNEL_PORTS = {
+    VIBRATION: VIBRATION_PORT,
+    BOUNCING: BOUNCING_PORT,
+    BOOM: BOOM_PORT,
+    ROLLING: ROLLING_PORT,
+    WIN: WIN_PORT,
+}
+
+
+def parse_channel_endpoint(text):
+    # "vibration=192.168.0.14:2222" -> ("vibration", ("192.168.0.14", 2222)); the port defaults to the channel's
+    channel, _, endpoint = text.partition("=")
+    channel = channel.strip()
+    if channel not in CHANNEL_PORTS or not endpoint:
+        raise ValueError(f"bad --osc-endpoint {text!r}: expected CHANNEL=HOST[:PORT] with CHANNEL in {', '.join(CHANNEL_PORTS)}")
+    host, _, port = endpoint.rpartition(":")
+    if not host:
+        return channel, (endpoint, CHANNEL_PORTS[channel])
+    return channel, (host, int(port))
+
+
+class OscTransport:
+    """
+    send_const() for the int messages, send_value() for the others (/rolling/velocity),
+    send() for datagrams built elsewhere (timetagged bundles). Never blocks:
+    a datagram the socket cannot take now is dropped (feedback is best effort).
+    """
+    def __init__(self, host, endpoints=None):
+        self.endpoints = {channel: (host, port) for channel, port in CHANNEL_PORTS.items()}
+        self.endpoints.update(endpoints or {})
+        self._socks = {}
+        self._out = {}
+        for channel, addr in self.endpoints.items():
+            sock = self._socks.get(addr[0])
+            if sock is None:
+                sock = self._socks[addr[0]] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.setblocking(False)
+            self._out[channel] = (sock.sendto, addr)
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, channel, dgram):
+        sendto, addr = self._out[channel]
+        try:
+            sendto(dgram, addr)
+            self.sent += 1
+        except OSError:
+            self.dropped += 1
+
+    def send_const(self, channel, address, value):
+        self.send(channel, osc_const(address, value))
+
+    def send_value(self, channel, address, value):
+        self.send(channel, osc_dgram(address, value))
+
+    def close(self):
+        for sock in self._socks.values():
+            sock.close()
+        self._socks.clear()
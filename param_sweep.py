@@ -0,0 +1,307 @@
+# ---------------------------------------------------
+# PARAMETER SWEEP
+# ---------------------------------------------------
+# Difficulty tuning without the hardware: every combination of a grid of
+# physics parameters plays every level headless (simulation.GameSimulation)
+# with a tilt source, either the flow-field autopilot (scripted) or the tilt
+# recorded during a session (maze_tilt.py --record-tilt, the frames of each
+# level replayed with their frame times). The runs are spread over a process pool.
+#
+# Each finished run (one configuration x one input, all the levels) is one
+# line appended to a JSONL cache, keyed by its parameters, input and levels:
+# an interrupted sweep started again runs only what is missing.
+#
+#   python param_sweep.py --param gravity=40,50,60 --param friction=0.98,0.99
+#   python param_sweep.py --param max_tilt=12,18 --input results/trajectories/anna_1_2.tilt
+import hashlib
+import itertools
+import json
+import os
+
+from levels import LEVELS
+from maze import WALL_RESTITUTION, WALL_TANGENTIAL
+from simulation import (GameSimulation, GRAVITY, FRICTION, MAX_TILT_DEG, BALL_RADIUS, REFERENCE_RATE, clamp,
+                        friction_for_rate)
+
+SWEEP_VERSION = 1
+SWEEP_CACHE_FILE = os.path.join("results", "param_sweep.jsonl")
+MAX_LEVEL_SEC = 120.0
+AUTOPILOT_INPUT = "autopilot"
+
+# name -> default (the constants of the game)
+PARAMS = {
+    "gravity": GRAVITY,
+    "friction": FRICTION,
+    "restitution": WALL_RESTITUTION,
+    "tangential": WALL_TANGENTIAL,
+    "max_tilt": MAX_TILT_DEG,
+    "radius": BALL_RADIUS,
+}
+
+
+def parse_param(spec):
+    # "gravity=40,50,60" -> ("gravity", [40.0, 50.0, 60.0])
+    name, _, values = spec.partition("=")
+    name = name.strip()
+    if name not in PARAMS or not values:
+        raise ValueError(f"bad --param {spec!r}: expected NAME=V1,V2,... with NAME in {', '.join(PARAMS)}")
+    return name, [float(v) for v in values.split(",")]
+
+
+def param_grid(grid):
+    """
+    Every combination of {name: [values]}, the other parameters at their default.
+    """
+    names = list(grid)
+    for values in itertools.product(*(grid[n] for n in names)):
+        config = {k: float(v) for k, v in PARAMS.items()}
+        config.update(zip(names, values))
+        yield config
+
+
+def input_key(source):
+    if source == AUTOPILOT_INPUT:
+        return source
+    h = hashlib.sha1()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return "tilt:" + h.hexdigest()[:16]
+
+
+def run_key(config, source_key, levels, rate, max_sec):
+    text = json.dumps([SWEEP_VERSION, config, source_key, rate, max_sec, repr(sorted(levels.items()))],
+                      sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:20]
+
+
+# ---------------------------------------------------
+# TILT SOURCES
+# ---------------------------------------------------
+class RecordedTilt:
+    """
+    Frames of a .tilt file replayed as they were played: the tilt of every
+    frame of a level with the frame time (the difference of the recorded
+    times), and the per-frame friction of the game loop.
+    """
+    def __init__(self, path):
+        from trajectory import load_tilt
+
+        records = load_tilt(path)
+        t = records["t"].astype(float)
+        dt = [1.0 / REFERENCE_RATE] + (t[1:] - t[:-1]).tolist()
+        levels = records["level"].tolist()
+        tilt_x = records["tilt_x"].tolist()
+        tilt_z = records["tilt_z"].tolist()
+        self.frames = {}
+        for i, level in enumerate(levels):
+            self.frames.setdefault(level, []).append((dt[i], tilt_x[i], tilt_z[i]))
+
+    def has_level(self, level):
+        return level in self.frames
+
+    def friction(self, friction, rate):
+        return friction
+
+    def steps(self, level, ball, rate):
+        return iter(self.frames.get(level, ()))
+
+
+class AutopilotTilt:
+    def __init__(self, levels, max_tilt):
+        from flowfield import Autopilot
+
+        self.pilot = Autopilot(levels, max_tilt=max_tilt)
+
+    def has_level(self, level):
+        return level in self.pilot.levels
+
+    def friction(self, friction, rate):
+        return friction_for_rate(rate, friction)
+
+    def steps(self, level, ball, rate):
+        dt = 1.0 / rate
+        while True:
+            tilt_x, tilt_z = self.pilot.update(ball, level)
+            yield dt, tilt_x, tilt_z
+
+
+# ---------------------------------------------------
+# RUNS
+# ---------------------------------------------------
+def play_level(sim, source, level, rate, max_sec, max_tilt):
+    """
+    (completed, seconds, wall collisions, falls) of one level from its start
+    with START_LIVES lives. A recording that ends before the goal ends the run.
+    """
+    sim.restart(level)
+    t = 0.0
+    falls = 0
+    for dt, tilt_x, tilt_z in source.steps(level, sim.ball, rate):
+        sim.step(dt, clamp(tilt_x, -max_tilt, max_tilt), clamp(tilt_z, -max_tilt, max_tilt))
+        t += dt
+        falls += sim.fell
+        if sim.level_completed:
+            return True, t, sim.wall_collisions, falls
+        if sim.state == "GAME_OVER" or t >= max_sec:
+            break
+    return False, t, sim.wall_collisions, falls
+
+
+def run_config(config, source, levels=LEVELS, rate=REFERENCE_RATE, max_sec=MAX_LEVEL_SEC):
+    """
+    {level: {"completed", "sec", "collisions", "falls"}} of one configuration
+    with one input (AUTOPILOT_INPUT or the path of a .tilt file); the levels
+    missing from a recording are left out.
+    """
+    if source == AUTOPILOT_INPUT:
+        tilt = AutopilotTilt(levels, config["max_tilt"])
+    else:
+        tilt = RecordedTilt(source)
+    sim = GameSimulation(tilt.friction(config["friction"], rate), levels, gravity=config["gravity"],
+                         restitution=config["restitution"], tangential=config["tangential"],
+                         ball_radius=config["radius"])
+    result = {}
+    for level in sorted(levels):
+        if not tilt.has_level(level):
+            continue
+        completed, sec, collisions, falls = play_level(sim, tilt, level, rate, max_sec, config["max_tilt"])
+        result[str(level)] = {"completed": completed, "sec": round(sec, 3), "collisions": collisions, "falls": falls}
+    return result
+
+
+def _run_task(task):
+    key, config, source, levels, rate, max_sec = task
+    return key, run_config(config, source, levels, rate, max_sec)
+
+
+# ---------------------------------------------------
+# CACHE
+# ---------------------------------------------------
+def load_sweep_cache(path):
+    # {key: entry}; an incomplete last line (interrupted write) is ignored
+    entries = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["key"]] = entry
+    except OSError:
+        pass
+    return entries
+
+
+def sweep(grid, sources, levels=LEVELS, cache_file=SWEEP_CACHE_FILE, workers=None, rate=REFERENCE_RATE,
+          max_sec=MAX_LEVEL_SEC, progress=None):
+    """
+    Runs every configuration of the grid with every input not already in
+    cache_file, appending each result as soon as it is done. Returns the
+    entries of the whole sweep (cached and new) in grid order and the number
+    of runs done now.
+    """
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    cached = load_sweep_cache(cache_file)
+    keys = {source: input_key(source) for source in sources}
+    entries = []
+    todo = []
+    for config in param_grid(grid):
+        for source in sources:
+            key = run_key(config, keys[source], levels, rate, max_sec)
+            entry = cached.get(key) or {"key": key, "params": config, "input": source}
+            entries.append(entry)
+            if "levels" not in entry:
+                todo.append((key, config, source, levels, rate, max_sec))
+
+    if todo:
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        by_key = {e["key"]: e for e in entries}
+        if os.path.isfile(cache_file) and os.path.getsize(cache_file):
+            with open(cache_file, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    with open(cache_file, "a", encoding="utf-8") as out:
+                        out.write("\n")    # after the line cut by an interruption
+        # spawn: the workers do not inherit pygame / OpenGL state
+        with open(cache_file, "a", encoding="utf-8") as out, \
+                ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = [pool.submit(_run_task, task) for task in todo]
+            for done, future in enumerate(as_completed(futures), 1):
+                key, result = future.result()
+                entry = by_key[key]
+                entry["levels"] = result
+                out.write(json.dumps(entry) + "\n")
+                out.flush()
+                if progress is not None:
+                    progress(done, len(todo))
+    return entries, len(todo)
+
+
+def summary(entries):
+    # one row per entry: completed levels, total seconds, collisions and falls
+    rows = []
+    for entry in entries:
+        levels = entry["levels"].values()
+        rows.append((entry["params"], entry["input"],
+                     sum(v["completed"] for v in levels), len(levels),
+                     sum(v["sec"] for v in levels),
+                     sum(v["collisions"] for v in levels),
+                     sum(v["falls"] for v in levels)))
+    return rows
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="MazeTilt physics parameter sweep")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help=f"Values of a parameter ({', '.join(PARAMS)}); repeat for a grid")
+    parser.add_argument("--input", action="append", default=[], metavar="SOURCE",
+                        help=f"'{AUTOPILOT_INPUT}' or a .tilt file recorded with maze_tilt.py --record-tilt "
+                             f"(repeatable, default {AUTOPILOT_INPUT})")
+    parser.add_argument("--generated", type=int, default=None, metavar="SEED", help="Generated levels (levelgen.py) instead of levels.py")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--rate", type=float, default=REFERENCE_RATE, help="Physics steps per second")
+    parser.add_argument("--max-sec", type=float, default=MAX_LEVEL_SEC, help="Time limit of a level")
+    parser.add_argument("--cache", default=SWEEP_CACHE_FILE, help="JSONL file of the results (resumable)")
+    args = parser.parse_args()
+
+    try:
+        grid = dict(parse_param(spec) for spec in args.param)
+    except ValueError as e:
+        parser.error(str(e))
+    sources = args.input or [AUTOPILOT_INPUT]
+    for source in sources:
+        if source != AUTOPILOT_INPUT and not os.path.isfile(source):
+            parser.error(f"no such tilt recording: {source}")
+
+    levels = LEVELS
+    if args.generated is not None:
+        from levelgen import generate_levels
+        levels = generate_levels(args.generated, len(LEVELS))
+
+    def progress(done, total):
+        print(f"\r{done}/{total} runs", end="", flush=True)
+
+    start = time.perf_counter()
+    entries, ran = sweep(grid, sources, levels, args.cache, args.workers, args.rate, args.max_sec, progress)
+    if ran:
+        print(f"\r{ran} runs in {time.perf_counter() - start:.1f} s, {len(entries) - ran} from {args.cache}")
+    else:
+        print(f"all {len(entries)} runs from {args.cache}")
+
+    names = list(grid) or ["gravity"]
+    print("  ".join(f"{n:>11}" for n in names) + "  input            levels    sec  coll  falls")
+    for params, source, completed, played, sec, collisions, falls in summary(entries):
+        label = source if source == AUTOPILOT_INPUT else os.path.basename(source)
+        print("  ".join(f"{params[n]:11g}" for n in names)
+              + f"  {label[:16]:16} {completed:>3}/{played:<3} {sec:6.1f} {collisions:5d} {falls:6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# ---------------------------------------------------
+# PHYSICS PROCESS
+# ---------------------------------------------------
+# AccelController + GameSimulation stepped at a fixed rate (e.g. 1000 Hz) in
+# their own process. The state is published in a multiprocessing.shared_memory
+# double buffer: the physics process writes the back slot and then flips the
+# front index, the render process reads the front slot in place. Each slot is
+# guarded by a sequence number (odd while being written) so that a reader that
+# is overtaken by two writes notices it and reads again; nobody takes a lock.
+#
+# The render process sends the few commands it needs (restart, soft reset,
+# stop) through a one-slot mailbox in the same shared block, and sets the RUN
+# flag while the game is in the PLAY state.
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from levels import LEVELS
+from ball import Ball
+from maze import Maze
+from simulation import (GameSimulation, START_POS, START_LIVES, MAX_TILT_DEG, REFERENCE_RATE,
+                        clamp, friction_for_rate)
+
+PHYSICS_RATE = 1000
+
+# header
+FRONT, CMD_SEQ, CMD_CODE, READY, RUN = range(5)
+HEADER = 5
+
+# slot fields
+(SEQ, ACK, SIM_TIME, X, Z, VX, VZ, TILT_X, TILT_Z, LIVES, LEVEL, STATE, WALL_COLLISIONS,
+ HOLE_VIBRATION, INSIDE_AREA, SPEED, HITS, FALLS, LEVELS_DONE, RESETS,
+ FALL_X, FALL_Z, STEPS, HIT_TIME, FALL_TIME, DONE_TIME) = range(26)
+FIELDS = 26
+
+STATES = ("PLAY", "WIN", "GAME_OVER")
+
+CMD_RESTART, CMD_SOFT_RESET, CMD_STOP = 1, 2, 3
+
+
+def block_size():
+    return (HEADER + 2 * FIELDS) * 8
+
+
+def attach(shm):
+    # (header, slots) views over the shared block
+    arr = np.ndarray((HEADER + 2 * FIELDS,), dtype=np.float64, buffer=shm.buf)
+    return arr[:HEADER], arr[HEADER:].reshape(2, FIELDS)
+
+
+# ---------------------------------------------------
+# PHYSICS SIDE
+# ---------------------------------------------------
+def physics_main(shm_name, rate_hz=PHYSICS_RATE, osc_ip="0.0.0.0", osc_port=4444, levels=LEVELS):
+    from accelerometer import AccelController
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    header, slots = attach(shm)
+
+    # AccelController smooths and calibrates per update() call, tuned for 60 calls per second
+    steps_per_frame = rate_hz / REFERENCE_RATE
+    accel = AccelController(osc_ip=osc_ip, osc_port=osc_port,
+                            calib_samples=int(60 * steps_per_frame),
+                            smooth=1.0 - (1.0 - 0.20) ** (1.0 / steps_per_frame))
+    sim = GameSimulation(friction=friction_for_rate(rate_hz), levels=levels)
+    counters = {HITS: 0, FALLS: 0, LEVELS_DONE: 0, RESETS: 0}
+    fall_x, fall_z = START_POS
+    last_cmd = header[CMD_SEQ]
+
+    dt = 1.0 / rate_hz
+    sim_time = 0.0
+    steps = 0
+
+    def publish():
+        back = 1 - int(header[FRONT])
+        slot = slots[back]
+        seq = slot[SEQ] + 1
+        slot[SEQ] = seq                     # odd: being written
+        ball = sim.ball
+        slot[ACK] = last_cmd
+        slot[SIM_TIME] = sim_time
+        slot[X] = ball.x
+        slot[Z] = ball.z
+        slot[VX] = ball.vx
+        slot[VZ] = ball.vz
+        slot[TILT_X] = tilt_x
+        slot[TILT_Z] = tilt_z
+        slot[LIVES] = sim.lives
+        slot[LEVEL] = sim.level
+        slot[STATE] = STATES.index(sim.state)
+        slot[WALL_COLLISIONS] = sim.wall_collisions
+        slot[HOLE_VIBRATION] = sim.hole_vibration
+        slot[INSIDE_AREA] = sim.inside_area
+        slot[SPEED] = sim.speed
+        for field, value in counters.items():
+            slot[field] = value
+        slot[FALL_X] = fall_x
+        slot[FALL_Z] = fall_z
+        slot[STEPS] = steps
+        slot[HIT_TIME] = sim.hit_time
+        slot[FALL_TIME] = sim.fall_time
+        slot[DONE_TIME] = sim.completed_time
+        slot[SEQ] = seq + 1                 # even: complete
+        header[FRONT] = back
+
+    tilt_x = tilt_z = 0.0
+    publish()
+    header[READY] = 1.0
+
+    next_t = time.perf_counter()
+    try:
+        while True:
+            # -------- commands --------
+            if header[CMD_SEQ] != last_cmd:
+                last_cmd = header[CMD_SEQ]
+                cmd = int(header[CMD_CODE])
+                if cmd == CMD_STOP:
+                    break
+                if cmd == CMD_RESTART:
+                    sim.restart()
+                    sim_time = 0.0
+                elif cmd == CMD_SOFT_RESET:
+                    sim.soft_reset()
+                accel.tilt_x_deg = accel.tilt_z_deg = 0.0
+                tilt_x = tilt_z = 0.0
+
+            # -------- step --------
+            if header[RUN] and sim.state == "PLAY":
+                tilt_x, tilt_z = accel.update()
+                tilt_x = clamp(tilt_x, -MAX_TILT_DEG, MAX_TILT_DEG)
+                tilt_z = clamp(tilt_z, -MAX_TILT_DEG, MAX_TILT_DEG)
+
+                sim.step(dt, tilt_x, tilt_z)
+                sim_time = sim.sim_time
+                steps += 1
+
+                if sim.hit_wall:
+                    counters[HITS] += 1
+                if sim.fell:
+                    counters[FALLS] += 1
+                    fall_x, fall_z = sim.event_x, sim.event_z
+                if sim.level_completed:
+                    counters[LEVELS_DONE] += 1
+                if sim.ball_reset:
+                    counters[RESETS] += 1
+                    accel.tilt_x_deg = accel.tilt_z_deg = 0.0
+
+            publish()
+
+            # -------- fixed rate --------
+            next_t += dt
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.1:
+                next_t = time.perf_counter()    # too far behind: do not try to catch up
+    finally:
+        accel.close()
+        del header, slots
+        shm.close()
+
+
+# ---------------------------------------------------
+# RENDER SIDE
+# ---------------------------------------------------
+class RemotePhysics:
+    """
+    Render-process view of the physics process, with the interface of
+    GameSimulation (ball, maze, level, lives, state, hit_wall, fell, ...).
+    step() lets the physics process run and reads the latest published state:
+    the events are those that happened since the previous step(). The tilt
+    comes from the AccelController of the physics process (tilt_x, tilt_z).
+    """
+    def __init__(self, rate_hz=PHYSICS_RATE, osc_ip="0.0.0.0", osc_port=4444, levels=LEVELS):
+        self.shm = shared_memory.SharedMemory(create=True, size=block_size())
+        self.header, self.slots = attach(self.shm)
+        self.header[:] = 0.0
+        self.slots[:] = 0.0
+
+        # spawn: the child must not inherit the pygame / OpenGL state of this process
+        ctx = mp.get_context("spawn")
+        self.process = ctx.Process(target=physics_main, args=(self.shm.name, rate_hz, osc_ip, osc_port, levels),
+                                   daemon=True)
+        self.process.start()
+
+        self.levels = levels
+        self.max_level = max(levels.keys())
+        self.ball = Ball(*START_POS)
+        self._seen = {HITS: 0, FALLS: 0, LEVELS_DONE: 0, RESETS: 0}
+        self._mirror_restart()
+
+    def _mirror_restart(self):
+        self.level = 1
+        self.maze = Maze(level=self.level, levels=self.levels)
+        self.lives = START_LIVES
+        self.wall_collisions = 0
+        self.state = "PLAY"
+        self.ball.reset()
+        self.tilt_x = self.tilt_z = 0.0
+        self.sim_time = 0.0
+        self.hit_time = self.fall_time = self.completed_time = 0.0
+        self.steps = 0
+        self.clear_events()
+
+    def clear_events(self):
+        self.hit_wall = self.fell = self.level_completed = self.ball_reset = False
+        self.inside_area = False
+        self.hole_vibration = 0
+        self.speed = 0.0
+        self.event_x, self.event_z = START_POS
+
+    def wait_ready(self, timeout=10.0):
+        end = time.perf_counter() + timeout
+        while self.header[READY] == 0.0:
+            if time.perf_counter() > end or not self.process.is_alive():
+                self.close()
+                raise RuntimeError("physics process did not start")
+            time.sleep(0.005)
+
+    def _command(self, code):
+        self.header[CMD_CODE] = code
+        self.header[CMD_SEQ] += 1
+
+    def restart(self):
+        self.header[RUN] = 0.0
+        self._command(CMD_RESTART)
+        self._mirror_restart()
+
+    def soft_reset(self):
+        self._command(CMD_SOFT_RESET)
+        self.ball.reset()
+
+    def step(self, dt=None, tilt_x_deg=None, tilt_z_deg=None):
+        # dt and tilt are decided by the physics process
+        self.header[RUN] = 1.0
+        self.sync()
+
+    def sync(self):
+        while True:
+            slot = self.slots[int(self.header[FRONT])]
+            seq = slot[SEQ]
+            if seq % 2:
+                continue
+            ack = slot[ACK]
+            x, z = slot[X], slot[Z]
+            vx, vz = slot[VX], slot[VZ]
+            tilt_x, tilt_z = slot[TILT_X], slot[TILT_Z]
+            lives, level, state = slot[LIVES], slot[LEVEL], slot[STATE]
+            wall_collisions = slot[WALL_COLLISIONS]
+            hole_vibration, inside_area, speed = slot[HOLE_VIBRATION], slot[INSIDE_AREA], slot[SPEED]
+            hits, falls, done, resets = slot[HITS], slot[FALLS], slot[LEVELS_DONE], slot[RESETS]
+            fall_x, fall_z = slot[FALL_X], slot[FALL_Z]
+            sim_time, steps = slot[SIM_TIME], slot[STEPS]
+            hit_time, fall_time, done_time = slot[HIT_TIME], slot[FALL_TIME], slot[DONE_TIME]
+            if slot[SEQ] == seq:
+                break
+
+        if ack != self.header[CMD_SEQ]:
+            # the last command is not applied yet: keep the current view
+            self.clear_events()
+            return
+
+        ball = self.ball
+        ball.x, ball.z, ball.vx, ball.vz = x, z, vx, vz
+        self.tilt_x, self.tilt_z = tilt_x, tilt_z
+        self.lives = int(lives)
+        self.wall_collisions = int(wall_collisions)
+        self.state = STATES[int(state)]
+        self.hole_vibration = int(hole_vibration)
+        self.inside_area = bool(inside_area)
+        self.speed = speed
+        self.sim_time = sim_time
+        self.steps = int(steps)
+        self.hit_time, self.fall_time, self.completed_time = hit_time, fall_time, done_time
+
+        seen = self._seen
+        self.hit_wall = hits > seen[HITS]
+        self.fell = falls > seen[FALLS]
+        self.level_completed = done > seen[LEVELS_DONE]
+        self.ball_reset = resets > seen[RESETS]
+        seen[HITS], seen[FALLS], seen[LEVELS_DONE], seen[RESETS] = hits, falls, done, resets
+        self.event_x, self.event_z = (fall_x, fall_z) if self.fell else (x, z)
+
+        if int(level) != self.level:
+            self.level = int(level)
+            self.maze = Maze(level=self.level, levels=self.levels)
+
+    def close(self):
+        if self.process.is_alive():
+            self._command(CMD_STOP)
+            self.process.join(timeout=2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        del self.header, self.slots
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,267 @@
+# ---------------------------------------------------
+# FRAME PROFILER
+# ---------------------------------------------------
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from array import array
+
+STAT_WINDOW = 240            # frames kept for the rolling statistics
+MAX_TRACE_EVENTS = 500000    # cap of the Chrome trace buffer
+
+
+class FrameProfiler:
+    """
+    Per-stage timings of the main loop.
+
+    The loop calls lap("stage") at the end of every stage: the time since the
+    previous lap (or since begin_frame) is charged to that stage. Stages are
+    summed per frame and kept in ring buffers of the last STAT_WINDOW frames.
+    With trace=True every lap is also kept as a Chrome trace event
+    (chrome://tracing, https://ui.perfetto.dev).
+    """
+    enabled = True
+
+    def __init__(self, window=STAT_WINDOW, trace=False, max_trace_events=MAX_TRACE_EVENTS):
+        self.window = window
+        self.trace = trace
+        self.max_trace_events = max_trace_events
+        self.events = []
+
+        self._stages = {}          # name -> ring buffer of per-frame ms
+        self._current = {}         # name -> ms accumulated in this frame
+        self._frames = array("d", [0.0] * window)
+        self._index = 0
+        self._count = 0
+        self._t0 = time.perf_counter()
+        self._frame_start = self._t0
+        self._last = self._t0
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        self._frame_start = now
+        self._last = now
+
+    def lap(self, name):
+        now = time.perf_counter()
+        ms = (now - self._last) * 1000.0
+        self._current[name] = self._current.get(name, 0.0) + ms
+        if self.trace and len(self.events) < self.max_trace_events:
+            self.events.append((name, self._last, now))
+        self._last = now
+
+    def end_frame(self):
+        now = time.perf_counter()
+        i = self._index
+        self._frames[i] = (now - self._frame_start) * 1000.0
+
+        for name, ring in self._stages.items():
+            ring[i] = self._current.pop(name, 0.0)
+        for name, ms in self._current.items():
+            ring = array("d", [0.0] * self.window)
+            ring[i] = ms
+            self._stages[name] = ring
+        self._current.clear()
+
+        if self.trace and len(self.events) < self.max_trace_events:
+            self.events.append(("frame", self._frame_start, now))
+
+        self._index = (i + 1) % self.window
+        self._count += 1
+
+    # -----------------------------------------------
+    def frame_times(self):
+        # oldest -> newest
+        n = min(self._count, self.window)
+        i = self._index
+        ordered = self._frames[i:] + self._frames[:i]
+        return ordered[len(ordered) - n:]
+
+    def stats(self):
+        """
+        {stage: (mean_ms, p95_ms, max_ms)} over the rolling window, "frame" included.
+        """
+        n = min(self._count, self.window)
+        if n == 0:
+            return {}
+        out = {}
+        rings = dict(self._stages)
+        rings["frame"] = self._frames
+        for name, ring in rings.items():
+            values = sorted(ring[:n]) if self._count < self.window else sorted(ring)
+            out[name] = (sum(values) / n, values[min(n - 1, int(0.95 * n))], values[-1])
+        return out
+
+    def report(self):
+        rows = sorted(self.stats().items(), key=lambda kv: -kv[1][0])
+        lines = [f"{'stage':<14}{'mean ms':>9}{'p95 ms':>9}{'max ms':>9}"]
+        for name, (mean, p95, peak) in rows:
+            lines.append(f"{name:<14}{mean:9.3f}{p95:9.3f}{peak:9.3f}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        trace = [{
+            "name": name, "ph": "X", "pid": 1, "tid": 0 if name == "frame" else 1,
+            "ts": (start - self._t0) * 1e6, "dur": (end - start) * 1e6,
+        } for (name, start, end) in self.events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+class AllocationProfiler(FrameProfiler):
+    """
+    FrameProfiler that also charges memory allocation and garbage collection
+    to the stages (diagnostic mode: tracemalloc makes every allocation slower).
+    Per stage and frame:
+      gc objects  net GC-tracked objects created (the counter that triggers a
+                  collection when it passes gc.get_threshold()[0])
+      peak KiB    highest traced memory above the start of the stage
+      blocks      net memory blocks still allocated at the end of the stage
+      gc ms       time spent in collections started during the stage
+    Every collection is timed with gc.callbacks; the ones longer than
+    log_pause_ms are listed by report(). The totals restart at every report().
+    """
+    def __init__(self, window=STAT_WINDOW, trace=False, max_trace_events=MAX_TRACE_EVENTS,
+                 log_pause_ms=1.0, max_logged_pauses=50):
+        FrameProfiler.__init__(self, window, trace, max_trace_events)
+        self.log_pause_ms = log_pause_ms
+        self.max_logged_pauses = max_logged_pauses
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._totals = {}        # name -> [gc objects, peak KiB, blocks, gc ms]
+        self._alloc_current = {}
+        self._frames_counted = 0
+        self._pending_gc_ms = 0.0
+        self._gc_t0 = 0.0
+        self.gc_pauses = {}      # generation -> [count, total ms, max ms]
+        self.long_pauses = []    # (frame, generation, ms, collected)
+        gc.callbacks.append(self._on_gc)
+        self._mark()
+
+    def _mark(self):
+        # the profiler's own objects are created before the counters are read
+        self._gc_before = 0
+        tracemalloc.reset_peak()
+        self._mem_start = tracemalloc.get_traced_memory()[0]
+        self._gc_start = gc.get_count()[0]
+        self._blocks_start = sys.getallocatedblocks()
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            # the counter is reset by the collection: keep what the stage had created
+            self._gc_before += gc.get_count()[0] - self._gc_start
+            self._gc_t0 = time.perf_counter()
+            return
+        ms = (time.perf_counter() - self._gc_t0) * 1000.0
+        self._gc_start = gc.get_count()[0]
+        self._pending_gc_ms += ms
+        gen = info["generation"]
+        entry = self.gc_pauses.setdefault(gen, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += ms
+        entry[2] = max(entry[2], ms)
+        if ms >= self.log_pause_ms and len(self.long_pauses) < self.max_logged_pauses:
+            self.long_pauses.append((self._count, gen, ms, info["collected"]))
+
+    def begin_frame(self):
+        FrameProfiler.begin_frame(self)
+        self._mark()
+
+    def lap(self, name):
+        self._charge(name)
+        FrameProfiler.lap(self, name)
+        self._mark()
+
+    def _charge(self, name):
+        blocks = sys.getallocatedblocks() - self._blocks_start
+        objects = gc.get_count()[0] - self._gc_start + self._gc_before
+        peak = tracemalloc.get_traced_memory()[1]
+        acc = self._alloc_current.get(name)
+        if acc is None:
+            acc = self._alloc_current[name] = [0, 0.0, 0, 0.0]
+        acc[0] += objects
+        acc[1] = max(acc[1], (peak - self._mem_start) / 1024.0)
+        acc[2] += blocks
+        acc[3] += self._pending_gc_ms
+        self._pending_gc_ms = 0.0
+
+    def end_frame(self):
+        FrameProfiler.end_frame(self)
+        for name, acc in self._alloc_current.items():
+            tot = self._totals.get(name)
+            if tot is None:
+                tot = self._totals[name] = [0, 0.0, 0, 0.0]
+            for k in range(4):
+                tot[k] += acc[k]
+            acc[0] = acc[2] = 0
+            acc[1] = acc[3] = 0.0
+        self._frames_counted += 1
+        self._mark()
+
+    def allocation_stats(self):
+        """
+        {stage: (gc objects, peak KiB, blocks, gc ms)} per frame, averaged since the last report.
+        """
+        n = max(self._frames_counted, 1)
+        return {name: tuple(v / n for v in tot) for name, tot in self._totals.items()}
+
+    def report(self):
+        lines = [FrameProfiler.report(self), "",
+                 f"{'stage':<14}{'gc obj/fr':>10}{'KiB/fr':>9}{'blocks/fr':>10}{'gc ms/fr':>9}"]
+        for name, (objects, kib, blocks, gc_ms) in sorted(self.allocation_stats().items(), key=lambda kv: -kv[1][0]):
+            lines.append(f"{name:<14}{objects:10.1f}{kib:9.1f}{blocks:10.1f}{gc_ms:9.3f}")
+        for gen, (count, total, peak) in sorted(self.gc_pauses.items()):
+            lines.append(f"gc gen{gen}: {count} collections, mean {total / count:.3f} ms, max {peak:.3f} ms")
+        for frame, gen, ms, collected in self.long_pauses:
+            lines.append(f"  frame {frame}: gen{gen} pause {ms:.2f} ms ({collected} collected)")
+        self._totals.clear()
+        self._frames_counted = 0
+        self.gc_pauses.clear()
+        self.long_pauses.clear()
+        return "\n".join(lines)
+
+    def close(self):
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        tracemalloc.stop()
+
+
+class NullProfiler:
+    """
+    Same interface, does nothing (used when profiling is off).
+    """
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def lap(self, name):
+        pass
+
+    def end_frame(self):
+        pass
+
+
+def draw_frame_graph(surface_size, frame_times, budget_ms, max_ms=50.0):
+    """
+    Bar graph of the recent frame times as a pygame Surface (green under budget, red over).
+    """
+    import pygame
+
+    w, h = surface_size
+    surface = pygame.Surface((w, h), pygame.SRCALPHA)
+    surface.fill((0, 0, 0, 150))
+
+    times = frame_times[-w:]
+    scale = h / max_ms
+    x0 = w - len(times)
+    for i, ms in enumerate(times):
+        bar = min(h, int(ms * scale))
+        color = (60, 220, 60, 255) if ms <= budget_ms else (230, 60, 60, 255)
+        pygame.draw.line(surface, color, (x0 + i, h - 1), (x0 + i, h - bar))
+
+    y = h - int(budget_ms * scale)
+    pygame.draw.line(surface, (255, 255, 255, 200), (0, y), (w - 1, y))
+    return surface
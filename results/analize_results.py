@@ -1,98 +1,116 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
-os.makedirs("plot", exist_ok=True)
+
+METRICS = ["Time", "Collisions", "Lives"]
+
 
 def add_bar_labels(ax, values):
     for i, v in enumerate(values):
         ax.text(i, v, f"{v:.2f}", ha="center", va="bottom", fontsize=9)
 
-# Load data
-df = pd.read_csv("results.csv")
-
-# Rename columns for convenience
-df = df.rename(columns={
-    "Tempo_totale_sec": "Time",
-    "Collisioni_muri": "Collisions",
-    "Vite_rimanenti": "Lives",
-    "Modalità": "Mode"
-})
-
-# ---------------------------
-# DESCRIPTIVE STATISTICS
-# ---------------------------
-grouped = df.groupby("Mode")
-
-summary = grouped[["Time", "Collisions", "Lives"]].agg(["mean", "std"])
-print("\nDescriptive statistics:\n")
-print(summary)
-
-# ---------------------------
-# COMPOSITE SCORE
-# ---------------------------
-T_min, T_max = df["Time"].min(), df["Time"].max()
-C_min, C_max = df["Collisions"].min(), df["Collisions"].max()
-L_max = df["Lives"].max()
-
-df["T_norm"] = 1 - (df["Time"] - T_min) / (T_max - T_min)
-df["C_norm"] = 1 - (df["Collisions"] - C_min) / (C_max - C_min)
-df["L_norm"] = df["Lives"] / L_max
-
-wT, wC, wL = 0.4, 0.3, 0.3
-df["SCORE"] = wT * df["T_norm"] + wC * df["C_norm"] + wL * df["L_norm"]
-
-score_summary = df.groupby("Mode")["SCORE"].agg(["mean", "std"])
-print("\nComposite score:\n")
-print(score_summary)
-
-# ---------------------------
-# PLOTS
-# ---------------------------
-
-# Completion time
-plt.figure()
-means = grouped["Time"].mean()
-stds = grouped["Time"].std()
-ax = means.plot(kind="bar", yerr=stds, capsize=4)
-plt.ylabel("Completion Time (s)")
-plt.title("Task Completion Time by Feedback Modality")
-add_bar_labels(ax, means.values)
-plt.tight_layout()
-plt.savefig("plot/completion_time.png", dpi=300)
-plt.close()
-
-# Collisions
-plt.figure()
-means = grouped["Collisions"].mean()
-stds = grouped["Collisions"].std()
-ax = means.plot(kind="bar", yerr=stds, capsize=4)
-plt.ylabel("Number of Collisions")
-plt.title("Wall Collisions by Feedback Modality")
-add_bar_labels(ax, means.values)
-plt.tight_layout()
-plt.savefig("plot/collisions.png", dpi=300)
-plt.close()
-
-# Remaining lives
-plt.figure()
-means = grouped["Lives"].mean()
-stds = grouped["Lives"].std()
-ax = means.plot(kind="bar", yerr=stds, capsize=4)
-plt.ylabel("Remaining Lives")
-plt.title("Remaining Lives by Feedback Modality")
-add_bar_labels(ax, means.values)
-plt.tight_layout()
-plt.savefig("plot/remaining_lives.png", dpi=300)
-plt.close()
-
-# Composite score
-plt.figure()
-means = score_summary["mean"]
-stds = score_summary["std"]
-ax = means.plot(kind="bar", yerr=stds, capsize=4)
-plt.ylabel("Composite Performance Score")
-plt.title("Overall Performance by Feedback Modality")
-add_bar_labels(ax, means.values)
-plt.tight_layout()
-plt.savefig("plot/composite_score.png", dpi=300)
-plt.close()
\ No newline at end of file
+
+def load_results(path="results.csv"):
+    # Load data
+    df = pd.read_csv(path)
+
+    # Rename columns for convenience
+    df = df.rename(columns={
+        "Tempo_totale_sec": "Time",
+        "Collisioni_muri": "Collisions",
+        "Vite_rimanenti": "Lives",
+        "Modalità": "Mode"
+    })
+    return add_participants(df)
+
+
+def add_participants(df):
+    # P1, P2, ... in order of appearance: a participant is a block of consecutive rows with
+    # the same Nome and every modality once, so different players with the same Nome stay apart
+    ids, n, seen, previous = [], 0, set(), None
+    for name, mode in zip(df["Nome"], df["Mode"]):
+        if name != previous or mode in seen:
+            n += 1
+            seen = set()
+        seen.add(mode)
+        previous = name
+        ids.append(f"P{n}")
+    df["Participant"] = ids
+    return df
+
+
+def add_composite_score(df):
+    T_min, T_max = df["Time"].min(), df["Time"].max()
+    C_min, C_max = df["Collisions"].min(), df["Collisions"].max()
+    L_max = df["Lives"].max()
+
+    df["T_norm"] = 1 - (df["Time"] - T_min) / (T_max - T_min)
+    df["C_norm"] = 1 - (df["Collisions"] - C_min) / (C_max - C_min)
+    df["L_norm"] = df["Lives"] / L_max
+
+    wT, wC, wL = 0.4, 0.3, 0.3
+    df["SCORE"] = wT * df["T_norm"] + wC * df["C_norm"] + wL * df["L_norm"]
+    return df
+
+
+def bar_plot(means, stds, ylabel, title, outfile):
+    plt.figure()
+    ax = means.plot(kind="bar", yerr=stds, capsize=4)
+    plt.ylabel(ylabel)
+    plt.title(title)
+    add_bar_labels(ax, means.values)
+    plt.tight_layout()
+    plt.savefig(outfile, dpi=300)
+    plt.close()
+
+
+def analyze(df, plot_dir="plot"):
+    os.makedirs(plot_dir, exist_ok=True)
+
+    # ---------------------------
+    # DESCRIPTIVE STATISTICS
+    # ---------------------------
+    grouped = df.groupby("Mode")
+
+    summary = grouped[METRICS].agg(["mean", "std"])
+    print("\nDescriptive statistics:\n")
+    print(summary)
+
+    # ---------------------------
+    # COMPOSITE SCORE
+    # ---------------------------
+    add_composite_score(df)
+
+    score_summary = df.groupby("Mode")["SCORE"].agg(["mean", "std"])
+    print("\nComposite score:\n")
+    print(score_summary)
+
+    # ---------------------------
+    # PLOTS
+    # ---------------------------
+
+    # Completion time
+    bar_plot(grouped["Time"].mean(), grouped["Time"].std(),
+             "Completion Time (s)", "Task Completion Time by Feedback Modality",
+             os.path.join(plot_dir, "completion_time.png"))
+
+    # Collisions
+    bar_plot(grouped["Collisions"].mean(), grouped["Collisions"].std(),
+             "Number of Collisions", "Wall Collisions by Feedback Modality",
+             os.path.join(plot_dir, "collisions.png"))
+
+    # Remaining lives
+    bar_plot(grouped["Lives"].mean(), grouped["Lives"].std(),
+             "Remaining Lives", "Remaining Lives by Feedback Modality",
+             os.path.join(plot_dir, "remaining_lives.png"))
+
+    # Composite score
+    bar_plot(score_summary["mean"], score_summary["std"],
+             "Composite Performance Score", "Overall Performance by Feedback Modality",
+             os.path.join(plot_dir, "composite_score.png"))
+
+    return summary, score_summary
+
+
+if __name__ == "__main__":
+    analyze(load_results("results.csv"))
@@ -0,0 +1,248 @@
+'''
+Trajectory heatmaps per level and modality.
+
+Bins the per-frame ball positions recorded with `python maze_tilt.py --record-trajectory`
+(results/trajectories/*.traj) into fixed 2-D grids over the maze floor and draws
+them on top of the walls, holes and goal of each level.
+
+Usage (from the results folder, like analize_results.py):
+  python heatmap.py ingest trajectories/*.traj     # incremental, only new samples are read
+  python heatmap.py render --layer occupancy       # plots/heatmaps/L<level>_<mode>_<layer>.png
+
+Layers:
+  occupancy   every sample (time spent in each cell)
+  hesitation  samples with the ball almost still
+  collisions  samples with a wall hit
+  falls       samples where the ball fell into a hole
+
+Files are memory-mapped and read in chunks, so the memory used does not depend on
+the number of samples. The accumulated grids and the number of bytes already read
+from each file are kept in heatmaps.npz, so the next ingest only reads what was
+appended since. A file that was rewritten or truncated after it was ingested
+(its first or last ingested record changed) is refused: its old samples cannot
+be taken out of the grids, so the store has to be rebuilt (ingest --rebuild).
+'''
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MODALITA_MAP, GOAL_RECT
+from levels import LEVELS, MAZE_WIDTH, MAZE_DEPTH, build_walls
+from trajectory import RECORD_SIZE, FLAG_COLLISION, FLAG_FALL, record_dtype
+
+LAYERS = ("occupancy", "hesitation", "collisions", "falls")
+CELL_SIZE = 0.25
+HESITATION_SPEED = 0.5
+CHUNK_SAMPLES = 1 << 20
+STORE_FILE = "heatmaps.npz"
+STORE_VERSION = 2
+
+
+def grid_shape(cell=CELL_SIZE):
+    return int(round(MAZE_DEPTH / cell)), int(round(MAZE_WIDTH / cell))
+
+
+def fingerprint(path, end):
+    # first and last record before end: a rewritten file (new recording) differs in them
+    with open(path, "rb") as f:
+        head = f.read(RECORD_SIZE)
+        f.seek(max(end - RECORD_SIZE, 0))
+        tail = f.read(RECORD_SIZE)
+    return hashlib.sha1(head + tail).hexdigest()
+
+
+# ---------------------------------------------------
+# STORE
+# ---------------------------------------------------
+class HeatmapStore:
+    '''
+    (level, mode) -> float64 array (len(LAYERS), nz, nx) of sample counts.
+    '''
+    def __init__(self, path=STORE_FILE, cell=CELL_SIZE):
+        self.path = path
+        self.cell = cell
+        self.shape = grid_shape(cell)
+        self.grids = {}
+        self.offsets = {}    # file -> [bytes already ingested, fingerprint of them]
+
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with np.load(self.path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != STORE_VERSION:
+                raise ValueError(f"{self.path} is from an older heatmap.py: rebuild it (ingest --rebuild)")
+            if meta["cell"] != self.cell:
+                raise ValueError(f"{self.path} was built with cell={meta['cell']}, not {self.cell}")
+            self.offsets = meta["offsets"]
+            for key in data.files:
+                if key.startswith("L"):
+                    level, mode = key[1:].split("_M")
+                    self.grids[(int(level), int(mode))] = data[key]
+
+    def save(self):
+        arrays = {f"L{level}_M{mode}": grid for (level, mode), grid in self.grids.items()}
+        meta = json.dumps({"version": STORE_VERSION, "cell": self.cell, "offsets": self.offsets})
+        tmp = self.path + ".tmp.npz"
+        np.savez_compressed(tmp, meta=np.array(meta), **arrays)
+        os.replace(tmp, self.path)
+
+    def grid(self, level, mode):
+        if (level, mode) not in self.grids:
+            self.grids[(level, mode)] = np.zeros((len(LAYERS),) + self.shape)
+        return self.grids[(level, mode)]
+
+    # -----------------------------------------------
+    def ingest(self, path, chunk=CHUNK_SAMPLES):
+        '''
+        Adds the samples appended to path since the last ingest. Returns the number of samples read.
+        Raises ValueError if path changed in another way since then.
+        '''
+        key = os.path.abspath(path)
+        start, check = self.offsets.get(key, (0, None))
+        size = os.path.getsize(path)
+        if check is not None and (size < start or fingerprint(path, start) != check):
+            raise ValueError(f"{path} was rewritten after it was ingested: rebuild the store (ingest --rebuild)")
+
+        count = (size - start) // RECORD_SIZE
+        if count <= 0:
+            return 0
+
+        samples = np.memmap(path, dtype=record_dtype(), mode="r", offset=start, shape=(count,))
+        for i in range(0, count, chunk):
+            self._add_chunk(samples[i:i + chunk])
+        del samples
+
+        end = start + count * RECORD_SIZE
+        self.offsets[key] = [end, fingerprint(path, end)]
+        return count
+
+    def _add_chunk(self, samples):
+        nz, nx = self.shape
+        cells = nz * nx
+
+        ix = np.floor((samples["x"] + MAZE_WIDTH / 2.0) / self.cell).astype(np.int64)
+        iz = np.floor((samples["z"] + MAZE_DEPTH / 2.0) / self.cell).astype(np.int64)
+        np.clip(ix, 0, nx - 1, out=ix)
+        np.clip(iz, 0, nz - 1, out=iz)
+
+        # one histogram for every (level, mode) present in the chunk
+        group = samples["level"].astype(np.int64) * 256 + samples["mode"]
+        keys, inverse = np.unique(group, return_inverse=True)
+        flat = inverse * cells + iz * nx + ix
+        size = len(keys) * cells
+
+        weights = (
+            None,
+            samples["speed"] < HESITATION_SPEED,
+            (samples["flags"] & FLAG_COLLISION) != 0,
+            (samples["flags"] & FLAG_FALL) != 0,
+        )
+        for layer, w in enumerate(weights):
+            counts = np.bincount(flat, weights=w, minlength=size).reshape(len(keys), nz, nx)
+            for k, g in enumerate(keys):
+                self.grid(int(g) // 256, int(g) % 256)[layer] += counts[k]
+
+
+# ---------------------------------------------------
+# RENDER
+# ---------------------------------------------------
+def draw_layout(ax, level):
+    from matplotlib.patches import Circle, Rectangle
+
+    for (x, z, w, d) in build_walls(LEVELS[level]):
+        ax.add_patch(Rectangle((x, z), w, d, color="0.2"))
+    for (x, z, r) in LEVELS[level]["holes"]:
+        ax.add_patch(Circle((x, z), r, fill=False, edgecolor="black", linewidth=1.5))
+    gx, gz, gw, gd = GOAL_RECT
+    ax.add_patch(Rectangle((gx, gz), gw, gd, fill=False, edgecolor="green", linewidth=2))
+
+
+def render(store, level, mode, layer, outfile):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    grid = store.grid(level, mode)[LAYERS.index(layer)]
+    masked = np.ma.masked_equal(grid, 0)
+
+    fig, ax = plt.subplots(figsize=(5, 7))
+    extent = (-MAZE_WIDTH / 2.0, MAZE_WIDTH / 2.0, -MAZE_DEPTH / 2.0, MAZE_DEPTH / 2.0)
+    if masked.count():
+        im = ax.imshow(masked, origin="lower", extent=extent, cmap="inferno_r",
+                       norm=LogNorm(vmin=1, vmax=max(grid.max(), 1)), alpha=0.85)
+        fig.colorbar(im, ax=ax, label="samples")
+    draw_layout(ax, level)
+
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+    ax.set_aspect("equal")
+    ax.set_xlabel("x")
+    ax.set_ylabel("z")
+    ax.set_title(f"Level {level} - {MODALITA_MAP.get(mode, mode)}\n{layer}")
+    plt.tight_layout()
+    fig.savefig(outfile, dpi=150)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trajectory heatmaps per level and modality")
+    parser.add_argument("--store", default=STORE_FILE, help="Accumulated grids (npz)")
+    parser.add_argument("--cell", type=float, default=CELL_SIZE, help="Grid cell size in maze units")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="Add trajectory files to the store")
+    p_ingest.add_argument("files", nargs="*", default=[os.path.join("trajectories", "*.traj")])
+    p_ingest.add_argument("--chunk", type=int, default=CHUNK_SAMPLES, help="Samples per chunk")
+    p_ingest.add_argument("--rebuild", action="store_true", help="Start from an empty store, read every file again")
+
+    p_render = sub.add_parser("render", help="Draw the heatmaps over the level layouts")
+    p_render.add_argument("--layer", choices=LAYERS + ("all",), default="all")
+    p_render.add_argument("--level", type=int, action="append", help="Only these levels")
+    p_render.add_argument("--outdir", default=os.path.join("plots", "heatmaps"))
+
+    args = parser.parse_args()
+    if args.command == "ingest" and args.rebuild and os.path.exists(args.store):
+        os.remove(args.store)
+    try:
+        store = HeatmapStore(args.store, args.cell)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.command == "ingest":
+        files = sorted({f for pattern in args.files for f in glob.glob(pattern)})
+        total = 0
+        for path in files:
+            try:
+                n = store.ingest(path, args.chunk)
+            except ValueError as e:
+                store.save()
+                parser.error(str(e))
+            total += n
+            if n:
+                print(f"{path}: {n} new samples")
+        store.save()
+        print(f"{total} samples ingested from {len(files)} files")
+
+    elif args.command == "render":
+        os.makedirs(args.outdir, exist_ok=True)
+        layers = LAYERS if args.layer == "all" else (args.layer,)
+        for (level, mode) in sorted(store.grids):
+            if args.level and level not in args.level:
+                continue
+            for layer in layers:
+                outfile = os.path.join(args.outdir, f"L{level}_M{mode}_{layer}.png")
+                render(store, level, mode, layer, outfile)
+                print(outfile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+'''
+Bootstrap confidence intervals and permutation tests between feedback modalities.
+
+For every metric (Time, Collisions, Lives and the composite SCORE of analize_results.py)
+and every pair of modalities it reports the difference of the means, its bootstrap
+percentile confidence interval and the permutation test p-value.
+
+Usage (from the results folder):
+  python resampling.py                          # 100k resamples, seed 0, all cores
+  python resampling.py --paired                 # resample participants (analize_results.add_participants)
+  python resampling.py -n 20000 --seed 7 --workers 1 --out resampling.csv
+
+Resamples are drawn as NumPy index matrices in fixed size chunks, each chunk with its
+own child of a seeded SeedSequence, so the results do not depend on how many worker
+processes the chunks are spread over.
+'''
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from analize_results import METRICS, load_results, add_composite_score
+
+CHUNK = 10000
+
+
+# ---------------------------------------------------
+# WORKERS (one chunk of resamples each)
+# ---------------------------------------------------
+def _bootstrap_chunk(a, b, n, seed):
+    rng = np.random.default_rng(seed)
+    ia = rng.integers(0, len(a), size=(n, len(a)))
+    if b is None:
+        return a[ia].mean(axis=1)
+    ib = rng.integers(0, len(b), size=(n, len(b)))
+    return a[ia].mean(axis=1) - b[ib].mean(axis=1)
+
+
+def _permutation_chunk(pooled, n_a, n, observed, seed):
+    rng = np.random.default_rng(seed)
+    idx = rng.permuted(np.broadcast_to(np.arange(len(pooled)), (n, len(pooled))), axis=1)
+    stat = pooled[idx[:, :n_a]].mean(axis=1) - pooled[idx[:, n_a:]].mean(axis=1)
+    return int(np.count_nonzero(np.abs(stat) >= abs(observed) - 1e-12))
+
+
+def _signflip_chunk(d, n, observed, seed):
+    # paired permutation test: randomly swap the two conditions of each participant
+    rng = np.random.default_rng(seed)
+    signs = rng.integers(0, 2, size=(n, len(d))) * 2 - 1
+    stat = signs @ d / len(d)
+    return int(np.count_nonzero(np.abs(stat) >= abs(observed) - 1e-12))
+
+
+# ---------------------------------------------------
+# ENGINE
+# ---------------------------------------------------
+class ResamplingEngine:
+    def __init__(self, n_resamples=100000, seed=0, workers=None, confidence=0.95):
+        self.n_resamples = n_resamples
+        self.seed = seed
+        self.confidence = confidence
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        self._calls = 0
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _chunks(self):
+        # every call gets its own branch of the seed, every chunk its own child
+        root = np.random.SeedSequence([self.seed, self._calls])
+        self._calls += 1
+        sizes = [CHUNK] * (self.n_resamples // CHUNK)
+        if self.n_resamples % CHUNK:
+            sizes.append(self.n_resamples % CHUNK)
+        return sizes, root.spawn(len(sizes))
+
+    def _map(self, fn, *args_per_chunk):
+        if self._pool is None:
+            return [fn(*a) for a in zip(*args_per_chunk)]
+        return list(self._pool.map(fn, *args_per_chunk))
+
+    def _interval(self, dist):
+        alpha = (1.0 - self.confidence) / 2.0
+        low, high = np.quantile(dist, [alpha, 1.0 - alpha])
+        return float(low), float(high)
+
+    # -----------------------------------------------
+    def bootstrap_mean(self, a):
+        a = np.asarray(a, dtype=float)
+        sizes, seeds = self._chunks()
+        k = len(sizes)
+        dist = np.concatenate(self._map(_bootstrap_chunk, [a] * k, [None] * k, sizes, seeds))
+        return self._interval(dist)
+
+    def bootstrap_diff(self, a, b, paired=False):
+        a = np.asarray(a, dtype=float)
+        b = np.asarray(b, dtype=float)
+        sizes, seeds = self._chunks()
+        k = len(sizes)
+        if paired:
+            d = a - b
+            dist = np.concatenate(self._map(_bootstrap_chunk, [d] * k, [None] * k, sizes, seeds))
+        else:
+            dist = np.concatenate(self._map(_bootstrap_chunk, [a] * k, [b] * k, sizes, seeds))
+        return self._interval(dist)
+
+    def permutation_test(self, a, b, paired=False):
+        '''
+        Two sided p-value of the difference of the means (with the +1 correction).
+        '''
+        a = np.asarray(a, dtype=float)
+        b = np.asarray(b, dtype=float)
+        sizes, seeds = self._chunks()
+        k = len(sizes)
+        if paired:
+            d = a - b
+            observed = d.mean()
+            hits = self._map(_signflip_chunk, [d] * k, sizes, [observed] * k, seeds)
+        else:
+            pooled = np.concatenate([a, b])
+            observed = a.mean() - b.mean()
+            hits = self._map(_permutation_chunk, [pooled] * k, [len(a)] * k, sizes, [observed] * k, seeds)
+        return (sum(hits) + 1) / (self.n_resamples + 1)
+
+
+# ---------------------------------------------------
+# ANALYSIS
+# ---------------------------------------------------
+def paired_values(df, metric, mode_a, mode_b):
+    # repeated attempts of the same participant and modality are averaged
+    keys = ["Participant"]
+    a = df[df["Mode"] == mode_a].groupby(keys)[metric].mean()
+    b = df[df["Mode"] == mode_b].groupby(keys)[metric].mean()
+    both = a.index.intersection(b.index)
+    if both.empty:
+        raise ValueError(f"no participant played both '{mode_a}' and '{mode_b}': nothing to pair")
+    return a.loc[both].to_numpy(), b.loc[both].to_numpy()
+
+
+def compare_modes(df, engine, metrics=METRICS + ["SCORE"], paired=False):
+    modes = list(df.groupby("Mode").groups)
+    rows = []
+
+    for metric in metrics:
+        for mode in modes:
+            values = df.loc[df["Mode"] == mode, metric].to_numpy()
+            low, high = engine.bootstrap_mean(values)
+            rows.append({"Metric": metric, "Mode": mode, "Versus": "",
+                         "N": len(values), "Mean": values.mean(),
+                         "CI_low": low, "CI_high": high, "p_value": np.nan})
+
+        for mode_a, mode_b in itertools.combinations(modes, 2):
+            if paired:
+                a, b = paired_values(df, metric, mode_a, mode_b)
+            else:
+                a = df.loc[df["Mode"] == mode_a, metric].to_numpy()
+                b = df.loc[df["Mode"] == mode_b, metric].to_numpy()
+            low, high = engine.bootstrap_diff(a, b, paired)
+            p = engine.permutation_test(a, b, paired)
+            rows.append({"Metric": metric, "Mode": mode_a, "Versus": mode_b,
+                         "N": min(len(a), len(b)), "Mean": a.mean() - b.mean(),
+                         "CI_low": low, "CI_high": high, "p_value": p})
+
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and permutation tests between modalities")
+    parser.add_argument("--input", default="results.csv")
+    parser.add_argument("-n", "--resamples", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--paired", action="store_true", help="Pair the modalities by participant (Participant)")
+    parser.add_argument("--out", default=None, help="Also write the table to this csv")
+    args = parser.parse_args()
+
+    df = add_composite_score(load_results(args.input))
+
+    start = time.perf_counter()
+    with ResamplingEngine(args.resamples, args.seed, args.workers, args.confidence) as engine:
+        try:
+            table = compare_modes(df, engine, paired=args.paired)
+        except ValueError as e:
+            parser.error(str(e))
+    elapsed = time.perf_counter() - start
+
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(f"\nBootstrap ({args.resamples} resamples, {args.confidence:.0%} CI, seed {args.seed}"
+              f"{', paired' if args.paired else ''}):\n")
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print(f"\n{elapsed:.2f} s")
+
+    if args.out:
+        table.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# ---------------------------------------------------
+# GAME SIMULATION
+# ---------------------------------------------------
+# Rules of the PLAY state (ball physics, walls, holes, lives, goal, levels)
+# without rendering, input or feedback, shared by the game loop and the
+# physics process.
+import math
+from levels import LEVELS
+from ball import Ball
+from profiler import NullProfiler
+from maze import Maze
+# the constants of the rules live in config.py (no GL) and are re-exported from here
+from config import (MAZE_WIDTH, MAZE_DEPTH, BALL_RADIUS, GRAVITY, FRICTION, MAX_TILT_DEG, START_POS,
+                    START_LIVES, COLLISION_SPEED_THRESHOLD, HOLE_VIBRATION_MAX, HOLE_VIBRATION_MIN,
+                    GOAL_RECT, REFERENCE_RATE, WALL_RESTITUTION, WALL_TANGENTIAL, friction_for_rate)
+
+MAX_CATCH_UP = 0.25        # seconds of physics advance() runs at most in one frame (after a stall)
+NULL_PROFILER = NullProfiler()
+
+
+def clamp(v, vmin, vmax):
+    return max(vmin, min(vmax, v))
+
+def point_in_rect(px, pz, rect):
+    x, z, w, d = rect
+    return (x <= px <= x + w) and (z <= pz <= z + d)
+
+def start_pos(width, depth):
+    # START_POS on a board of any size (levels.board_size())
+    return (0.0, -(depth / 2.0) + 3.0)
+
+def goal_rect(width, depth):
+    # GOAL_RECT on a board of any size
+    return (width / 2.0 - 3.0, depth / 2.0 - 3.5, 2.2, 2.2)
+
+def hole_vibration_level(maze, ball):
+    """
+    (inside_area, intensity): intensity grows from HOLE_VIBRATION_MIN at the edge
+    of the hole area to HOLE_VIBRATION_MAX at the edge of the hole.
+    """
+    for (hx, hz, area_r, hole_r) in maze.near(ball.x, ball.z)[2]:
+        dist = math.hypot(ball.x - hx, ball.z - hz)
+
+        if dist < area_r:
+            # normalize distance (0 = hole center, 1 = area edge)
+            t = clamp((dist - hole_r) / (area_r - hole_r), 0.0, 1.0)
+
+            # invert: closer -> more vibration
+            intensity = HOLE_VIBRATION_MIN + (1.0 - t) * (HOLE_VIBRATION_MAX - HOLE_VIBRATION_MIN)
+
+            return True, int(intensity)
+
+    return False, 0
+
+
+def fell_in_hole(maze, ball):
+    for (hx, hz, r) in maze.near(ball.x, ball.z)[1]:
+        if math.hypot(ball.x - hx, ball.z - hz) < (r - BALL_RADIUS * 0.25):
+            return True
+    return False
+
+
+class GameSimulation:
+    """
+    One step() advances the ball and applies the rules. What happened in the
+    step is left in the attributes (hit_wall, fell, level_completed, ...), so
+    the caller can send feedback and save results.
+    gravity, restitution, tangential and ball_radius (of the wall collisions)
+    default to the constants of the game; param_sweep.py varies them.
+    """
+    def __init__(self, friction=FRICTION, levels=LEVELS, gravity=GRAVITY, restitution=WALL_RESTITUTION,
+                 tangential=WALL_TANGENTIAL, ball_radius=BALL_RADIUS):
+        self.levels = levels
+        self.max_level = max(levels.keys())
+        self.wall_params = {"restitution": restitution, "tangential": tangential, "ball_radius": ball_radius}
+        self.ball = Ball(*START_POS, gravity=gravity, friction=friction)
+        self.restart()
+
+    def _maze(self, level):
+        maze = Maze(level=level, levels=self.levels, **self.wall_params)
+        self.set_board(maze)
+        return maze
+
+    def set_board(self, maze):
+        # start and goal follow the board of the level (levels.board_size())
+        self.ball.start_x, self.ball.start_z = start_pos(maze.width, maze.depth)
+        self.goal = goal_rect(maze.width, maze.depth)
+
+    def restart(self, level=1):
+        self.level = level
+        self.maze = self._maze(self.level)
+        self.lives = START_LIVES
+        self.wall_collisions = 0
+        self._touching = False    # ball against a wall at the previous step
+        self.state = "PLAY"    # PLAY, WIN, GAME_OVER
+        self.ball.reset()
+        self.sim_time = 0.0    # physics time since the restart
+        self.hit_time = self.fall_time = self.completed_time = 0.0    # physics time of the last events
+        self._carry = 0.0      # frame time not yet stepped by advance()
+        self.clear_events()
+
+    def soft_reset(self):
+        self.ball.reset()
+
+    def clear_events(self):
+        self.hit_wall = False
+        self.fell = False
+        self.level_completed = False
+        self.ball_reset = False    # ball back at START_POS: the caller resets the tilt
+        self.inside_area = False
+        self.hole_vibration = 0
+        self.speed = 0.0
+        self.event_x, self.event_z = self.ball.start_x, self.ball.start_z    # ball position before any reset of this step
+
+    def advance(self, frame_dt, tilt_x_deg, tilt_z_deg, prof=NULL_PROFILER, step_dt=1.0 / REFERENCE_RATE):
+        """
+        step() at the fixed rate 1 / step_dt for the frame_dt of a frame (the rest
+        is carried to the next frame): the ball moves the same at any frame rate.
+        The events are those of all the steps of the frame (none if no step ran).
+        """
+        self._carry = min(self._carry + frame_dt, MAX_CATCH_UP)
+        hit_wall = fell = level_completed = ball_reset = False
+        event_x, event_z = self.event_x, self.event_z
+        while self._carry >= step_dt and self.state == "PLAY":
+            self._carry -= step_dt
+            self.step(step_dt, tilt_x_deg, tilt_z_deg, prof)
+            if self.ball_reset or not ball_reset:
+                # position before the last reset of the frame, else of the last step
+                event_x, event_z = self.event_x, self.event_z
+            hit_wall = hit_wall or self.hit_wall
+            fell = fell or self.fell
+            level_completed = level_completed or self.level_completed
+            ball_reset = ball_reset or self.ball_reset
+        self.hit_wall, self.fell, self.level_completed, self.ball_reset = hit_wall, fell, level_completed, ball_reset
+        self.event_x, self.event_z = event_x, event_z
+
+    def step(self, dt, tilt_x_deg, tilt_z_deg, prof=NULL_PROFILER):
+        # prof: laps "ball", "collisions" and "holes" (profiler.FrameProfiler)
+        ball = self.ball
+        maze = self.maze
+
+        self.fell = False
+        self.level_completed = False
+        self.ball_reset = False
+
+        # physics + collisions
+        self.sim_time += dt
+        ball.update(dt, tilt_x_deg, tilt_z_deg)
+        prof.lap("ball")
+        speed = math.hypot(ball.vx, ball.vz)
+        self.hit_wall = maze.handle_collisions(ball)
+        if self.hit_wall:
+            self.hit_time = self.sim_time
+            # one collision per contact, not per step against the wall: the same count at any physics rate
+            if not self._touching and speed > COLLISION_SPEED_THRESHOLD:
+                self.wall_collisions += 1
+        self._touching = self.hit_wall
+
+        # real ball speed
+        self.speed = math.sqrt(ball.vx * ball.vx + ball.vz * ball.vz)
+        self.event_x = ball.x
+        self.event_z = ball.z
+        prof.lap("collisions")
+
+        # hole area -> vibration
+        self.inside_area, self.hole_vibration = hole_vibration_level(maze, ball)
+
+        # falling into holes
+        if fell_in_hole(maze, ball):
+            self.fell = True
+            self.fall_time = self.sim_time
+            self.lives -= 1
+            if self.lives <= 0:
+                self.state = "GAME_OVER"
+                prof.lap("holes")
+                return
+            ball.reset()
+            self.ball_reset = True
+        prof.lap("holes")
+
+        # victory
+        if point_in_rect(ball.x, ball.z, self.goal):
+            self.level_completed = True
+            self.completed_time = self.sim_time
+            if self.level < self.max_level:
+                self.level += 1
+                self.maze = self._maze(self.level)
+                ball.reset()
+                self.ball_reset = True
+            else:
+                self.state = "WIN"
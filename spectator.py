@@ -0,0 +1,328 @@
+# ---------------------------------------------------
+# SPECTATOR STREAM
+# ---------------------------------------------------
+# Live game state sent over UDP to observers (python spectator.py).
+#
+# Keyframe (full state, at least every KEYFRAME_SEC and at every change of
+# level, lives or state):
+#   "K", seq u32, state u8, level u8, lives u8, events u8, wall_hits u16,
+#   time f32, x f32, z f32, tilt_x f32, tilt_z f32, source length u8,
+#   source (utf-8), name (utf-8, rest of packet)
+# source: the levels of the game, so the viewer draws the same boards:
+#   "levels" (levels.py), "generated:SEED:COUNT" (--generated), "pack:PATH" (--level-pack)
+# Delta (relative to the keyframe `key_seq`):
+#   "D", seq u32, key_seq u32, events u8, wall_hits u8 (added since the keyframe),
+#   time ms u16, x i16, z i16 (mm), tilt_x i16, tilt_z i16 (1/100 deg)
+# events: bits of what happened since the previous packet (EVENT_*).
+# All little endian; a delta is 21 bytes, a keyframe 32 + source + name.
+import socket
+import struct
+import time
+
+KEYFRAME = struct.Struct("<cIBBBBHfffffB")
+DELTA = struct.Struct("<cIIBBHhhhh")
+
+STATE_CODES = {"INPUT": 0, "PLAY": 1, "WIN": 2, "GAME_OVER": 3}
+STATE_NAMES = {v: k for k, v in STATE_CODES.items()}
+
+EVENT_WALL = 1
+EVENT_FALL = 2
+EVENT_LEVEL = 4
+
+SPECTATE_PORT = 5005
+SPECTATE_HZ = 30
+KEYFRAME_SEC = 1.0
+
+POS_SCALE = 1000.0      # mm
+TILT_SCALE = 100.0      # 1/100 deg
+INT16 = 32767
+MAX_NAME = 64           # bytes
+MAX_SOURCE = 255
+
+
+def parse_endpoint(text, default_port=SPECTATE_PORT):
+    host, _, port = text.rpartition(":")
+    if not host:
+        return text, default_port
+    return host, int(port)
+
+
+def encode_text(text, limit):
+    # utf-8, cut to limit bytes without splitting a character
+    return text.encode("utf-8")[:limit].decode("utf-8", "ignore").encode("utf-8")
+
+
+def load_levels(source):
+    """
+    The levels of a keyframe source (see above); levels.LEVELS if they cannot be loaded.
+    """
+    from levels import LEVELS
+    kind, _, arg = source.partition(":")
+    try:
+        if kind == "generated":
+            from levelgen import generate_levels
+            seed, _, count = arg.partition(":")
+            return generate_levels(int(seed), int(count or len(LEVELS)))
+        if kind == "pack":
+            from levelpack import LevelPack
+            return LevelPack(arg)
+    except (OSError, ValueError) as e:
+        print(f"levels {source!r}: {e}, showing levels.py")
+    return LEVELS
+
+
+class SpectatorPublisher:
+    """
+    publish() is called every frame; it only sends SPECTATE_HZ packets per second
+    (events are kept until the next packet) and never blocks.
+    """
+    def __init__(self, endpoints, rate=SPECTATE_HZ, keyframe_sec=KEYFRAME_SEC, source="levels"):
+        self.endpoints = endpoints
+        self.interval = 1.0 / rate
+        self.keyframe_sec = keyframe_sec
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.seq = 0
+        self.bytes_sent = 0
+        self._events = 0
+        self._next_send = 0.0
+        self._key = None        # (seq, sent_at, state, level, lives, wall_hits, time, x, z, tilt_x, tilt_z)
+        # packets are packed into one reused buffer and sent through fixed views of it
+        self._buf = bytearray(KEYFRAME.size + MAX_SOURCE + MAX_NAME)
+        self._delta_view = memoryview(self._buf)[:DELTA.size]
+        self._source = encode_text(source, MAX_SOURCE)
+        self._buf[KEYFRAME.size:KEYFRAME.size + len(self._source)] = self._source
+        self._name = None
+        self._key_view = None
+
+    def publish(self, state, level, lives, x, z, tilt_x, tilt_z, time_sec, wall_hits,
+                name="", hit_wall=False, fell=False, level_completed=False):
+        self._events |= ((EVENT_WALL if hit_wall else 0) | (EVENT_FALL if fell else 0)
+                         | (EVENT_LEVEL if level_completed else 0))
+        now = time.perf_counter()
+        if now < self._next_send:
+            return
+        self._next_send = max(self._next_send + self.interval, now - self.interval)
+
+        code = STATE_CODES.get(state, 0)
+        self.seq += 1
+        key = self._key
+        packet = None
+        buf = self._buf
+        if (key is not None and now - key[1] < self.keyframe_sec
+                and code == key[2] and level == key[3] and lives == key[4]):
+            dx = round((x - key[7]) * POS_SCALE)
+            dz = round((z - key[8]) * POS_SCALE)
+            dtx = round((tilt_x - key[9]) * TILT_SCALE)
+            dtz = round((tilt_z - key[10]) * TILT_SCALE)
+            dt_ms = round((time_sec - key[6]) * 1000.0)
+            dhits = wall_hits - key[5]
+            if (max(abs(dx), abs(dz), abs(dtx), abs(dtz)) <= INT16
+                    and 0 <= dt_ms <= 0xFFFF and 0 <= dhits <= 0xFF):
+                DELTA.pack_into(buf, 0, b"D", self.seq, key[0], self._events, dhits, dt_ms, dx, dz, dtx, dtz)
+                packet = self._delta_view
+        if packet is None:
+            if name != self._name:
+                encoded = encode_text(name, MAX_NAME)
+                start = KEYFRAME.size + len(self._source)
+                buf[start:start + len(encoded)] = encoded
+                self._name = name
+                self._key_view = memoryview(buf)[:start + len(encoded)]
+            KEYFRAME.pack_into(buf, 0, b"K", self.seq, code, level, lives, self._events, min(wall_hits, 0xFFFF),
+                               time_sec, x, z, tilt_x, tilt_z, len(self._source))
+            packet = self._key_view
+            self._key = (self.seq, now, code, level, lives, wall_hits, time_sec, x, z, tilt_x, tilt_z)
+        self._events = 0
+
+        for endpoint in self.endpoints:
+            try:
+                self.sock.sendto(packet, endpoint)
+                self.bytes_sent += len(packet)
+            except OSError:
+                pass    # observer not reachable / buffer full: the next keyframe resyncs it
+
+    def close(self):
+        self.sock.close()
+
+
+class SpectatorState:
+    """
+    Receiver side: applies keyframes and the deltas of the current keyframe,
+    drops old or unusable packets. update(packet) returns True when the state changed.
+    """
+    def __init__(self):
+        self.key_seq = None
+        self.seq = 0
+        self.state = "INPUT"
+        self.level = 1
+        self.lives = 0
+        self.wall_hits = 0
+        self.time = 0.0
+        self.x = self.z = 0.0
+        self.tilt_x = self.tilt_z = 0.0
+        self.name = ""
+        self.source = "levels"
+        self.events = 0
+        self._key = None
+        self.packets = 0
+        self.dropped = 0
+
+    def update(self, packet):
+        kind = packet[:1]
+        if kind == b"K" and len(packet) >= KEYFRAME.size:
+            (_, seq, code, level, lives, events, hits,
+             t, x, z, tx, tz, source_len) = KEYFRAME.unpack_from(packet)
+            if seq <= self.seq and self.seq - seq < 64:    # late (a new publisher starts again from 1)
+                self.dropped += 1
+                return False
+            self.seq = self.key_seq = seq
+            self.state = STATE_NAMES.get(code, "INPUT")
+            self.level, self.lives, self.wall_hits = level, lives, hits
+            self.time, self.x, self.z, self.tilt_x, self.tilt_z = t, x, z, tx, tz
+            name_start = KEYFRAME.size + source_len
+            self.source = packet[KEYFRAME.size:name_start].decode("utf-8", "replace")
+            self.name = packet[name_start:].decode("utf-8", "replace")
+            self._key = (hits, t, x, z, tx, tz)
+        elif kind == b"D" and len(packet) >= DELTA.size:
+            _, seq, key_seq, events, dhits, dt_ms, dx, dz, dtx, dtz = DELTA.unpack_from(packet)
+            if key_seq != self.key_seq or seq <= self.seq:
+                self.dropped += 1
+                return False
+            self.seq = seq
+            hits, t, x, z, tx, tz = self._key
+            self.wall_hits = hits + dhits
+            self.time = t + dt_ms / 1000.0
+            self.x = x + dx / POS_SCALE
+            self.z = z + dz / POS_SCALE
+            self.tilt_x = tx + dtx / TILT_SCALE
+            self.tilt_z = tz + dtz / TILT_SCALE
+        else:
+            self.dropped += 1
+            return False
+        self.events |= events
+        self.packets += 1
+        return True
+
+
+# ---------------------------------------------------
+# VIEWER
+# ---------------------------------------------------
+VIEW_W, VIEW_H = 480, 640
+VIEW_MARGIN = 20
+HUD_H = 60
+FLASH_SEC = 0.25
+
+
+def main():
+    import argparse
+    import pygame
+    from levels import WALL_THICKNESS, build_walls, board_size
+    from simulation import BALL_RADIUS, goal_rect
+
+    parser = argparse.ArgumentParser(description="MazeTilt spectator (top view of a live game)")
+    parser.add_argument("--listen", default=f"0.0.0.0:{SPECTATE_PORT}", help="HOST:PORT to receive the stream on")
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(parse_endpoint(args.listen))
+    sock.setblocking(False)
+
+    pygame.init()
+    screen = pygame.display.set_mode((VIEW_W, VIEW_H))
+    pygame.display.set_caption("MazeTilt - spectator")
+    font = pygame.font.SysFont("Arial", 16, bold=True)
+    clock = pygame.time.Clock()
+
+    sources = {}
+    board = {}
+
+    def level_view(source, level):
+        # static part of a level, drawn once, with its scale and board -> screen mapping
+        if (source, level) not in board:
+            if source not in sources:
+                sources[source] = load_levels(source)
+            levels = sources[source]
+            data = levels[level] if level in levels else levels[min(levels.keys())]
+            width, depth = board_size(data)
+            scale = min((VIEW_W - 2 * VIEW_MARGIN) / width, (VIEW_H - HUD_H - 2 * VIEW_MARGIN) / depth)
+            ox = VIEW_W / 2
+            oz = HUD_H + VIEW_MARGIN + depth / 2 * scale
+
+            def to_screen(x, z):
+                # far edge (max z, where the goal is) at the top
+                return int(ox + x * scale), int(oz - z * scale)
+
+            def rect(x, z, w, d):
+                left, top = to_screen(x, z + d)
+                return pygame.Rect(left, top, max(1, round(w * scale)), max(1, round(d * scale)))
+
+            surf = pygame.Surface((VIEW_W, VIEW_H))
+            surf.fill((30, 30, 30))
+            pygame.draw.rect(surf, (220, 220, 220), rect(-width / 2, -depth / 2, width, depth))
+            pygame.draw.rect(surf, (50, 200, 50), rect(*goal_rect(width, depth)))
+            for (hx, hz, r) in data["holes"]:
+                pygame.draw.circle(surf, (30, 30, 30), to_screen(hx, hz), round(r * scale))
+            for wall in build_walls(data, width, depth, WALL_THICKNESS):
+                pygame.draw.rect(surf, (50, 50, 50), rect(*wall))
+            board[(source, level)] = surf, to_screen, scale
+        return board[(source, level)]
+
+    st = SpectatorState()
+    flash = {EVENT_WALL: 0.0, EVENT_FALL: 0.0, EVENT_LEVEL: 0.0}
+    last_packet = None
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        while True:
+            try:
+                packet = sock.recv(512)
+            except (BlockingIOError, InterruptedError):
+                break
+            if st.update(packet):
+                last_packet = time.perf_counter()
+
+        now = time.perf_counter()
+        for bit in flash:
+            if st.events & bit:
+                flash[bit] = now + FLASH_SEC
+        st.events = 0
+
+        surf, to_screen, scale = level_view(st.source, st.level)
+        screen.blit(surf, (0, 0))
+        if now < flash[EVENT_FALL]:
+            color = (220, 40, 40)
+        elif now < flash[EVENT_WALL]:
+            color = (240, 160, 0)
+        else:
+            color = (40, 80, 220)
+        pygame.draw.circle(screen, color, to_screen(st.x, st.z), max(2, round(BALL_RADIUS * scale)))
+        # tilt direction
+        bx, bz = to_screen(st.x, st.z)
+        pygame.draw.line(screen, (240, 240, 240), (bx, bz),
+                         (bx + int(st.tilt_z * 2), bz - int(st.tilt_x * 2)), 2)
+
+        if last_packet is None:
+            status = f"waiting on {args.listen}"
+        elif now - last_packet > 2.0:
+            status = "no data"
+        else:
+            status = st.state
+        line1 = f"{st.name or '-'}   {status}   Level {st.level}   Lives {st.lives}"
+        line2 = f"Time {st.time:.1f}s   Collisions {st.wall_hits}   packets {st.packets} (dropped {st.dropped})"
+        if now < flash[EVENT_LEVEL]:
+            line2 += "   LEVEL!"
+        screen.blit(font.render(line1, True, (240, 240, 240)), (VIEW_MARGIN, 10))
+        screen.blit(font.render(line2, True, (200, 200, 200)), (VIEW_MARGIN, 32))
+
+        pygame.display.flip()
+        clock.tick(60)
+
+    sock.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# ---------------------------------------------------
+# STARTUP
+# ---------------------------------------------------
+# Helpers to get the first frame on screen sooner: initialisation in a
+# background thread, a cached system font lookup and the timings printed by
+# --startup-report.
+import json
+import os
+import threading
+import time
+
+FONT_CACHE_FILE = ".font_cache.json"
+
+
+class StartupTimer:
+    def __init__(self, t0=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def report(self):
+        lines = ["startup:"]
+        prev = self.t0
+        for name, t in self.marks:
+            lines.append(f"  {name:<22}{(t - prev) * 1000.0:9.1f} ms   at {(t - self.t0) * 1000.0:9.1f} ms")
+            prev = t
+        return "\n".join(lines)
+
+
+class Background:
+    """
+    Runs fn() in a daemon thread; result() waits for it and re-raises its exception.
+    """
+    def __init__(self, fn, *args, **kwargs):
+        self._result = None
+        self._error = None
+        self.done_at = None
+        self._thread = threading.Thread(target=self._run, args=(fn, args, kwargs), daemon=True)
+        self._thread.start()
+
+    def _run(self, fn, args, kwargs):
+        try:
+            self._result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._error = e
+        self.done_at = time.perf_counter()
+
+    def ready(self):
+        return not self._thread.is_alive()
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def load_font(name, size, bold=False, italic=False, cache_file=FONT_CACHE_FILE):
+    """
+    Same font as pygame.font.SysFont(name, size, bold, italic), but the file
+    chosen by SysFont is remembered in cache_file, so the next starts do not
+    scan the system fonts. Fallbacks to the default font are not cached.
+    """
+    import pygame
+    from pygame.sysfont import font_constructor
+
+    key = f"{name}|{int(bold)}|{int(italic)}"
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    entry = cache.get(key)
+    if entry and os.path.isfile(entry[0]):
+        path, set_bold, set_italic = entry
+        return font_constructor(path, size, set_bold, set_italic)
+
+    chosen = []
+
+    def constructor(path, size, set_bold, set_italic):
+        chosen.append((path, set_bold, set_italic))
+        return font_constructor(path, size, set_bold, set_italic)
+
+    font = pygame.font.SysFont(name, size, bold, italic, constructor=constructor)
+    if chosen and chosen[0][0]:
+        cache[key] = list(chosen[0])
+        try:
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=1)
+        except OSError:
+            pass
+    return font
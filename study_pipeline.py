@@ -0,0 +1,260 @@
+'''
+Study pipeline: game performance (results/results.csv) + SUS questionnaires
+(SUS calculator/sus-input-data.csv) in one run.
+
+Usage:
+  python study_pipeline.py                   # re-runs only the stages whose inputs changed
+  python study_pipeline.py --force           # ignore the cache
+  python study_pipeline.py --participants participants.csv
+  python study_pipeline.py --outdir /tmp/study
+
+Stages:
+  results       parse results.csv (+ composite SCORE)           <- results.csv
+  sus           parse the questionnaire (+ SUS per participant) <- sus-input-data.csv
+  join          one row per participant and modality            <- results, sus, participants map
+  performance   descriptive stats + plots of analize_results.py <- results
+  usability     sus-results.csv + breakdown plot of sus.py      <- sus
+  correlations  SUS vs Time/Collisions/Lives/SCORE              <- join
+
+Everything the pipeline writes goes to --outdir (default results/pipeline, not tracked):
+the committed sus-results.csv, sus_results_breakdown.png and results/plots are left alone.
+
+Parsed and joined tables are pickled in .pipeline_cache/ together with the key of their
+inputs. Input files are identified by their sha256, which is recomputed only when the
+mtime or the size of the file changes.
+
+The players of results.csv are numbered P1, P2, ... in order of appearance, one per block
+of consecutive rows (analize_results.add_participants), so players with the same Nome stay
+apart. Without a participants csv these are the "partecipant" ids of the questionnaire;
+with one (columns "partecipant" and "Nome", optionally "Modalità" when each modality has
+its own questionnaire) the k-th row of a Nome is the k-th player with that Nome.
+The number of participants in the questionnaire and in results.csv must match.
+If the questionnaire has a "Modalità" column the join is per participant and modality,
+otherwise the participant's SUS is shared by all their modalities.
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import matplotlib
+matplotlib.use("Agg")
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(ROOT, "results")
+SUS_DIR = os.path.join(ROOT, "SUS calculator")
+sys.path.insert(0, RESULTS_DIR)
+sys.path.insert(0, SUS_DIR)
+
+import sus
+from analize_results import METRICS, load_results, add_composite_score, analyze
+
+PIPELINE_VERSION = 2
+CACHE_DIR = os.path.join(ROOT, ".pipeline_cache")
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results.csv")
+SUS_FILE = os.path.join(SUS_DIR, "sus-input-data.csv")
+OUTPUT_DIR = os.path.join(RESULTS_DIR, "pipeline")
+CORRELATIONS_FILE = "usability_performance_correlations.csv"
+
+
+# ---------------------------------------------------
+# CACHE
+# ---------------------------------------------------
+class PipelineCache:
+    def __init__(self, directory=CACHE_DIR, force=False):
+        self.directory = directory
+        self.force = force
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = {"files": {}, "stages": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        self.ran = []
+
+    def save(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def file_key(self, path):
+        if path is None:
+            return "none"
+        st = os.stat(path)
+        entry = self.manifest["files"].get(path)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return entry["sha256"]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self.manifest["files"][path] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+        return digest
+
+    @staticmethod
+    def combine(*keys):
+        return hashlib.sha256("|".join([str(PIPELINE_VERSION)] + list(keys)).encode()).hexdigest()
+
+    def table(self, name, key, build):
+        '''
+        Returns the cached result of build() if it was computed for the same key.
+        '''
+        path = os.path.join(self.directory, name + ".pkl")
+        if not self.force and self.manifest["stages"].get(name) == key and os.path.exists(path):
+            with open(path, "rb") as f:
+                return pickle.load(f)
+
+        value = build()
+        with open(path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.manifest["stages"][name] = key
+        self.ran.append(name)
+        return value
+
+    def output(self, name, key, outputs, build):
+        '''
+        Runs build() (which writes files) unless it already ran for key and its outputs exist.
+        '''
+        if (not self.force and self.manifest["stages"].get(name) == key
+                and all(os.path.exists(p) for p in outputs)):
+            return False
+        build()
+        self.manifest["stages"][name] = key
+        self.ran.append(name)
+        return True
+
+
+# ---------------------------------------------------
+# STAGES
+# ---------------------------------------------------
+def parse_results(path):
+    return add_composite_score(load_results(path))
+
+
+def parse_sus(path):
+    raw = pd.read_csv(path, sep="\t")
+    df = raw.rename(columns={"Modalità": "Mode"})
+    df["SUS"] = sus.sus_scores(raw[sus.QUESTIONS].to_numpy())
+    return df
+
+
+def participant_map(results, path=None):
+    # partecipant of the questionnaire -> Participant of results.csv
+    players = results.drop_duplicates("Participant")[["Participant", "Nome"]]
+    if path is None:
+        return pd.DataFrame({"partecipant": players["Participant"], "Participant": players["Participant"]})
+
+    mapping = pd.read_csv(path)
+    people = mapping.drop_duplicates("partecipant")[["partecipant", "Nome"]]
+    people = people.assign(k=people.groupby("Nome").cumcount()).merge(
+        players.assign(k=players.groupby("Nome").cumcount()), on=["Nome", "k"], how="left")
+    missing = people.loc[people["Participant"].isna(), "partecipant"].tolist()
+    if missing:
+        raise ValueError(f"{path}: no player in results.csv for {', '.join(map(str, missing))}")
+    return mapping.merge(people[["partecipant", "Participant"]], on="partecipant")
+
+
+def join_tables(results, sus_df, participants):
+    n_sus, n_results = sus_df["partecipant"].nunique(), results["Participant"].nunique()
+    if n_sus != n_results:
+        raise ValueError(f"{n_sus} participants in the questionnaire but {n_results} in results.csv")
+
+    participants = participants.rename(columns={"Modalità": "Mode"})
+    on = ["partecipant", "Mode"] if "Mode" in participants and "Mode" in sus_df else ["partecipant"]
+    sus_df = sus_df.merge(participants.drop(columns="Nome", errors="ignore"), on=on, how="left")
+
+    # repeated attempts of the same modality are averaged
+    per_mode = results.groupby(["Participant", "Nome", "Mode"], as_index=False)[METRICS + ["SCORE"]].mean()
+
+    keys = ["Participant", "Mode"] if "Mode" in sus_df else ["Participant"]
+    joined = per_mode.merge(sus_df[["partecipant", "SUS"] + keys], on=keys, how="inner")
+    return joined
+
+
+def correlations(joined):
+    from scipy import stats
+
+    rows = []
+    scopes = [("All", joined)] + list(joined.groupby("Mode"))
+    for scope, df in scopes:
+        for metric in METRICS + ["SCORE"]:
+            if len(df) < 3:
+                continue
+            pearson = stats.pearsonr(df["SUS"], df[metric])
+            spearman = stats.spearmanr(df["SUS"], df[metric])
+            rows.append({"Mode": scope, "Metric": metric, "N": len(df),
+                         "pearson_r": pearson[0], "pearson_p": pearson[1],
+                         "spearman_rho": spearman[0], "spearman_p": spearman[1]})
+    return pd.DataFrame(rows)
+
+
+def write_usability(sus_df, outdir):
+    scores = sus_df["SUS"].to_numpy()
+    sus.report(None, scores)
+    sus.write_results(os.path.join(outdir, sus.DEFAULT_OUTFILE), scores)
+    sus.plot_breakdown(sus_df[sus.QUESTIONS].to_numpy(), os.path.join(outdir, sus.DEFAULT_PLOT))
+
+
+# ---------------------------------------------------
+# MAIN
+# ---------------------------------------------------
+def run(results_file=RESULTS_FILE, sus_file=SUS_FILE, participants_file=None, force=False, outdir=OUTPUT_DIR):
+    cache = PipelineCache(force=force)
+    os.makedirs(outdir, exist_ok=True)
+
+    k_results = cache.combine("results", cache.file_key(results_file))
+    k_sus = cache.combine("sus", cache.file_key(sus_file))
+    k_join = cache.combine("join", k_results, k_sus, cache.file_key(participants_file))
+
+    results = cache.table("results", k_results, lambda: parse_results(results_file))
+    sus_df = cache.table("sus", k_sus, lambda: parse_sus(sus_file))
+    joined = cache.table("join", k_join, lambda: join_tables(
+        results, sus_df, participant_map(results, participants_file)))
+
+    plot_dir = os.path.join(outdir, "plot")
+    cache.output("performance", k_results,
+                 [os.path.join(plot_dir, f) for f in ("completion_time.png", "collisions.png",
+                                                      "remaining_lives.png", "composite_score.png")],
+                 lambda: analyze(results.copy(), plot_dir))
+
+    cache.output("usability", k_sus,
+                 [os.path.join(outdir, sus.DEFAULT_OUTFILE), os.path.join(outdir, sus.DEFAULT_PLOT)],
+                 lambda: write_usability(sus_df, outdir))
+
+    corr = cache.table("correlations", cache.combine("correlations", k_join), lambda: correlations(joined))
+    corr_file = os.path.join(outdir, CORRELATIONS_FILE)
+    if "correlations" in cache.ran or not os.path.exists(corr_file):
+        corr.to_csv(corr_file, index=False)
+
+    cache.save()
+    return joined, corr, cache.ran
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance + SUS study pipeline")
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--sus", default=SUS_FILE)
+    parser.add_argument("--participants", default=None, help="csv mapping partecipant -> Nome (-> Modalità)")
+    parser.add_argument("--force", action="store_true", help="Re-run every stage")
+    parser.add_argument("--outdir", default=OUTPUT_DIR, help="Directory of the csv files and plots")
+    args = parser.parse_args()
+
+    joined, corr, ran = run(os.path.abspath(args.results), os.path.abspath(args.sus),
+                            args.participants and os.path.abspath(args.participants), args.force,
+                            os.path.abspath(args.outdir))
+
+    print(f"\nJoined {len(joined)} rows ({joined['Participant'].nunique()} participants)")
+    print("\nUsability vs performance:\n")
+    with pd.option_context("display.width", 160):
+        print(corr.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"\nStages run: {', '.join(ran) if ran else 'none (everything cached)'}")
+
+
+if __name__ == "__main__":
+    main()
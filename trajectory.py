@@ -0,0 +1,107 @@
+# ---------------------------------------------------
+# TRAJECTORY LOG
+# ---------------------------------------------------
+# Per-frame ball samples written as fixed size binary records, so that the
+# analysis scripts can memory-map millions of them (see results/heatmap.py).
+#
+# Record: level, modality, flags, pad, t, x, z, speed  (little endian, 20 bytes)
+# Tilt record (optional .tilt file next to it, replayed by param_sweep.py):
+#         level, pad x3, t, tilt_x, tilt_z  (little endian, 16 bytes)
+import os
+import struct
+
+RECORD = struct.Struct("<BBBxffff")
+RECORD_SIZE = RECORD.size
+TILT_RECORD = struct.Struct("<Bxxxfff")
+
+FLAG_COLLISION = 1
+FLAG_FALL = 2
+
+TRAJECTORY_DIR = os.path.join("results", "trajectories")
+
+
+def record_dtype():
+    """
+    NumPy dtype matching RECORD (numpy is imported only by the readers).
+    """
+    import numpy as np
+    return np.dtype([
+        ("level", "u1"),
+        ("mode", "u1"),
+        ("flags", "u1"),
+        ("pad", "u1"),
+        ("t", "<f4"),
+        ("x", "<f4"),
+        ("z", "<f4"),
+        ("speed", "<f4"),
+    ])
+
+
+def tilt_dtype():
+    import numpy as np
+    return np.dtype([
+        ("level", "u1"),
+        ("pad", "u1", (3,)),
+        ("t", "<f4"),
+        ("tilt_x", "<f4"),
+        ("tilt_z", "<f4"),
+    ])
+
+
+def trajectory_path(name, attempt, modalita, directory=TRAJECTORY_DIR, ext=".traj"):
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name.strip()) or "player"
+    return os.path.join(directory, f"{safe}_{attempt}_{modalita}{ext}")
+
+
+def tilt_path(name, attempt, modalita, directory=TRAJECTORY_DIR):
+    return trajectory_path(name, attempt, modalita, directory, ext=".tilt")
+
+
+def load_tilt(path):
+    """
+    Tilt records of a .tilt file as a numpy structured array (tilt_dtype()).
+    """
+    import numpy as np
+    return np.fromfile(path, dtype=tilt_dtype())
+
+
+class TrajectoryRecorder:
+    """
+    Buffers samples in memory and appends them to the file every flush_every frames.
+    With tilt_path the tilt of every sample goes to a second file.
+    """
+    def __init__(self, path, modalita, flush_every=256, tilt_path=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.modalita = modalita
+        self.flush_every = flush_every
+        self._buf = bytearray(RECORD_SIZE * flush_every)
+        self._count = 0
+        self._file = open(path, "ab")
+        self._tilt_buf = bytearray(TILT_RECORD.size * flush_every) if tilt_path else None
+        self._tilt_file = open(tilt_path, "ab") if tilt_path else None
+
+    def record(self, t, level, x, z, speed, collided=False, fell=False, tilt_x=0.0, tilt_z=0.0):
+        flags = (FLAG_COLLISION if collided else 0) | (FLAG_FALL if fell else 0)
+        RECORD.pack_into(self._buf, self._count * RECORD_SIZE,
+                         level, self.modalita, flags, t, x, z, speed)
+        if self._tilt_buf is not None:
+            TILT_RECORD.pack_into(self._tilt_buf, self._count * TILT_RECORD.size, level, t, tilt_x, tilt_z)
+        self._count += 1
+        if self._count >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._count:
+            self._file.write(memoryview(self._buf)[:self._count * RECORD_SIZE])
+            self._file.flush()
+            if self._tilt_file is not None:
+                self._tilt_file.write(memoryview(self._tilt_buf)[:self._count * TILT_RECORD.size])
+                self._tilt_file.flush()
+            self._count = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        if self._tilt_file is not None:
+            self._tilt_file.close()
@@ -0,0 +1,309 @@
+# ---------------------------------------------------
+# VECTOR ENVIRONMENT
+# ---------------------------------------------------
+# N games as an environment for tilt controllers, on top of
+# batch_physics.BatchSimulation: reset() / step(actions) over all the games at
+# once, in the style of the gymnasium vector API. An episode is one level with
+# START_LIVES lives: it ends when the ball reaches the goal or the last life
+# is lost, or is truncated after max_steps. Finished games are reset inside
+# step() (auto-reset) on the level chosen for them: a fixed level, one level
+# per game or a level drawn from the seeded RNG of the environment.
+#
+# SubprocVectorEnv splits the games among worker processes; actions and
+# results go through a multiprocessing.shared_memory block, the pipes only
+# carry the commands.
+#
+#   python vector_env.py --envs 4096 --steps 1000          # steps per second, one core
+#   python vector_env.py --envs 16384 --workers 4
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch_physics import BatchSimulation, PLAY, GAME_OVER
+from levels import LEVELS
+from simulation import START_LIVES, MAX_TILT_DEG, REFERENCE_RATE, friction_for_rate
+
+MAX_EPISODE_STEPS = 60 * 60     # one minute at REFERENCE_RATE
+REWARD_GOAL = 1.0
+REWARD_FALL = -1.0
+REWARD_WALL = -0.05             # per counted wall collision (as in results.csv)
+
+# observation columns
+OBS_X, OBS_Z, OBS_VX, OBS_VZ, OBS_LEVEL, OBS_LIVES = range(6)
+OBS_SIZE = 6
+
+
+class VectorEnv:
+    """
+    num_envs games in one process. actions: [num_envs, 2] tilt (x, z) in
+    degrees, clipped to max_tilt. step() returns (obs, reward, terminated,
+    truncated, info); for the games that ended in the step obs is already the
+    first observation of the next episode and info["final_obs"] holds the last
+    one of the episode. The returned arrays are reused by the next step().
+
+    level: None (drawn at every reset from the levels), a level number, or one
+    level number per game.
+    """
+    def __init__(self, num_envs, level=None, levels=LEVELS, seed=None, rate=REFERENCE_RATE,
+                 max_steps=MAX_EPISODE_STEPS, max_tilt=MAX_TILT_DEG):
+        self.num_envs = num_envs
+        self.levels = levels
+        self.level_ids = np.array(sorted(levels), dtype=np.int64)
+        self.dt = 1.0 / rate
+        self.max_steps = max_steps
+        self.max_tilt = max_tilt
+        self.sim = BatchSimulation(num_envs, friction_for_rate(rate), levels)
+        self.rng = np.random.default_rng(seed)
+        self.set_level(level)
+
+        self.episode_level = np.ones(num_envs, dtype=np.int64)
+        self.episode_steps = np.zeros(num_envs, dtype=np.int64)
+        self._collisions = np.zeros(num_envs, dtype=np.int64)
+        self.obs = np.zeros((num_envs, OBS_SIZE))
+        self.final_obs = np.zeros((num_envs, OBS_SIZE))
+        self.reward = np.zeros(num_envs)
+        self.terminated = np.zeros(num_envs, dtype=bool)
+        self.truncated = np.zeros(num_envs, dtype=bool)
+        self.done = np.zeros(num_envs, dtype=bool)
+        self.info = {"final_obs": self.final_obs, "level_completed": self.sim.level_completed,
+                     "fell": self.sim.fell, "hit_wall": self.sim.hit_wall}
+
+    def set_level(self, level):
+        # takes effect at the next reset of every game
+        if level is None:
+            self.level_choice = None
+            return
+        choice = np.broadcast_to(np.asarray(level, dtype=np.int64), (self.num_envs,)).copy()
+        unknown = set(np.unique(choice).tolist()) - set(self.level_ids.tolist())
+        if unknown:
+            raise ValueError(f"unknown levels {sorted(unknown)}")
+        self.level_choice = choice
+
+    def _reset_envs(self, idx):
+        # not sim.restart(): the events of the step that ended the episode stay in info
+        sim = self.sim
+        sim.soft_reset(idx)
+        sim.lives[idx] = START_LIVES
+        sim.state[idx] = PLAY
+        sim.wall_collisions[idx] = 0
+        if self.level_choice is None:
+            level = self.rng.choice(self.level_ids, size=len(idx) if isinstance(idx, np.ndarray) else self.num_envs)
+        else:
+            level = self.level_choice[idx]
+        sim.level[idx] = level
+        self.episode_level[idx] = level
+        self.episode_steps[idx] = 0
+        self._collisions[idx] = 0
+
+    def _observe(self, out, idx=slice(None)):
+        sim = self.sim
+        out[idx, OBS_X] = sim.x[idx]
+        out[idx, OBS_Z] = sim.z[idx]
+        out[idx, OBS_VX] = sim.vx[idx]
+        out[idx, OBS_VZ] = sim.vz[idx]
+        out[idx, OBS_LEVEL] = self.episode_level[idx]
+        out[idx, OBS_LIVES] = sim.lives[idx]
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_envs(slice(None))
+        self._observe(self.obs)
+        sim = self.sim
+        sim.hit_wall[:] = sim.fell[:] = sim.level_completed[:] = False
+        self.final_obs[:] = 0.0
+        self.reward[:] = 0.0
+        self.terminated[:] = False
+        self.truncated[:] = False
+        return self.obs, self.info
+
+    def step(self, actions):
+        sim = self.sim
+        actions = np.clip(actions, -self.max_tilt, self.max_tilt)
+        sim.step(self.dt, actions[:, 0], actions[:, 1])
+        self.episode_steps += 1
+
+        # one episode = one level: the next level started by the simulation is not played
+        np.logical_or(sim.level_completed, sim.state == GAME_OVER, out=self.terminated)
+        np.greater_equal(self.episode_steps, self.max_steps, out=self.truncated)
+        self.truncated &= ~self.terminated
+        np.logical_or(self.terminated, self.truncated, out=self.done)
+
+        hits = sim.wall_collisions - self._collisions
+        self._collisions[:] = sim.wall_collisions
+        self.reward[:] = REWARD_WALL * hits
+        self.reward += REWARD_GOAL * sim.level_completed
+        self.reward += REWARD_FALL * sim.fell
+
+        self._observe(self.obs)
+        if self.done.any():
+            idx = np.flatnonzero(self.done)
+            # where the episode ended (the simulation may have moved the ball back to the start)
+            self.final_obs[idx] = self.obs[idx]
+            self.final_obs[idx, OBS_X] = sim.event_x[idx]
+            self.final_obs[idx, OBS_Z] = sim.event_z[idx]
+            self._reset_envs(idx)
+            self._observe(self.obs, idx)
+        return self.obs, self.reward, self.terminated, self.truncated, self.info
+
+
+# ---------------------------------------------------
+# MULTIPROCESS
+# ---------------------------------------------------
+# columns of a game in the shared block
+ACT = slice(0, 2)
+OBS = slice(2, 2 + OBS_SIZE)
+FINAL_OBS = slice(2 + OBS_SIZE, 2 + 2 * OBS_SIZE)
+(REWARD, TERMINATED, TRUNCATED, LEVEL_COMPLETED, FELL, HIT_WALL) = range(2 + 2 * OBS_SIZE, 8 + 2 * OBS_SIZE)
+COLUMNS = 8 + 2 * OBS_SIZE
+
+
+def _worker_main(conn, shm_name, num_envs, lo, hi, env_kwargs):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    rows = np.ndarray((num_envs, COLUMNS), dtype=np.float64, buffer=shm.buf)[lo:hi]
+    env = VectorEnv(hi - lo, **env_kwargs)
+    try:
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == "step":
+                obs, reward, terminated, truncated, info = env.step(rows[:, ACT])
+            elif cmd == "reset":
+                obs, info = env.reset(seed=arg)
+                reward, terminated, truncated = env.reward, env.terminated, env.truncated
+            elif cmd == "level":
+                env.set_level(arg)
+                conn.send(None)
+                continue
+            else:
+                break
+            rows[:, OBS] = obs
+            rows[:, FINAL_OBS] = info["final_obs"]
+            rows[:, REWARD] = reward
+            rows[:, TERMINATED] = terminated
+            rows[:, TRUNCATED] = truncated
+            rows[:, LEVEL_COMPLETED] = info["level_completed"]
+            rows[:, FELL] = info["fell"]
+            rows[:, HIT_WALL] = info["hit_wall"]
+            conn.send(None)
+    finally:
+        del rows
+        shm.close()
+
+
+class SubprocVectorEnv:
+    """
+    VectorEnv split among `workers` processes, with the same interface.
+    Every worker has its own RNG, spawned from `seed`.
+    """
+    def __init__(self, num_envs, workers=None, level=None, seed=None, **env_kwargs):
+        workers = max(1, min(workers or os.cpu_count() or 1, num_envs))
+        self.num_envs = num_envs
+        self.shm = shared_memory.SharedMemory(create=True, size=num_envs * COLUMNS * 8)
+        self.block = np.ndarray((num_envs, COLUMNS), dtype=np.float64, buffer=self.shm.buf)
+        self.block[:] = 0.0
+        self.bounds = [(num_envs * i // workers, num_envs * (i + 1) // workers) for i in range(workers)]
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+
+        # spawn, as physics_process: no pygame / OpenGL state inherited
+        ctx = mp.get_context("spawn")
+        self.conns = []
+        self.processes = []
+        for (lo, hi), worker_seed in zip(self.bounds, seeds):
+            parent, child = ctx.Pipe()
+            kwargs = dict(env_kwargs, seed=worker_seed, level=self._split(level, lo, hi))
+            process = ctx.Process(target=_worker_main, args=(child, self.shm.name, num_envs, lo, hi, kwargs),
+                                  daemon=True)
+            process.start()
+            self.conns.append(parent)
+            self.processes.append(process)
+
+    def _split(self, level, lo, hi):
+        if level is None or np.ndim(level) == 0:
+            return level
+        return np.asarray(level)[lo:hi]
+
+    def _call(self, cmd, args):
+        for conn, arg in zip(self.conns, args):
+            conn.send((cmd, arg))
+        for conn in self.conns:
+            conn.recv()
+
+    def _results(self):
+        block = self.block
+        info = {"final_obs": block[:, FINAL_OBS], "level_completed": block[:, LEVEL_COMPLETED] != 0,
+                "fell": block[:, FELL] != 0, "hit_wall": block[:, HIT_WALL] != 0}
+        return block[:, OBS], block[:, REWARD], block[:, TERMINATED] != 0, block[:, TRUNCATED] != 0, info
+
+    def set_level(self, level):
+        self._call("level", [self._split(level, lo, hi) for lo, hi in self.bounds])
+
+    def reset(self, seed=None):
+        seeds = np.random.SeedSequence(seed).spawn(len(self.conns)) if seed is not None else [None] * len(self.conns)
+        self._call("reset", seeds)
+        obs, reward, terminated, truncated, info = self._results()
+        return obs, info
+
+    def step(self, actions):
+        self.block[:, ACT] = actions
+        self._call("step", [None] * len(self.conns))
+        return self._results()
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(("close", None))
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        del self.block
+        self.shm.close()
+        self.shm.unlink()
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Vectorized MazeTilt environment: steps per second")
+    parser.add_argument("--envs", type=int, default=4096, help="Number of games")
+    parser.add_argument("--steps", type=int, default=1000, help="Steps of all the games")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0: all the games in this process)")
+    parser.add_argument("--level", type=int, default=None, help="Level of every game (default: random at every reset)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the environment and of the random actions")
+    args = parser.parse_args()
+
+    if args.workers:
+        env = SubprocVectorEnv(args.envs, args.workers, level=args.level, seed=args.seed)
+    else:
+        env = VectorEnv(args.envs, level=args.level, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    # random tilts, each held for a few steps as a hand would
+    actions = rng.uniform(-MAX_TILT_DEG, MAX_TILT_DEG, size=(16, args.envs, 2))
+
+    try:
+        env.reset()
+        goals = falls = episodes = 0
+        start = time.perf_counter()
+        for i in range(args.steps):
+            obs, reward, terminated, truncated, info = env.step(actions[(i // 30) % len(actions)])
+            goals += int(np.count_nonzero(info["level_completed"]))
+            falls += int(np.count_nonzero(info["fell"]))
+            episodes += int(np.count_nonzero(terminated | truncated))
+        elapsed = time.perf_counter() - start
+    finally:
+        if args.workers:
+            env.close()
+
+    total = args.envs * args.steps
+    print(f"{total} steps in {elapsed:.2f} s: {total / elapsed:,.0f} env steps/s "
+          f"({args.workers or 1} process{'es' if args.workers > 1 else ''})")
+    print(f"{episodes} episodes, {goals} goals, {falls} falls (random tilt)")
+
+
+if __name__ == "__main__":
+    main()